@@ -0,0 +1,22 @@
+-- kpiRollups: precomputed trends per series, written by scripts/kpi_rollups.py
+-- IF NOT EXISTS: the script creates the table with this same DDL on databases that were not migrated yet
+
+CREATE TABLE IF NOT EXISTS `kpiRollups` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`companyId` int NOT NULL DEFAULT 0,
+	`kpiType` varchar(100) NOT NULL,
+	`metric` varchar(191) NOT NULL,
+	`period` enum('day','week','month') NOT NULL,
+	`periodStart` timestamp NOT NULL,
+	`lastValue` double,
+	`avgValue` double,
+	`minValue` double,
+	`maxValue` double,
+	`samples` int NOT NULL DEFAULT 0,
+	`delta` double,
+	`deltaPct` double,
+	`rollingAvg` double,
+	`computedAt` timestamp NOT NULL DEFAULT (now()),
+	CONSTRAINT `kpiRollups_id` PRIMARY KEY(`id`),
+	UNIQUE INDEX `kpiRollups_series_period_idx` (`companyId`,`kpiType`,`metric`,`period`,`periodStart`)
+);
\ No newline at end of file
@@ -0,0 +1,15 @@
+-- kpiMetricValues: one row per numeric leaf of kpiSnapshots.data (scripts/metric_values.py)
+-- IF NOT EXISTS: the script creates the table with this same DDL on databases that were not migrated yet
+
+CREATE TABLE IF NOT EXISTS `kpiMetricValues` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`snapshotId` int NOT NULL,
+	`companyId` int NOT NULL DEFAULT 0,
+	`snapshotDate` timestamp NOT NULL,
+	`kpiType` varchar(100) NOT NULL,
+	`metric` varchar(191) NOT NULL,
+	`value` double NOT NULL,
+	CONSTRAINT `kpiMetricValues_id` PRIMARY KEY(`id`),
+	UNIQUE INDEX `kpiMetricValues_snapshot_metric_idx` (`snapshotId`,`metric`),
+	INDEX `kpiMetricValues_metric_company_date_idx` (`metric`,`companyId`,`snapshotDate`,`value`)
+);
\ No newline at end of file
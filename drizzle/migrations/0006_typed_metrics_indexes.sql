@@ -0,0 +1,28 @@
+-- Series indexes for discordMetricsSnapshots and socialMediaMetrics (scripts/typed_metrics.py)
+-- MySQL has no CREATE INDEX IF NOT EXISTS: each index is created only if typed_metrics.py has not created it yet
+
+SET @ddl = IF(
+	(SELECT COUNT(*) FROM information_schema.statistics
+		WHERE table_schema = DATABASE() AND table_name = 'discordMetricsSnapshots' AND index_name = 'discordMetricsSnapshots_guild_timestamp_idx') = 0,
+	'CREATE INDEX `discordMetricsSnapshots_guild_timestamp_idx` ON `discordMetricsSnapshots` (`guildId`,`timestamp`)',
+	'DO 0'
+);
+--> statement-breakpoint
+PREPARE ddl FROM @ddl;
+--> statement-breakpoint
+EXECUTE ddl;
+--> statement-breakpoint
+DEALLOCATE PREPARE ddl;
+--> statement-breakpoint
+SET @ddl = IF(
+	(SELECT COUNT(*) FROM information_schema.statistics
+		WHERE table_schema = DATABASE() AND table_name = 'socialMediaMetrics' AND index_name = 'socialMediaMetrics_company_network_date_idx') = 0,
+	'CREATE INDEX `socialMediaMetrics_company_network_date_idx` ON `socialMediaMetrics` (`companyId`,`network`,`recordDate`)',
+	'DO 0'
+);
+--> statement-breakpoint
+PREPARE ddl FROM @ddl;
+--> statement-breakpoint
+EXECUTE ddl;
+--> statement-breakpoint
+DEALLOCATE PREPARE ddl;
\ No newline at end of file
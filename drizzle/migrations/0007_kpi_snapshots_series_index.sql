@@ -0,0 +1,15 @@
+-- Series index for kpiSnapshots (scripts/snapshot_retention.py and series lookups)
+-- MySQL has no CREATE INDEX IF NOT EXISTS: the index is created only if snapshot_retention.py has not created it yet
+
+SET @ddl = IF(
+	(SELECT COUNT(*) FROM information_schema.statistics
+		WHERE table_schema = DATABASE() AND table_name = 'kpiSnapshots' AND index_name = 'kpiSnapshots_company_type_date_idx') = 0,
+	'CREATE INDEX `kpiSnapshots_company_type_date_idx` ON `kpiSnapshots` (`companyId`,`kpiType`,`snapshotDate`)',
+	'DO 0'
+);
+--> statement-breakpoint
+PREPARE ddl FROM @ddl;
+--> statement-breakpoint
+EXECUTE ddl;
+--> statement-breakpoint
+DEALLOCATE PREPARE ddl;
\ No newline at end of file
@@ -0,0 +1,33 @@
+-- apiLatencyRollups: hourly latency histograms written by scripts/api_latency.py --rollups
+-- IF NOT EXISTS and the conditional index: the script creates both with this same DDL on databases that were not migrated yet
+
+CREATE TABLE IF NOT EXISTS `apiLatencyRollups` (
+	`id` int AUTO_INCREMENT NOT NULL,
+	`apiName` varchar(100) NOT NULL,
+	`endpoint` varchar(255) NOT NULL DEFAULT '',
+	`companyId` int NOT NULL DEFAULT 0,
+	`hourStart` timestamp NOT NULL,
+	`requests` int NOT NULL DEFAULT 0,
+	`errors` int NOT NULL DEFAULT 0,
+	`sumMs` double NOT NULL DEFAULT 0,
+	`minMs` int,
+	`maxMs` int,
+	`buckets` text NOT NULL,
+	`lastStatusId` int NOT NULL,
+	`computedAt` timestamp NOT NULL DEFAULT (now()),
+	CONSTRAINT `apiLatencyRollups_id` PRIMARY KEY(`id`),
+	UNIQUE INDEX `apiLatencyRollups_series_hour_idx` (`apiName`,`endpoint`,`companyId`,`hourStart`)
+);
+--> statement-breakpoint
+SET @ddl = IF(
+	(SELECT COUNT(*) FROM information_schema.statistics
+		WHERE table_schema = DATABASE() AND table_name = 'apiStatus' AND index_name = 'apiStatus_timestamp_idx') = 0,
+	'CREATE INDEX `apiStatus_timestamp_idx` ON `apiStatus` (`timestamp`)',
+	'DO 0'
+);
+--> statement-breakpoint
+PREPARE ddl FROM @ddl;
+--> statement-breakpoint
+EXECUTE ddl;
+--> statement-breakpoint
+DEALLOCATE PREPARE ddl;
\ No newline at end of file
@@ -0,0 +1,16 @@
+-- kpiSnapshots.updatedAt: bumped when an import rewrites a snapshot, so scripts/kpi_rollups.py recomputes it
+-- Existing rows get the migration time, so the next incremental rollup recomputes every series once
+-- MySQL has no ADD COLUMN IF NOT EXISTS: the column is added only if kpi_rollups.py has not added it yet
+
+SET @ddl = IF(
+	(SELECT COUNT(*) FROM information_schema.columns
+		WHERE table_schema = DATABASE() AND table_name = 'kpiSnapshots' AND column_name = 'updatedAt') = 0,
+	'ALTER TABLE `kpiSnapshots` ADD `updatedAt` timestamp DEFAULT (now()) NOT NULL ON UPDATE CURRENT_TIMESTAMP',
+	'DO 0'
+);
+--> statement-breakpoint
+PREPARE ddl FROM @ddl;
+--> statement-breakpoint
+EXECUTE ddl;
+--> statement-breakpoint
+DEALLOCATE PREPARE ddl;
\ No newline at end of file
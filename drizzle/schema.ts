@@ -1,4 +1,4 @@
-import { int, mysqlEnum, mysqlTable, text, timestamp, varchar, boolean, json, uniqueIndex } from "drizzle-orm/mysql-core";
+import { int, mysqlEnum, mysqlTable, text, timestamp, varchar, boolean, json, uniqueIndex, index, double } from "drizzle-orm/mysql-core";
 
 /**
  * Core user table backing auth flow.
@@ -140,7 +140,11 @@ export const socialMediaMetrics = mysqlTable("socialMediaMetrics", {
   createdBy: int("createdBy"), // user who created this record
   createdAt: timestamp("createdAt").defaultNow().notNull(),
   updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
-});
+}, (table) => ({
+  companyNetworkDateIdx: index("socialMediaMetrics_company_network_date_idx").on(
+    table.companyId, table.network, table.recordDate
+  ),
+}));
 
 export type SocialMediaMetric = typeof socialMediaMetrics.$inferSelect;
 export type InsertSocialMediaMetric = typeof socialMediaMetrics.$inferInsert;
@@ -158,7 +162,10 @@ export const apiStatus = mysqlTable("apiStatus", {
   responseTime: int("responseTime"), // response time in ms
   lastChecked: timestamp("lastChecked").defaultNow().notNull(),
   timestamp: timestamp("timestamp").defaultNow().notNull(),
-});
+}, (table) => ({
+  // Time-range scans in scripts/api_latency.py (which creates it if missing)
+  timestampIdx: index("apiStatus_timestamp_idx").on(table.timestamp),
+}));
 
 export type ApiStatus = typeof apiStatus.$inferSelect;
 export type InsertApiStatus = typeof apiStatus.$inferInsert;
@@ -175,11 +182,101 @@ export const kpiSnapshots = mysqlTable("kpiSnapshots", {
   source: varchar("source", { length: 100 }).notNull(), // pipedrive, nibo, discord, metricool, cademi
   data: json("data").$type<Record<string, any>>().notNull(), // complete KPI data as JSON
   createdAt: timestamp("createdAt").defaultNow().notNull(),
-});
+  // Bumped when an import rewrites the snapshot in place; scripts/kpi_rollups.py recomputes from it
+  updatedAt: timestamp("updatedAt").defaultNow().onUpdateNow().notNull(),
+}, (table) => ({
+  // Series lookups and scripts/snapshot_retention.py (which creates it if missing)
+  companyTypeDateIdx: index("kpiSnapshots_company_type_date_idx").on(
+    table.companyId, table.kpiType, table.snapshotDate
+  ),
+}));
 
 export type KpiSnapshot = typeof kpiSnapshots.$inferSelect;
 export type InsertKpiSnapshot = typeof kpiSnapshots.$inferInsert;
 
+/**
+ * KPI Metric Values - One row per numeric leaf of kpiSnapshots.data
+ * Written by scripts/import_historical_data.py --metric-values and scripts/metric_values.py (backfill);
+ * metric is the flattened JSON path (e.g. seguidores.instagram). Range queries on a single
+ * metric are served from kpiMetricValues_metric_company_date_idx without parsing the JSON
+ */
+export const kpiMetricValues = mysqlTable("kpiMetricValues", {
+  id: int("id").autoincrement().primaryKey(),
+  snapshotId: int("snapshotId").notNull(), // kpiSnapshots.id
+  companyId: int("companyId").default(0).notNull(), // 0 for consolidated/global snapshots
+  snapshotDate: timestamp("snapshotDate").notNull(),
+  kpiType: varchar("kpiType", { length: 100 }).notNull(),
+  metric: varchar("metric", { length: 191 }).notNull(),
+  value: double("value").notNull(),
+}, (table) => ({
+  snapshotMetricUnique: uniqueIndex("kpiMetricValues_snapshot_metric_idx").on(table.snapshotId, table.metric),
+  metricCompanyDateIdx: index("kpiMetricValues_metric_company_date_idx").on(
+    table.metric, table.companyId, table.snapshotDate, table.value
+  ),
+}));
+
+export type KpiMetricValue = typeof kpiMetricValues.$inferSelect;
+export type InsertKpiMetricValue = typeof kpiMetricValues.$inferInsert;
+
+/**
+ * KPI Rollups - Precomputed trends per (companyId, kpiType, metric)
+ * Daily/weekly/monthly aggregates, deltas and rolling averages computed from kpiSnapshots
+ * by scripts/kpi_rollups.py; metric is the flattened JSON path (e.g. seguidores.instagram)
+ */
+export const kpiRollups = mysqlTable("kpiRollups", {
+  id: int("id").autoincrement().primaryKey(),
+  companyId: int("companyId").default(0).notNull(), // 0 for consolidated/global snapshots
+  kpiType: varchar("kpiType", { length: 100 }).notNull(),
+  metric: varchar("metric", { length: 191 }).notNull(),
+  period: mysqlEnum("period", ["day", "week", "month"]).notNull(),
+  periodStart: timestamp("periodStart").notNull(), // weeks start on Monday
+  lastValue: double("lastValue"), // last value in the period
+  avgValue: double("avgValue"),
+  minValue: double("minValue"),
+  maxValue: double("maxValue"),
+  samples: int("samples").default(0).notNull(), // days with data in the period
+  delta: double("delta"), // lastValue minus the last known value before the period
+  deltaPct: double("deltaPct"),
+  rollingAvg: double("rollingAvg"), // moving average of lastValue (7 days, 4 weeks or 3 months)
+  computedAt: timestamp("computedAt").defaultNow().notNull(),
+}, (table) => ({
+  seriesPeriodUnique: uniqueIndex("kpiRollups_series_period_idx").on(
+    table.companyId, table.kpiType, table.metric, table.period, table.periodStart
+  ),
+}));
+
+export type KpiRollup = typeof kpiRollups.$inferSelect;
+export type InsertKpiRollup = typeof kpiRollups.$inferInsert;
+
+/**
+ * API Latency Rollups - Hourly latency histograms per (apiName, endpoint, companyId)
+ * Written by scripts/api_latency.py --rollups from apiStatus; buckets is the sparse
+ * {bucketIndex: count} JSON of fixed log-scale buckets (8 per octave from 1 ms), so hours
+ * can be summed into days or whole series. lastStatusId is the last apiStatus.id processed
+ */
+export const apiLatencyRollups = mysqlTable("apiLatencyRollups", {
+  id: int("id").autoincrement().primaryKey(),
+  apiName: varchar("apiName", { length: 100 }).notNull(),
+  endpoint: varchar("endpoint", { length: 255 }).default("").notNull(), // '' when apiStatus.endpoint is null
+  companyId: int("companyId").default(0).notNull(), // 0 for global APIs like metricool
+  hourStart: timestamp("hourStart").notNull(),
+  requests: int("requests").default(0).notNull(),
+  errors: int("errors").default(0).notNull(), // offline calls
+  sumMs: double("sumMs").default(0).notNull(),
+  minMs: int("minMs"),
+  maxMs: int("maxMs"),
+  buckets: text("buckets").notNull(),
+  lastStatusId: int("lastStatusId").notNull(),
+  computedAt: timestamp("computedAt").defaultNow().notNull(),
+}, (table) => ({
+  seriesHourUnique: uniqueIndex("apiLatencyRollups_series_hour_idx").on(
+    table.apiName, table.endpoint, table.companyId, table.hourStart
+  ),
+}));
+
+export type ApiLatencyRollup = typeof apiLatencyRollups.$inferSelect;
+export type InsertApiLatencyRollup = typeof apiLatencyRollups.$inferInsert;
+
 /**
  * Lead Journey Searches - Historical record of lead searches
  * Tracks all searches performed by users for lead journey analysis
@@ -231,7 +328,9 @@ export const discordMetricsSnapshots = mysqlTable("discordMetricsSnapshots", {
   newMembers7days: int("newMembers7days").default(0).notNull(), // Members who joined in last 7 days
   newMembers30days: int("newMembers30days").default(0).notNull(), // Members who joined in last 30 days
   timestamp: timestamp("timestamp").defaultNow().notNull(),
-});
+}, (table) => ({
+  guildTimestampIdx: index("discordMetricsSnapshots_guild_timestamp_idx").on(table.guildId, table.timestamp),
+}));
 
 export type DiscordMetricsSnapshot = typeof discordMetricsSnapshots.$inferSelect;
 export type InsertDiscordMetricsSnapshot = typeof discordMetricsSnapshots.$inferInsert;
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+Latência das integrações a partir de apiStatus (percentis, taxa de erro e tendência)
+
+ApiStatusTracker grava uma linha por chamada a Pipedrive, Discord, Nibo e Metricool
+(responseTime nas chamadas bem-sucedidas, status offline nas falhas). Este script lê a
+tabela em streaming e monta histogramas de latência com baldes fixos em escala
+logarítmica (8 por oitava, de 1 ms a ~2 min; erro relativo dos percentis abaixo de 5%).
+Histogramas com os mesmos baldes são somados, então os de cada hora se combinam em
+dias, em séries inteiras ou em qualquer janela sem reler as linhas.
+
+Relatório por (apiName, endpoint, companyId): chamadas, % de erro, p50/p95/p99, máximo
+e a tendência do p95 e da taxa de erro (janela recente contra a anterior).
+
+Com --rollups os histogramas por hora são gravados em apiLatencyRollups (declarada em
+drizzle/schema.ts) junto com o último id de apiStatus processado: as próximas execuções
+leem só as linhas após esse id (mais ID_OVERLAP ids antes dele, porque os ids seguem a
+ordem do INSERT e não a do commit), refazem a partir de apiStatus as horas em que essas
+linhas caem e o relatório sai dos rollups. Refazer a hora inteira torna a atualização
+idempotente: uma linha relida não é somada duas vezes.
+
+Uso:
+    python3 scripts/api_latency.py                           # últimos 30 dias, direto de apiStatus
+    python3 scripts/api_latency.py --rollups --days 90
+    python3 scripts/api_latency.py --api pipedrive --by-period day --report latencia.json
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import db_utils
+import sqlite_backend
+
+# Baldes: [0, 1 ms) e depois limites 2^(k/8) ms até 2^17 ms (~131 s); acima disso, o último
+BUCKETS_PER_OCTAVE = 8
+MAX_OCTAVE = 17
+BOUNDS = np.r_[0.0, 2.0 ** (np.arange(MAX_OCTAVE * BUCKETS_PER_OCTAVE + 1) / BUCKETS_PER_OCTAVE)]
+BUCKET_COUNT = len(BOUNDS)
+
+PERCENTILES = (50, 95, 99)
+
+# Linhas lidas de apiStatus por vez
+FETCH_SIZE = 10000
+
+# Ids relidos abaixo da marca d'água dos rollups, para as linhas confirmadas fora de ordem
+ID_OVERLAP = 1000
+
+STATUS_INDEX = "apiStatus_timestamp_idx"
+
+DEFAULT_DAYS = 30
+DEFAULT_TREND_DAYS = 7
+
+# Tabela declarada em drizzle/schema.ts (apiLatencyRollups) e criada, junto com o índice
+# de apiStatus, pela migração drizzle/migrations/0008_api_latency_rollups.sql; o mesmo DDL é
+# repetido aqui para bancos ainda não migrados. No SQLite local o esquema equivalente vem de sqlite_backend.
+CREATE_LATENCY_ROLLUPS_TABLE = """
+CREATE TABLE IF NOT EXISTS `apiLatencyRollups` (
+    `id` int AUTO_INCREMENT NOT NULL,
+    `apiName` varchar(100) NOT NULL,
+    `endpoint` varchar(255) NOT NULL DEFAULT '',
+    `companyId` int NOT NULL DEFAULT 0,
+    `hourStart` timestamp NOT NULL,
+    `requests` int NOT NULL DEFAULT 0,
+    `errors` int NOT NULL DEFAULT 0,
+    `sumMs` double NOT NULL DEFAULT 0,
+    `minMs` int,
+    `maxMs` int,
+    `buckets` text NOT NULL,
+    `lastStatusId` int NOT NULL,
+    `computedAt` timestamp NOT NULL DEFAULT (now()),
+    CONSTRAINT `apiLatencyRollups_id` PRIMARY KEY(`id`),
+    UNIQUE INDEX `apiLatencyRollups_series_hour_idx` (`apiName`,`endpoint`,`companyId`,`hourStart`)
+)
+"""
+
+UPSERT_ROLLUP_QUERY = """
+INSERT INTO apiLatencyRollups
+    (apiName, endpoint, companyId, hourStart, requests, errors, sumMs, minMs, maxMs, buckets, lastStatusId, computedAt)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    requests = VALUES(requests), errors = VALUES(errors), sumMs = VALUES(sumMs),
+    minMs = VALUES(minMs), maxMs = VALUES(maxMs), buckets = VALUES(buckets),
+    lastStatusId = VALUES(lastStatusId), computedAt = VALUES(computedAt)
+"""
+
+def bucket_of(values):
+    """Índice do balde de cada latência (ms); valores acima do último limite ficam no último balde"""
+    return np.minimum(np.searchsorted(BOUNDS, values, side="right") - 1, BUCKET_COUNT - 1)
+
+class LatencyHistogram:
+    """
+    Histograma de latências com baldes fixos (BOUNDS). `requests` conta todas as
+    chamadas, `errors` as falhas (sem latência); só as bem-sucedidas entram nos baldes.
+    """
+
+    def __init__(self, counts=None, requests=0, errors=0, sum_ms=0.0, min_ms=None, max_ms=None):
+        self.counts = np.zeros(BUCKET_COUNT, dtype=np.int64) if counts is None else counts
+        self.requests = requests
+        self.errors = errors
+        self.sum_ms = sum_ms
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+
+    def add(self, latencies, errors=0):
+        """Acrescenta um array de latências (ms) e o número de falhas"""
+        self.requests += len(latencies) + errors
+        self.errors += errors
+        if len(latencies):
+            np.add.at(self.counts, bucket_of(latencies), 1)
+            self.sum_ms += float(latencies.sum())
+            low, high = int(latencies.min()), int(latencies.max())
+            self.min_ms = low if self.min_ms is None else min(self.min_ms, low)
+            self.max_ms = high if self.max_ms is None else max(self.max_ms, high)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.requests += other.requests
+        self.errors += other.errors
+        self.sum_ms += other.sum_ms
+        for attr, pick in (("min_ms", min), ("max_ms", max)):
+            value = getattr(other, attr)
+            if value is not None:
+                current = getattr(self, attr)
+                setattr(self, attr, value if current is None else pick(current, value))
+        return self
+
+    @property
+    def samples(self):
+        return int(self.counts.sum())
+
+    @property
+    def error_rate(self):
+        return self.errors / self.requests if self.requests else None
+
+    @property
+    def mean(self):
+        return self.sum_ms / self.samples if self.samples else None
+
+    def percentile(self, p):
+        """Percentil p (0-100) por interpolação linear dentro do balde, limitado ao mínimo e máximo vistos"""
+        total = self.samples
+        if not total:
+            return None
+        rank = p / 100 * total
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, rank, side="left"))
+        index = min(index, BUCKET_COUNT - 1)
+        before = cumulative[index - 1] if index else 0
+        low = BOUNDS[index]
+        high = BOUNDS[index + 1] if index + 1 < BUCKET_COUNT else (self.max_ms or low)
+        fraction = (rank - before) / self.counts[index] if self.counts[index] else 0.0
+        value = low + (high - low) * fraction
+        return float(min(max(value, self.min_ms), self.max_ms))
+
+    def encode(self):
+        """Baldes não vazios como JSON compacto {índice: contagem}"""
+        nonzero = np.flatnonzero(self.counts)
+        return json.dumps({int(i): int(self.counts[i]) for i in nonzero}, separators=(",", ":"))
+
+    @classmethod
+    def decode(cls, buckets, requests, errors, sum_ms, min_ms, max_ms):
+        counts = np.zeros(BUCKET_COUNT, dtype=np.int64)
+        for index, count in json.loads(buckets).items():
+            counts[int(index)] = count
+        return cls(counts, requests, errors, sum_ms, min_ms, max_ms)
+
+def _hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def series_key(api_name, endpoint, company_id):
+    """Chave da série; endpoint e empresa vazios viram '' e 0, como em apiLatencyRollups"""
+    return api_name, endpoint or "", company_id or 0
+
+def stream_status(connection, after_id=0, since=None, apis=None, until=None):
+    """Linhas de apiStatus em blocos: (id, apiName, endpoint, companyId, status, responseTime, timestamp)"""
+    conditions = ["id > %s"]
+    params = [after_id]
+    if since is not None:
+        conditions.append("timestamp >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("timestamp < %s")
+        params.append(until)
+    if apis:
+        conditions.append(f"apiName IN ({', '.join(['%s'] * len(apis))})")
+        params.extend(apis)
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(
+            f"""
+            SELECT id, apiName, endpoint, companyId, status, responseTime, timestamp
+            FROM apiStatus WHERE {' AND '.join(conditions)} ORDER BY id
+            """,
+            params,
+        )
+        while True:
+            batch = cursor.fetchmany(FETCH_SIZE)
+            if not batch:
+                break
+            yield batch
+    finally:
+        cursor.close()
+
+def build_hourly(batches):
+    """
+    Histogramas por (série, hora) a partir dos blocos de stream_status.
+    Retorna ({(série, hora): LatencyHistogram}, maior id lido).
+    """
+    hourly = {}
+    last_id = 0
+    for batch in batches:
+        groups = {}
+        for status_id, api_name, endpoint, company_id, status, response_time, timestamp in batch:
+            # [latências, falhas, chamadas sem tempo registrado (trackApiStatus)]
+            group = groups.setdefault((series_key(api_name, endpoint, company_id), _hour(timestamp)), [[], 0, 0])
+            if status == "offline":
+                group[1] += 1
+            elif response_time is not None:
+                group[0].append(response_time)
+            else:
+                group[2] += 1
+        for key, (latencies, errors, untimed) in groups.items():
+            histogram = hourly.setdefault(key, LatencyHistogram())
+            histogram.add(np.array(latencies, dtype=np.float64), errors)
+            histogram.requests += untimed
+        last_id = batch[-1][0]
+    return hourly, last_id
+
+def changed_hours(batches):
+    """Horas com linhas nos blocos de stream_status. Retorna (horas, linhas lidas, maior id lido)"""
+    hours = set()
+    rows = 0
+    last_id = 0
+    for batch in batches:
+        hours.update(_hour(timestamp) for *_, timestamp in batch)
+        rows += len(batch)
+        last_id = batch[-1][0]
+    return hours, rows, last_id
+
+def ensure_status_index(connection):
+    """
+    Cria o índice de apiStatus por timestamp no MySQL se nenhum índice começar por ele.
+    No SQLite ele já vem no esquema. Retorna True se o índice foi criado.
+    """
+    if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+        return False
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT index_name FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'apiStatus'
+                AND seq_in_index = 1 AND column_name = 'timestamp'
+            """
+        )
+        if cursor.fetchall():
+            return False
+        cursor.execute(f"CREATE INDEX `{STATUS_INDEX}` ON `apiStatus` (`timestamp`)")
+        return True
+    finally:
+        cursor.close()
+
+def ensure_rollups_table(connection):
+    if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+        return
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_LATENCY_ROLLUPS_TABLE)
+    finally:
+        cursor.close()
+
+def rollup_watermark(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT MAX(lastStatusId) FROM apiLatencyRollups")
+        return cursor.fetchone()[0] or 0
+    finally:
+        cursor.close()
+
+def load_rollups(connection, since=None, apis=None):
+    """{(série, hora): LatencyHistogram} gravados em apiLatencyRollups a partir de `since`"""
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("hourStart >= %s")
+        params.append(since)
+    if apis:
+        conditions.append(f"apiName IN ({', '.join(['%s'] * len(apis))})")
+        params.extend(apis)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"""
+            SELECT apiName, endpoint, companyId, hourStart, requests, errors, sumMs, minMs, maxMs, buckets
+            FROM apiLatencyRollups {where}
+            """,
+            params,
+        )
+        return {
+            ((api_name, endpoint, company_id), hour_start): LatencyHistogram.decode(buckets, *stats)
+            for api_name, endpoint, company_id, hour_start, *stats, buckets in cursor.fetchall()
+        }
+    finally:
+        cursor.close()
+
+def update_rollups(connection):
+    """
+    Refaz em apiLatencyRollups as horas com linhas de apiStatus após o último id processado
+    (menos ID_OVERLAP), relendo essas horas inteiras de apiStatus. Como cada hora é
+    substituída e não somada, reler uma linha não a conta duas vezes.
+    Retorna (linhas lidas de apiStatus, horas gravadas).
+    """
+    watermark = rollup_watermark(connection)
+    hours, rows_read, last_id = changed_hours(stream_status(connection, max(0, watermark - ID_OVERLAP)))
+    if not hours:
+        return 0, 0
+
+    hourly, _ = build_hourly(
+        stream_status(connection, since=min(hours), until=max(hours) + timedelta(hours=1))
+    )
+    cursor = connection.cursor()
+    try:
+        computed_at = db_utils.server_now(cursor)
+        rows = [
+            (
+                *series, hour, histogram.requests, histogram.errors, histogram.sum_ms,
+                histogram.min_ms, histogram.max_ms, histogram.encode(), last_id, computed_at,
+            )
+            for (series, hour), histogram in hourly.items()
+            if hour in hours
+        ]
+        query = sqlite_backend.UPSERT_LATENCY_ROLLUP_QUERY if db_utils.dialect(connection) == sqlite_backend.DIALECT else UPSERT_ROLLUP_QUERY
+        for offset in range(0, len(rows), 500):
+            cursor.executemany(query, rows[offset:offset + 500])
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return rows_read, len(rows)
+
+def period_start(hour, period):
+    return hour if period == "hour" else hour.replace(hour=0)
+
+def summarize(hourly, now, trend_days=DEFAULT_TREND_DAYS, period=None):
+    """
+    Por série: histograma total, o da janela recente (últimos `trend_days` dias) e o da
+    janela anterior de mesmo tamanho; com `period` ("hour" ou "day"), também por período.
+    """
+    recent_from = now - timedelta(days=trend_days)
+    previous_from = recent_from - timedelta(days=trend_days)
+    series = {}
+    for (key, hour), histogram in hourly.items():
+        entry = series.setdefault(key, {
+            "total": LatencyHistogram(),
+            "recent": LatencyHistogram(),
+            "previous": LatencyHistogram(),
+            "periods": {},
+        })
+        entry["total"].merge(histogram)
+        if hour >= recent_from:
+            entry["recent"].merge(histogram)
+        elif hour >= previous_from:
+            entry["previous"].merge(histogram)
+        if period:
+            entry["periods"].setdefault(period_start(hour, period), LatencyHistogram()).merge(histogram)
+    return series
+
+def _round(value, digits=1):
+    return None if value is None else round(value, digits)
+
+def histogram_stats(histogram):
+    return {
+        "requests": histogram.requests,
+        "errors": histogram.errors,
+        "error_rate": _round(histogram.error_rate, 4),
+        "mean_ms": _round(histogram.mean),
+        **{f"p{p}_ms": _round(histogram.percentile(p)) for p in PERCENTILES},
+        "max_ms": histogram.max_ms,
+    }
+
+def _change(recent, previous):
+    if recent is None or not previous:
+        return None
+    return (recent - previous) / previous * 100
+
+def series_report(key, entry):
+    api_name, endpoint, company_id = key
+    recent, previous = entry["recent"], entry["previous"]
+    return {
+        "apiName": api_name,
+        "endpoint": endpoint,
+        "companyId": company_id,
+        **histogram_stats(entry["total"]),
+        "trend": {
+            "recent": histogram_stats(recent),
+            "previous": histogram_stats(previous),
+            "p95_change_pct": _round(_change(recent.percentile(95), previous.percentile(95))),
+            "error_rate_change_pts": _round(
+                (recent.error_rate - previous.error_rate) * 100
+                if recent.error_rate is not None and previous.error_rate is not None else None
+            ),
+        },
+        "periods": [
+            {"start": start.isoformat(sep=" "), **histogram_stats(histogram)}
+            for start, histogram in sorted(entry["periods"].items())
+        ],
+    }
+
+def _ms(value):
+    return "-" if value is None else f"{value:,.0f}"
+
+def _trend(change):
+    if change is None:
+        return ""
+    # Variação que arredonda para 0% não tem direção
+    if round(change) == 0:
+        return " 0%"
+    arrow = "▲" if change > 0 else "▼"
+    return f" {arrow}{abs(change):.0f}%"
+
+def print_report(reports):
+    header = f"{'API / endpoint (empresa)':<48} {'chamadas':>9} {'erro':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'máx':>8}  p95 tendência"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        label = f"{report['apiName']} {report['endpoint'] or '-'}" + (f" ({report['companyId']})" if report["companyId"] else "")
+        error_rate = report["error_rate"]
+        print(
+            f"{label[:48]:<48} {report['requests']:>9,} {(error_rate or 0) * 100:>5.1f}% "
+            f"{_ms(report['p50_ms']):>7} {_ms(report['p95_ms']):>7} {_ms(report['p99_ms']):>7} "
+            f"{_ms(report['max_ms']):>8} {_trend(report['trend']['p95_change_pct'])}"
+        )
+        for period in report["periods"]:
+            print(
+                f"   {period['start']:<45} {period['requests']:>9,} {(period['error_rate'] or 0) * 100:>5.1f}% "
+                f"{_ms(period['p50_ms']):>7} {_ms(period['p95_ms']):>7} {_ms(period['p99_ms']):>7} {_ms(period['max_ms']):>8}"
+            )
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Percentis de latência, taxa de erro e tendência das APIs (apiStatus)")
+    parser.add_argument("--api", action="append", help="apiName a analisar (pode repetir)")
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=DEFAULT_DAYS,
+        help=f"Janela do relatório em dias (padrão: {DEFAULT_DAYS})",
+    )
+    parser.add_argument(
+        "--trend-days",
+        type=int,
+        default=DEFAULT_TREND_DAYS,
+        help=f"Tendência: últimos N dias contra os N anteriores (padrão: {DEFAULT_TREND_DAYS})",
+    )
+    parser.add_argument("--by-period", choices=["hour", "day"], help="Também mostra os percentis por hora ou por dia")
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Atualiza apiLatencyRollups com as linhas novas de apiStatus e gera o relatório a partir dela",
+    )
+    parser.add_argument("--report", help="Salva o relatório em JSON")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    try:
+        connection = db_utils.get_connection()
+    except Exception as e:
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        sys.exit(1)
+
+    now = datetime.now()
+    since = _hour(now - timedelta(days=args.days))
+    try:
+        if args.rollups:
+            ensure_rollups_table(connection)
+            if ensure_status_index(connection):
+                print(f"🗂️  Índice {STATUS_INDEX} criado em apiStatus")
+            # Os rollups cobrem todas as APIs: o filtro --api vale só para o relatório
+            rows, hours = db_utils.run_with_retry(lambda: update_rollups(connection))
+            print(f"🧮 apiLatencyRollups: {rows} linhas de apiStatus lidas, {hours} hora(s) refeitas")
+            hourly = load_rollups(connection, since, args.api)
+        else:
+            hourly, _ = build_hourly(stream_status(connection, since=since, apis=args.api))
+    except Exception as e:
+        print(f"❌ Erro ao ler apiStatus: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    series = summarize(hourly, now, args.trend_days, args.by_period)
+    reports = sorted(
+        (series_report(key, entry) for key, entry in series.items()),
+        key=lambda report: (report["apiName"], -(report["p95_ms"] or 0)),
+    )
+    print(f"⏱️  Latência das APIs nos últimos {args.days} dias ({len(reports)} séries)\n")
+    if not reports:
+        print("Nenhuma chamada registrada em apiStatus no período")
+        return
+    print_report(reports)
+    print(f"\nTendência: p95 dos últimos {args.trend_days} dias contra os {args.trend_days} anteriores")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(
+                {"generated_at": now.isoformat(timespec="seconds"), "days": args.days, "series": reports},
+                f, ensure_ascii=False, indent=2,
+            )
+        print(f"📝 Relatório salvo em: {args.report}")
+
+if __name__ == "__main__":
+    main()
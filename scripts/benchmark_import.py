@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pipeline de importação com planilhas sintéticas
+
+Gera planilhas no layout do modelo (registro kpi_sheets, o mesmo de create_template.py)
+com 1 mil a 1 milhão de linhas por aba e mede, separadamente para cada aba:
+
+- load: abrir a planilha (read-only) e ler as linhas
+- convert: converter as linhas (conversores do importador)
+- serialize: gerar o JSON `data` de cada snapshot
+- insert: enfileirar no SnapshotBatcher (inclui o JSON), gravar em lotes e fazer commit
+- end_to_end: import_sheet completo (leitura + conversão + gravação), com a saída descartada
+
+Para cada etapa são registrados linhas/s e pico de memória (tracemalloc, em uma
+segunda passada para não distorcer os tempos). O banco é o SQLite local
+(sqlite_backend) por padrão, então roda sem rede: cada etapa de gravação usa um
+arquivo novo, apagado ao final, e todas começam com a tabela vazia. Com
+--database-url as etapas terminam com rollback e nada fica gravado (o commit não
+entra na medida). O resultado é salvo em JSON e pode ser comparado com uma execução
+anterior (--compare) para detectar regressões.
+
+Uso:
+    python3 scripts/benchmark_import.py --sizes 1000,10000,100000 --output bench.json
+    python3 scripts/benchmark_import.py --sizes 1000,10000 --compare bench.json
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook, load_workbook
+
+from kpi_sheets import SHEETS, COMPANY_MAP
+import db_utils
+import import_historical_data as importer
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+STAGES = ("load", "convert", "serialize", "insert", "end_to_end")
+
+def generate_workbook(path, rows_per_sheet, seed=42):
+    """Planilha sintética com rows_per_sheet linhas de dados em cada aba do modelo"""
+    rng = random.Random(seed)
+    companies = list(COMPANY_MAP)
+    start = datetime(2000, 1, 1)
+
+    wb = Workbook(write_only=True)
+    for spec in SHEETS:
+        ws = wb.create_sheet(spec.name)
+        ws.append(spec.headers)
+        # Na aba com coluna de empresa, cada data se repete uma vez por empresa
+        per_day = len(companies) if spec.index_of("company") is not None else 1
+        for index in range(rows_per_sheet):
+            row = []
+            for column in spec.columns:
+                if column.type == "date":
+                    row.append(start + timedelta(days=index // per_day))
+                elif column.type == "company":
+                    row.append(companies[index % per_day])
+                elif column.type == "int":
+                    row.append(rng.randint(0, 100000))
+                else:
+                    low = column.min_value if column.min_value is not None else -100000
+                    high = column.max_value if column.max_value is not None else 100000
+                    row.append(round(rng.uniform(low, high), 2))
+            ws.append(row)
+    wb.save(path)
+
+def _rate(rows, seconds):
+    return round(rows / seconds, 1) if seconds > 0 else None
+
+class StageTimer:
+    """Mede uma etapa: tempo de parede ou, com trace_memory, o pico de memória alocada"""
+
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, rows):
+        gc.collect()
+        if self.trace_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.results[name] = {"peak_mb": round(peak / 1024 / 1024, 2)}
+            else:
+                self.results[name] = {
+                    "rows": rows,
+                    "seconds": round(elapsed, 4),
+                    "rows_per_sec": _rate(rows, elapsed),
+                }
+
+    def set_rows(self, name, rows):
+        """Informa as linhas de uma etapa cuja contagem só é conhecida ao final"""
+        if not self.trace_memory:
+            result = self.results[name]
+            result.update(rows=rows, rows_per_sec=_rate(rows, result["seconds"]))
+
+@contextlib.contextmanager
+def stage_database(database_url=None):
+    """
+    Conexão de uma etapa de gravação e a função que a encerra dentro da medida.
+    Sem `database_url`, um SQLite novo em diretório temporário (commit medido, arquivo
+    apagado ao sair); com `database_url`, nada é confirmado e a etapa é desfeita ao sair.
+    """
+    tempdir = None
+    if database_url is None:
+        tempdir = tempfile.mkdtemp(prefix="kpi_benchmark_db_")
+        database_url = f"sqlite:///{os.path.join(tempdir, 'bench.db')}"
+    connection = db_utils.get_connection(database_url)
+    finish = connection.commit if tempdir else (lambda: None)
+    try:
+        yield connection, finish
+    finally:
+        try:
+            connection.rollback()
+            connection.close()
+        finally:
+            if tempdir:
+                shutil.rmtree(tempdir, ignore_errors=True)
+
+def run_sheet(workbook_path, spec, database_url, batch_size, trace_memory):
+    """Executa as etapas de uma aba e retorna {etapa: medidas}"""
+    timer = StageTimer(trace_memory)
+
+    with timer.stage("load", 0):
+        wb = load_workbook(workbook_path, read_only=True, data_only=True)
+        rows = list(importer.iter_data_rows(wb[spec.name], spec.width))
+        wb.close()
+    count = len(rows)
+    timer.set_rows("load", count)
+
+    convert = importer.CONVERTERS[spec.name]
+    with timer.stage("convert", count):
+        converted = [convert(row) for row in rows]
+    del rows
+
+    with timer.stage("serialize", count):
+        params = [
+            (company_id, snapshot_date, spec.kpi_type, spec.source, json.dumps(data))
+            for company_id, snapshot_date, data in converted
+        ]
+    del params
+
+    with stage_database(database_url) as (connection, finish):
+        cursor = connection.cursor()
+        statements = db_utils.PreparedStatements(connection)
+        # A impressão do importador não entra na medida
+        metrics = importer.import_metrics.ImportMetrics(quiet=True)
+        batcher = importer.SnapshotBatcher(cursor, batch_size, statements=statements, metrics=metrics)
+        try:
+            with timer.stage("insert", count):
+                for company_id, snapshot_date, data in converted:
+                    batcher.add(spec.name, "", company_id, snapshot_date, spec.kpi_type, spec.source, data)
+                batcher.close()
+                finish()
+        finally:
+            statements.close()
+            cursor.close()
+    del converted
+
+    with stage_database(database_url) as (connection, finish):
+        cursor = connection.cursor()
+        statements = db_utils.PreparedStatements(connection)
+        metrics = importer.import_metrics.ImportMetrics(quiet=True)
+        try:
+            with timer.stage("end_to_end", count):
+                wb = load_workbook(workbook_path, read_only=True, data_only=True)
+                batcher = importer.SnapshotBatcher(cursor, batch_size, statements=statements, metrics=metrics)
+                importer.import_sheet(wb, batcher, spec)
+                batcher.close()
+                finish()
+                wb.close()
+        finally:
+            statements.close()
+            cursor.close()
+
+    return timer.results
+
+def run_benchmark(sizes, workdir, database_url=None, batch_size=importer.DEFAULT_BATCH_SIZE,
+                  trace_memory=True, sheets=None):
+    results = []
+    for size in sizes:
+        workbook_path = os.path.join(workdir, f"synthetic_{size}.xlsx")
+        if not os.path.exists(workbook_path):
+            print(f"🛠️  Gerando planilha sintética com {size} linhas por aba...")
+            started = time.perf_counter()
+            generate_workbook(workbook_path, size)
+            print(f"   {os.path.getsize(workbook_path) / 1024 / 1024:.1f} MB em {time.perf_counter() - started:.1f}s")
+
+        for spec in SHEETS:
+            if sheets and spec.name not in sheets:
+                continue
+            print(f"⏱️  {spec.name} ({size} linhas)...")
+            passes = [False, True] if trace_memory else [False]
+            stages = {}
+            for traced in passes:
+                for stage, values in run_sheet(workbook_path, spec, database_url, batch_size, traced).items():
+                    stages.setdefault(stage, {}).update(values)
+            results.append({"sheet": spec.name, "rows_per_sheet": size, "stages": stages})
+            print("   " + " | ".join(
+                f"{stage}: {stages[stage]['rows_per_sec'] or 0:,.0f} linhas/s"
+                + (f", {stages[stage]['peak_mb']} MB" if "peak_mb" in stages[stage] else "")
+                for stage in STAGES
+            ))
+    return results
+
+def git_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(previous, current):
+    """Imprime a variação de linhas/s por etapa em relação a uma execução anterior"""
+    baseline = {
+        (item["sheet"], item["rows_per_sheet"], stage): values.get("rows_per_sec")
+        for item in previous["results"]
+        for stage, values in item["stages"].items()
+    }
+    print(f"\n📊 Comparação com {previous.get('version') or 'execução anterior'}:")
+    for item in current["results"]:
+        changes = []
+        for stage in STAGES:
+            before = baseline.get((item["sheet"], item["rows_per_sheet"], stage))
+            after = item["stages"].get(stage, {}).get("rows_per_sec")
+            if before and after:
+                changes.append(f"{stage} {(after / before - 1) * 100:+.1f}%")
+        if changes:
+            print(f"   {item['sheet']} ({item['rows_per_sheet']}): " + ", ".join(changes))
+
+def _sizes_arg(value):
+    try:
+        sizes = [int(size) for size in value.split(",") if size.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamanhos inválidos: {value} (ex: 1000,10000,100000)")
+    if not sizes or any(size < 1 for size in sizes):
+        raise argparse.ArgumentTypeError("informe ao menos um tamanho positivo")
+    return sizes
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de importação com planilhas sintéticas")
+    parser.add_argument(
+        "--sizes",
+        type=_sizes_arg,
+        default=list(DEFAULT_SIZES),
+        help="Linhas por aba, separadas por vírgula (padrão: 1000,10000,100000; até 1000000)",
+    )
+    parser.add_argument("--output", default="import_benchmark.json", help="Arquivo JSON de resultados")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar linhas/s")
+    parser.add_argument("--sheet", action="append", help="Mede só esta aba (pode repetir)")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=importer.DEFAULT_BATCH_SIZE,
+        help=f"Snapshots por INSERT em lote (padrão: {importer.DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--database-url",
+        help="Banco das etapas de gravação, desfeitas com rollback (padrão: um SQLite novo por etapa)",
+    )
+    parser.add_argument(
+        "--workdir",
+        help="Diretório das planilhas sintéticas (mantidas e reaproveitadas entre execuções)",
+    )
+    parser.add_argument("--skip-memory", action="store_true", help="Não faz a passada de medição de memória")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="kpi_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+
+    started = datetime.now()
+    try:
+        results = run_benchmark(
+            args.sizes, workdir, args.database_url, max(1, args.batch_size),
+            not args.skip_memory, args.sheet,
+        )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "version": git_version(),
+        "created_at": started.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": "sqlite" if not args.database_url or db_utils.is_sqlite_url(args.database_url) else "mysql",
+        "batch_size": args.batch_size,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados salvos em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare_results(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Carga em massa do importador (--bulk-load) por uma tabela de staging
+
+Para backfills de milhões de linhas, os snapshots convertidos não vão direto para
+kpiSnapshots em INSERTs por lote, que disputam a tabela com as leituras do dashboard:
+
+1. as linhas são gravadas em um TSV temporário enquanto a planilha é lida
+2. o TSV é carregado em uma tabela de staging própria da execução com
+   LOAD DATA LOCAL INFILE (ou INSERTs em lote, se o servidor não permitir
+   arquivos locais, e sempre no SQLite)
+3. na staging: validação (JSON, datas), datas repetidas no arquivo e resolução
+   dos snapshots já existentes, tudo fora da transação da tabela principal
+4. merge em kpiSnapshots com um INSERT ... SELECT (e um UPDATE ... JOIN no modo
+   update) em uma transação curta: a tabela principal fica bloqueada por
+   milissegundos em vez de minutos. As linhas das tabelas dedicadas entram na
+   mesma transação, então um merge que falha não deixa nenhuma delas gravada
+
+O StagingLoader tem a mesma interface usada do SnapshotBatcher (add, close,
+contadores por aba e métricas), então import_sheet e o ingest colunar não mudam.
+"""
+
+import json
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+from mysql.connector import errorcode
+
+from db_utils import DB_ERRORS
+import db_utils
+import import_metrics
+import sqlite_backend
+
+STAGING_PREFIX = "kpiSnapshotsStaging_"
+
+# Linhas por INSERT em lote na staging (sem LOAD DATA) e por lote das tabelas dedicadas
+DEFAULT_BATCH_SIZE = 1000
+
+# Tabela comum (não TEMPORARY): o MySQL não permite referenciar uma tabela temporária
+# duas vezes na mesma instrução, o que a remoção de repetidas precisa
+CREATE_STAGING_TABLE = """
+CREATE TABLE {staging} (
+    stagingId INT AUTO_INCREMENT PRIMARY KEY,
+    sheet VARCHAR(100) NOT NULL,
+    label VARCHAR(255) NOT NULL,
+    companyId INT NULL,
+    snapshotDate DATETIME NULL,
+    kpiType VARCHAR(100) NOT NULL,
+    source VARCHAR(100) NOT NULL,
+    data LONGTEXT NOT NULL,
+    existingId INT NULL,
+    KEY {staging}_key_idx (kpiType, snapshotDate, companyId),
+    KEY {staging}_existing_idx (existingId)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+STAGING_COLUMNS = "sheet, label, companyId, snapshotDate, kpiType, source, data"
+
+LOAD_STAGING_QUERY = f"""
+LOAD DATA LOCAL INFILE %s INTO TABLE {{staging}}
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+LINES TERMINATED BY '\\n'
+({STAGING_COLUMNS})
+"""
+
+INSERT_STAGING_QUERY = f"INSERT INTO {{staging}} ({STAGING_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+
+INVALID_ROWS_QUERY = """
+SELECT stagingId, sheet, label FROM {staging}
+WHERE snapshotDate IS NULL OR JSON_VALID(data) = 0
+"""
+
+# Mantém a primeira ocorrência de cada (empresa, data, kpiType), como o índice de chaves
+DELETE_REPEATED_QUERY = """
+DELETE s FROM {staging} s
+JOIN {staging} d
+  ON d.companyId <=> s.companyId AND d.snapshotDate = s.snapshotDate
+ AND d.kpiType = s.kpiType AND d.stagingId < s.stagingId
+"""
+
+# Leitura sem bloqueio de kpiSnapshots (fora da transação do merge); em caso de
+# duplicatas antigas fica o id mais recente, como no SnapshotKeyIndex
+RESOLVE_EXISTING_QUERY = """
+UPDATE {staging} s
+JOIN (
+    SELECT MAX(k.id) AS id, k.companyId, k.snapshotDate, k.kpiType
+    FROM kpiSnapshots k
+    WHERE k.kpiType IN (SELECT DISTINCT kpiType FROM {staging})
+      AND k.snapshotDate BETWEEN %s AND %s
+    GROUP BY k.companyId, k.snapshotDate, k.kpiType
+) k ON k.companyId <=> s.companyId AND k.snapshotDate = s.snapshotDate AND k.kpiType = s.kpiType
+SET s.existingId = k.id
+"""
+
+MERGE_INSERT_QUERY = """
+INSERT INTO kpiSnapshots (companyId, snapshotDate, kpiType, source, data)
+SELECT companyId, snapshotDate, kpiType, source, data FROM {staging}
+WHERE existingId IS NULL
+ORDER BY stagingId
+"""
+
+# updatedAt avança pelo ON UPDATE CURRENT_TIMESTAMP da coluna
+MERGE_UPDATE_QUERY = """
+UPDATE kpiSnapshots k
+JOIN {staging} s ON k.id = s.existingId
+SET k.source = s.source, k.data = s.data
+"""
+
+# Servidor ou cliente sem permissão para LOAD DATA LOCAL: usa INSERTs em lote
+LOCAL_INFILE_ERRORS = {
+    errorcode.ER_NOT_ALLOWED_COMMAND,
+    getattr(errorcode, "ER_CLIENT_LOCAL_FILES_DISABLED", 3948),
+    getattr(errorcode, "CR_LOAD_DATA_LOCAL_INFILE_REJECTED", 2068),
+}
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+_UNESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+
+def tsv_field(value):
+    """Campo no formato do LOAD DATA (barra invertida como escape, \\N para NULL)"""
+    if value is None:
+        return "\\N"
+    if not isinstance(value, str):
+        value = str(value)
+    return value.translate(_ESCAPES)
+
+def parse_tsv_field(field):
+    if field == "\\N":
+        return None
+    if "\\" not in field:
+        return field
+    chars = []
+    escaped = False
+    for char in field:
+        if escaped:
+            chars.append(_UNESCAPES.get(char, char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+def _queries(connection):
+    """Instruções da staging no dialeto da conexão"""
+    if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+        return {
+            "create": sqlite_backend.CREATE_STAGING_TABLE,
+            "invalid": sqlite_backend.INVALID_STAGING_ROWS_QUERY,
+            "repeated": sqlite_backend.DELETE_REPEATED_STAGING_QUERY,
+            "resolve": sqlite_backend.RESOLVE_EXISTING_STAGING_QUERY,
+            "update": sqlite_backend.MERGE_UPDATE_STAGING_QUERY,
+        }
+    return {
+        "create": CREATE_STAGING_TABLE,
+        "invalid": INVALID_ROWS_QUERY,
+        "repeated": DELETE_REPEATED_QUERY,
+        "resolve": RESOLVE_EXISTING_QUERY,
+        "update": MERGE_UPDATE_QUERY,
+    }
+
+class StagingLoader:
+    """
+    Substituto do SnapshotBatcher para --bulk-load. `add` só escreve uma linha no TSV;
+    `close` carrega a staging, valida e faz o merge (com commit) em kpiSnapshots.
+    As linhas das tabelas dedicadas (`typed`) ficam em memória (são poucas: só as abas
+    Tokeniza Academy e Redes Sociais) e são gravadas na transação do merge.
+    """
+
+    def __init__(self, connection, on_conflict=None, metrics=None, typed=None,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.on_conflict = on_conflict
+        self.metrics = metrics or import_metrics.ImportMetrics()
+        self.typed = typed
+        self.batch_size = max(1, batch_size)
+        self.queries = _queries(connection)
+        self.staging = f"{STAGING_PREFIX}{uuid.uuid4().hex[:12]}"
+        # Apagado automaticamente ao fechar; o LOAD DATA lê pelo caminho enquanto está aberto
+        self.file = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", newline="\n", suffix=".tsv", prefix="kpi_bulk_"
+        )
+        self.rows = 0
+        self.date_range = None
+        self.inserted = Counter()
+        self.updated = Counter()
+        self.skipped = Counter()
+        self.failed = Counter()
+        self.failed_rows = []
+        self.updated_ids = []
+        self.merge_seconds = None
+
+    def add(self, sheet, label, company_id, snapshot_date, kpi_type, source, data):
+        if self.typed is not None:
+            self.typed.add(sheet, company_id, snapshot_date, data)
+
+        started = time.perf_counter()
+        line = "\t".join((
+            tsv_field(sheet),
+            tsv_field(label),
+            tsv_field(company_id),
+            snapshot_date.strftime("%Y-%m-%d %H:%M:%S"),
+            tsv_field(kpi_type),
+            tsv_field(source),
+            tsv_field(json.dumps(data)),
+        ))
+        self.file.write(line + "\n")
+        self.metrics.add_time("serialize", time.perf_counter() - started, sheet)
+        self.rows += 1
+        if self.date_range is None:
+            self.date_range = [snapshot_date, snapshot_date]
+        elif snapshot_date < self.date_range[0]:
+            self.date_range[0] = snapshot_date
+        elif snapshot_date > self.date_range[1]:
+            self.date_range[1] = snapshot_date
+
+    def flush(self):
+        self.file.flush()
+
+    def sync(self):
+        self.flush()
+
+    def close(self):
+        """Carrega, valida e faz o merge; a staging e o TSV são removidos em qualquer caso"""
+        try:
+            if self.rows:
+                self._load()
+                self._merge()
+        finally:
+            self.file.close()
+            self._drop_staging()
+            self.cursor.close()
+
+    def abort(self):
+        """Descarta o TSV e a staging sem carregar nada (erro na importação)"""
+        if self.file.closed:
+            return
+        self.file.close()
+        self._drop_staging()
+        self.cursor.close()
+
+    def _execute(self, query, params=()):
+        self.cursor.execute(query.format(staging=self.staging), params)
+
+    def _load(self):
+        started = time.perf_counter()
+        self.file.flush()
+        self._execute(self.queries["create"])
+        method = "LOAD DATA LOCAL INFILE"
+        if db_utils.dialect(self.connection) == sqlite_backend.DIALECT:
+            method = "INSERT em lotes"
+            self._insert_from_file()
+        else:
+            try:
+                self._execute(LOAD_STAGING_QUERY, (self.file.name,))
+            except DB_ERRORS as e:
+                if getattr(e, "errno", None) not in LOCAL_INFILE_ERRORS:
+                    raise
+                self.metrics.info(f"⚠️  LOAD DATA LOCAL não permitido ({e}); carregando a staging com INSERTs em lote")
+                method = "INSERT em lotes"
+                self._insert_from_file()
+        self.connection.commit()
+
+        self._execute("SELECT COUNT(*) FROM {staging}")
+        loaded = self.cursor.fetchone()[0]
+        if loaded != self.rows:
+            raise Exception(f"Staging incompleta: {loaded} de {self.rows} linhas carregadas")
+        self.metrics.add_time("insert", time.perf_counter() - started)
+        self.metrics.info(f"📦 {loaded} linhas na staging {self.staging} ({method})")
+
+    def _insert_from_file(self):
+        batch = []
+        with open(self.file.name, encoding="utf-8", newline="\n") as f:
+            for line in f:
+                batch.append(tuple(parse_tsv_field(field) for field in line.rstrip("\n").split("\t")))
+                if len(batch) >= self.batch_size:
+                    self._execute_many(batch)
+                    batch = []
+        if batch:
+            self._execute_many(batch)
+
+    def _execute_many(self, batch):
+        self.cursor.executemany(INSERT_STAGING_QUERY.format(staging=self.staging), batch)
+
+    def _prepare(self):
+        """Validação, repetidas e snapshots existentes: só na staging, antes da transação do merge"""
+        self._execute(self.queries["invalid"])
+        invalid = self.cursor.fetchall()
+        for staging_id, sheet, label in invalid:
+            self.failed[sheet] += 1
+            self.failed_rows.append((sheet, label))
+            self.metrics.error(f"  ✗ Erro ao gravar {sheet} ({label}): data ou JSON inválido na staging", sheet)
+        if invalid:
+            ids = [row[0] for row in invalid]
+            self._execute(f"DELETE FROM {{staging}} WHERE stagingId IN ({', '.join(['%s'] * len(ids))})", ids)
+
+        if self.on_conflict:
+            before = self._count_by_sheet()
+            self._execute(self.queries["repeated"])
+            after = self._count_by_sheet()
+            for sheet, count in before.items():
+                repeated = count - after.get(sheet, 0)
+                if repeated:
+                    self.skipped[sheet] += repeated
+                    self.metrics.info(f"  ⚠️  {sheet}: {repeated} data(s) repetida(s) na planilha, linhas ignoradas")
+            self._execute(self.queries["resolve"], tuple(self.date_range))
+        self.connection.commit()
+
+    def _count_by_sheet(self):
+        self._execute("SELECT sheet, COUNT(*) FROM {staging} GROUP BY sheet")
+        return dict(self.cursor.fetchall())
+
+    def _merge(self):
+        started = time.perf_counter()
+        self._prepare()
+
+        self._execute("SELECT sheet, existingId IS NULL, COUNT(*) FROM {staging} GROUP BY sheet, existingId IS NULL")
+        counts = self.cursor.fetchall()
+        if self.on_conflict == "update":
+            self._execute("SELECT existingId FROM {staging} WHERE existingId IS NOT NULL")
+            self.updated_ids = [row[0] for row in self.cursor.fetchall()]
+
+        # Transação curta: só as instruções set-based sobre kpiSnapshots
+        merge_started = time.perf_counter()
+        try:
+            self._write_typed()
+            self._execute(MERGE_INSERT_QUERY)
+            if self.on_conflict == "update" and self.updated_ids:
+                self._execute(self.queries["update"])
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        self.merge_seconds = time.perf_counter() - merge_started
+
+        for sheet, is_new, count in counts:
+            if is_new:
+                self.inserted[sheet] += count
+            elif self.on_conflict == "update":
+                self.updated[sheet] += count
+            else:
+                self.skipped[sheet] += count
+        self.metrics.add_time("commit", self.merge_seconds)
+        self.metrics.add_time("insert", merge_started - started)
+        self.metrics.info(f"🔀 Merge em kpiSnapshots concluído em {self.merge_seconds * 1000:.0f} ms")
+
+    def _write_typed(self):
+        if self.typed is None:
+            return
+        typed = self.typed.take()
+        for offset in range(0, len(typed), self.batch_size):
+            self.typed.write(self.cursor, typed[offset:offset + self.batch_size])
+
+    def _drop_staging(self):
+        try:
+            self.connection.rollback()
+            self._execute("DROP TABLE IF EXISTS {staging}")
+            self.connection.commit()
+        except DB_ERRORS as e:
+            self.metrics.error(f"⚠️  Não foi possível remover a staging {self.staging}: {e}")
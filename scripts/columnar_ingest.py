@@ -0,0 +1,311 @@
+"""
+Ingest colunar de arquivos CSV, Parquet e JSONL com o mesmo layout das abas do modelo
+
+Os arquivos são lidos em blocos com pandas e cada coluna é convertida e validada de
+uma vez (datas, números e empresas), sem passar célula a célula pelo openpyxl.
+As linhas válidas seguem para o mesmo caminho de gravação do importador (SnapshotBatcher).
+
+Dependências opcionais: pandas (CSV/JSONL) e pyarrow (Parquet).
+"""
+
+import os
+import time
+
+from kpi_sheets import SHEETS, SHEETS_BY_NAME, COMPANY_MAP, DATE_FORMAT, build_converter
+import import_manifest
+
+COLUMNAR_EXTENSIONS = (".csv", ".csv.gz", ".parquet", ".jsonl", ".ndjson", ".jsonl.gz")
+
+# Linhas lidas por bloco: limita a memória mesmo em arquivos muito grandes
+DEFAULT_CHUNK_ROWS = 50000
+
+# Código do erro de empresa fora de COMPANY_MAP (aviso na importação, erro no --validate-only)
+UNKNOWN_COMPANY = "unknown_company"
+
+# Conversores para linhas já tipadas pelo pandas
+TYPED_CONVERTERS = {spec.name: build_converter(spec, typed=True) for spec in SHEETS}
+
+def is_columnar_file(path):
+    return path.lower().endswith(COLUMNAR_EXTENSIONS)
+
+def require_pandas():
+    try:
+        import pandas
+    except ImportError:
+        raise Exception("pandas não está instalado: pip install pandas (e pyarrow para Parquet)")
+    return pandas
+
+def _file_format(path):
+    lower = path.lower()
+    if lower.endswith(".parquet"):
+        return "parquet"
+    if lower.endswith((".jsonl", ".ndjson", ".jsonl.gz")):
+        return "jsonl"
+    return "csv"
+
+def read_header(path):
+    """Lê apenas os nomes das colunas do arquivo"""
+    pd = require_pandas()
+    file_format = _file_format(path)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    if file_format == "jsonl":
+        return list(pd.read_json(path, lines=True, nrows=1).columns)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def detect_sheet_spec(path, sheet_name=None):
+    """Identifica a aba do modelo pelo cabeçalho do arquivo (ou pelo nome informado)"""
+    columns = set(read_header(path))
+    if sheet_name:
+        if sheet_name not in SHEETS_BY_NAME:
+            raise Exception(f"Aba desconhecida: {sheet_name} (opções: {', '.join(SHEETS_BY_NAME)})")
+        spec = SHEETS_BY_NAME[sheet_name]
+        missing = [header for header in spec.headers if header not in columns]
+        if missing:
+            raise Exception(f"Colunas ausentes para '{sheet_name}': {', '.join(missing)}")
+        return spec
+    # A aba com mais colunas vence (Redes Sociais contém 'data' como as demais)
+    for spec in sorted(SHEETS, key=lambda spec: spec.width, reverse=True):
+        if set(spec.headers) <= columns:
+            return spec
+    raise Exception(f"Cabeçalho de {os.path.basename(path)} não corresponde a nenhuma aba do modelo")
+
+def iter_frames(path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Gera DataFrames de até chunk_rows linhas com o índice contínuo entre blocos"""
+    pd = require_pandas()
+    file_format = _file_format(path)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        offset = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            frame = batch.to_pandas()
+            frame.index = pd.RangeIndex(offset, offset + len(frame))
+            offset += len(frame)
+            yield frame
+        return
+    if file_format == "jsonl":
+        reader = pd.read_json(path, lines=True, dtype=False, convert_dates=False, chunksize=chunk_rows)
+    else:
+        reader = pd.read_csv(path, dtype=str, keep_default_na=False, usecols=columns, chunksize=chunk_rows)
+    with reader:
+        for frame in reader:
+            if columns:
+                frame = frame[columns]
+            yield frame
+
+def is_blank(series):
+    return series.isna() | series.astype(str).str.strip().eq("")
+
+def parse_dates(series, pd):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.tz_localize(None) if series.dt.tz is not None else series
+    # Textos são aparados; datas nativas (ex: células de data do Excel) passam direto
+    text = series.str.strip() if series.dtype == object else None
+    if text is not None:
+        series = text.where(text.notna(), series)
+    return pd.to_datetime(series, format=DATE_FORMAT, errors="coerce")
+
+def blank_rows(frame, spec):
+    """Linhas sem data (ou sem empresa)"""
+    date_index = spec.index_of("date")
+    company_index = spec.index_of("company")
+    blank = is_blank(frame[spec.headers[date_index]])
+    if company_index is not None:
+        blank |= is_blank(frame[spec.headers[company_index]])
+    return blank
+
+def drop_blank_rows(frame, spec):
+    """Remove linhas sem data (ou sem empresa), ignoradas como na planilha"""
+    return frame[~blank_rows(frame, spec)]
+
+def unfilled_rows(frame, spec):
+    """Linhas com data (e empresa) mas sem nenhuma métrica preenchida (zero conta como preenchido)"""
+    unfilled = ~blank_rows(frame, spec)
+    for column in spec.columns:
+        if column.type not in ("date", "company"):
+            unfilled &= is_blank(frame[column.name])
+    return unfilled
+
+def convert_frame(frame, spec):
+    """
+    Converte e valida um bloco inteiro, coluna a coluna.
+    Retorna (linhas tipadas, erros) onde cada linha tipada é (número da linha, valores
+    na ordem das colunas da aba) e cada erro é um dict com row, column, code, value e message.
+    O número da linha considera o cabeçalho na linha 1, como na planilha.
+    """
+    pd = require_pandas()
+    frame = drop_blank_rows(frame, spec)
+
+    bad_rows = pd.Series(False, index=frame.index)
+    errors = []
+    values = []
+    for column in spec.columns:
+        raw = frame[column.name]
+        if column.type == "date":
+            typed = parse_dates(raw, pd)
+            bad = typed.isna()
+            code, message = "invalid_date", f"data inválida em '{column.name}': {{}} (use YYYY-MM-DD)"
+        elif column.type == "company":
+            raw = raw.astype(str).str.strip()
+            typed = raw.map(COMPANY_MAP)
+            bad = typed.isna()
+            code, message = UNKNOWN_COMPANY, "Empresa desconhecida: {}"
+        else:
+            blank = is_blank(raw)
+            typed = pd.to_numeric(raw.where(~blank), errors="coerce")
+            bad = typed.isna() & ~blank
+            if column.type == "int":
+                bad |= typed.notna() & (typed % 1 != 0)
+            code, message = f"invalid_{column.type}", f"valor inválido em '{column.name}': {{}}"
+            typed = typed.fillna(0)
+        for index, value in raw[bad].items():
+            errors.append({
+                "row": index + 2,
+                "column": column.name,
+                "code": code,
+                "value": str(value),
+                "message": message.format(value),
+            })
+        bad_rows |= bad
+        values.append((column, typed))
+
+    valid = ~bad_rows
+    columns = []
+    for column, typed in values:
+        typed = typed[valid]
+        if column.type == "date":
+            columns.append(typed.dt.to_pydatetime().tolist())
+        elif column.type in ("company", "int"):
+            columns.append(typed.astype("int64").tolist())
+        else:
+            columns.append(typed.astype(float).tolist())
+
+    row_numbers = (frame.index[valid] + 2).tolist()
+    errors.sort(key=lambda error: error["row"])
+    return list(zip(row_numbers, zip(*columns))), errors
+
+def scan_date_range(path, spec):
+    """Lê só a coluna de data e retorna (menor, maior) data válida"""
+    pd = require_pandas()
+    date_column = spec.headers[spec.index_of("date")]
+    low = high = None
+    for frame in iter_frames(path, columns=[date_column]):
+        dates = parse_dates(frame[date_column], pd).dropna()
+        if dates.empty:
+            continue
+        low = dates.min() if low is None else min(low, dates.min())
+        high = dates.max() if high is None else max(high, dates.max())
+    if low is None:
+        return None
+    return low.to_pydatetime(), high.to_pydatetime()
+
+def count_rows(path):
+    """Total de linhas quando é barato saber de antemão (metadados do Parquet); senão None"""
+    if _file_format(path) != "parquet":
+        return None
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+
+def changed_rows(frame, spec, manifest, metrics):
+    """
+    Filtra o bloco pelas linhas novas ou alteradas segundo o manifesto.
+    Retorna o bloco filtrado e {número da linha: chave} das linhas mantidas.
+    """
+    keys = {}
+    keep = []
+    for index, row in zip(frame.index, frame.itertuples(index=False, name=None)):
+        key = manifest.row_key(spec, row)
+        if key is None:
+            keep.append(True)
+            continue
+        status = manifest.check(spec.name, key, row)
+        if status == import_manifest.DUPLICATE:
+            metrics.info(f"  ⚠️  {spec.name} ({key}): data repetida no arquivo, linha ignorada")
+        changed = status in (import_manifest.NEW, import_manifest.CHANGED)
+        keep.append(changed)
+        if changed:
+            keys[int(index) + 2] = key
+    return frame[keep], keys
+
+def import_columnar_file(path, batcher, spec, chunk_rows=DEFAULT_CHUNK_ROWS, start_row=None, committer=None,
+                         manifest=None, skip_unfilled=False):
+    """
+    Importa um arquivo CSV/Parquet/JSONL no layout da aba `spec`.
+    `start_row` pula as linhas já confirmadas (--resume) e `committer` recebe
+    o avanço a cada bloco para os commits periódicos. Leitura e conversão são
+    cronometradas por bloco nas métricas do batcher. Com `manifest`
+    (import_manifest.RowManifest) cada bloco é reduzido às linhas novas ou
+    alteradas antes da conversão. Com `skip_unfilled` as linhas sem nenhuma
+    métrica preenchida são ignoradas e contadas.
+    """
+    metrics = batcher.metrics
+    metrics.info(f"\n📊 Importando {spec.name} de {os.path.basename(path)}...")
+
+    convert = TYPED_CONVERTERS[spec.name]
+    company_index = spec.index_of("company")
+    company_names = {company_id: name for name, company_id in COMPANY_MAP.items()}
+    count = 0
+    unfilled_count = 0
+    metrics.start_sheet(spec.name, count_rows(path))
+
+    clock = time.perf_counter
+    frames = iter_frames(path, columns=spec.headers, chunk_rows=chunk_rows)
+    while True:
+        started = clock()
+        frame = next(frames, None)
+        metrics.add_time("read", clock() - started, spec.name)
+        if frame is None:
+            break
+        if start_row:
+            frame = frame[frame.index + 2 >= start_row]
+            if frame.empty:
+                continue
+        last_row = int(frame.index[-1]) + 2
+        frame_rows = len(frame)
+        keys = {}
+        if manifest is not None:
+            frame, keys = changed_rows(frame, spec, manifest, metrics)
+        if skip_unfilled and not frame.empty:
+            unfilled = unfilled_rows(frame, spec)
+            unfilled_count += int(unfilled.sum())
+            for index in frame.index[unfilled]:
+                if int(index) + 2 in keys:
+                    manifest.discard(spec.name, keys[int(index) + 2])
+            frame = frame[~unfilled]
+        started = clock()
+        rows, errors = convert_frame(frame, spec) if not frame.empty else ([], [])
+        for error in errors:
+            if error["code"] == UNKNOWN_COMPANY:
+                # Aviso, não erro: a linha é ignorada como no importador de planilhas
+                metrics.info(f"  ⚠️  Linha {error['row']}: {error['message']} (linha ignorada)")
+            else:
+                metrics.error(f"  ✗ Erro na linha {error['row']}: {error['message']}", spec.name)
+            if error["row"] in keys:
+                manifest.discard(spec.name, keys[error["row"]])
+
+        convert_time = clock() - started
+        for row_number, row in rows:
+            started = clock()
+            company_id, snapshot_date, data = convert(row)
+            convert_time += clock() - started
+            label = snapshot_date.strftime('%Y-%m-%d')
+            if company_index is not None:
+                label += f" - {company_names[company_id]}"
+            batcher.add(spec.name, label, company_id, snapshot_date, spec.kpi_type, spec.source, data)
+            count += 1
+            if metrics.verbose:
+                metrics.detail(f"  ✓ {label}: {spec.row_summary.format(**data)}")
+        metrics.add_time("convert", convert_time, spec.name)
+        metrics.rows_done(spec.name, frame_rows)
+
+        if committer is not None:
+            committer.row_done(spec.name, last_row, frame_rows)
+
+    if unfilled_count:
+        metrics.info(f"  ⚠️  {spec.name}: {unfilled_count} linha(s) sem nenhuma métrica preenchida, ignoradas")
+    if committer is not None:
+        committer.sheet_done(spec.name)
+    metrics.finish_sheet(spec.name)
+
+    return count
@@ -0,0 +1,23 @@
+"""
+Fixtures compartilhadas pelos testes dos scripts (python -m pytest scripts)
+
+Os testes usam o backend SQLite de sqlite_backend.py (DATABASE_URL=sqlite:///...),
+com um banco novo por teste, sem MySQL nem rede.
+"""
+
+import pytest
+
+import db_utils
+
+@pytest.fixture
+def database_url(tmp_path, monkeypatch):
+    """DATABASE_URL de um banco SQLite vazio no diretório temporário do teste"""
+    url = f"sqlite:///{tmp_path / 'kpis.db'}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    return url
+
+@pytest.fixture
+def connection(database_url):
+    connection = db_utils.get_connection(database_url)
+    yield connection
+    connection.close()
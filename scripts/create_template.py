@@ -1,260 +1,158 @@
 #!/usr/bin/env python3
 """
 Script para criar planilha modelo Excel para importação de dados históricos de KPIs
+
+A planilha é gerada em modo write-only do openpyxl: as linhas vão direto para o
+arquivo, sem manter as células em memória. Com uma fonte de linhas (ex: --from-db,
+que lê kpiSnapshots) o mesmo gerador exporta planilhas pré-preenchidas com centenas
+de milhares de linhas, com memória constante.
 """
 
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
-from datetime import datetime, timedelta
 
-def create_template():
-    wb = Workbook()
-    
-    # Remover sheet padrão
-    if 'Sheet' in wb.sheetnames:
-        wb.remove(wb['Sheet'])
-    
-    # Criar sheets para cada tipo de snapshot
-    create_blue_consult_sheet(wb)
-    create_tokeniza_academy_sheet(wb)
-    create_metricool_sheet(wb)
-    create_cademi_sheet(wb)
+from kpi_sheets import SHEETS, DATE_FORMAT, COMPANY_MAP
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(ROOT_DIR, 'KPI_Import_Template.xlsx')
+
+MAX_COLUMN_WIDTH = 50
+
+# No modo write-only a largura das colunas é gravada antes das linhas: as primeiras
+# linhas ficam em espera até a largura ser calculada, e o resto segue direto
+WIDTH_SAMPLE_ROWS = 1000
+
+# Linhas buscadas do banco por vez na fonte --from-db
+FETCH_SIZE = 5000
+
+HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="FFFFFF", size=11)
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center", wrap_text=True)
+HEADER_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+def create_template(output_file=DEFAULT_OUTPUT, row_sources=None, keywords=None):
+    """
+    Gera a planilha em output_file.
+    row_sources: {nome da aba: iterável de linhas no layout da aba}; as abas com
+    fonte recebem essas linhas no lugar dos exemplos.
+    keywords: palavras-chave gravadas nas propriedades do arquivo (ex: GAP_FILL_KEYWORD).
+    """
+    wb = Workbook(write_only=True)
+    if keywords:
+        wb.properties.keywords = keywords
+
+    # Instruções primeiro, depois uma aba para cada tipo de snapshot do registro
     create_instructions_sheet(wb)
-    
+    counts = {}
+    for spec in SHEETS:
+        rows = (row_sources or {}).get(spec.name)
+        counts[spec.name] = create_data_sheet(wb, spec, rows)
+
     # Salvar arquivo
-    output_file = '/home/ubuntu/kpi-dashboard/KPI_Import_Template.xlsx'
     wb.save(output_file)
     print(f"✅ Planilha modelo criada: {output_file}")
+    if row_sources:
+        for sheet, count in counts.items():
+            if sheet in row_sources:
+                print(f"   {sheet}: {count} linhas")
     return output_file
 
-def style_header(ws, row=1):
-    """Aplica estilo ao cabeçalho"""
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    
-    for cell in ws[row]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+def header_cells(ws, values):
+    """Cabeçalho com estilo (células write-only)"""
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.fill = HEADER_FILL
+        cell.font = HEADER_FONT
+        cell.alignment = HEADER_ALIGNMENT
+        cell.border = HEADER_BORDER
+        cells.append(cell)
+    return cells
 
-def auto_adjust_columns(ws):
-    """Ajusta largura das colunas automaticamente"""
-    for column in ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-def create_blue_consult_sheet(wb):
-    """Sheet para Blue Consult (Pipedrive + Nibo)"""
-    ws = wb.create_sheet("Blue Consult")
-    
-    # Cabeçalhos
-    headers = [
-        "data",
-        "faturamento_mensal",
-        "novos_clientes",
-        "clientes_implantacao",
-        "taxa_conversao",
-        "receitas_nibo",
-        "despesas_nibo",
-        "saldo_nibo"
-    ]
-    
-    ws.append(headers)
-    style_header(ws)
-    
-    # Adicionar linha de exemplo
-    example_date = datetime.now() - timedelta(days=30)
-    ws.append([
-        example_date.strftime("%Y-%m-%d"),
-        "180000.00",
-        "12",
-        "61",
-        "89.8",
-        "17800.00",
-        "246300.00",
-        "-228600.00"
-    ])
-    
-    # Adicionar mais 6 linhas vazias para preenchimento
-    for i in range(6):
-        ws.append([""] * len(headers))
-    
-    auto_adjust_columns(ws)
-    
-    # Adicionar nota
-    ws['A10'] = "INSTRUÇÕES:"
-    ws['A10'].font = Font(bold=True, size=11)
-    ws['A11'] = "• data: Formato YYYY-MM-DD (ex: 2024-10-01)"
-    ws['A12'] = "• faturamento_mensal: Valor em reais sem símbolo (ex: 180000.00)"
-    ws['A13'] = "• novos_clientes: Número inteiro de clientes novos"
-    ws['A14'] = "• clientes_implantacao: Número de clientes em implantação"
-    ws['A15'] = "• taxa_conversao: Percentual sem símbolo % (ex: 89.8)"
-    ws['A16'] = "• receitas_nibo: Receitas do Nibo em reais"
-    ws['A17'] = "• despesas_nibo: Despesas do Nibo em reais"
-    ws['A18'] = "• saldo_nibo: Saldo (receitas - despesas)"
-
-def create_tokeniza_academy_sheet(wb):
-    """Sheet para Tokeniza Academy (Discord + Cademi)"""
-    ws = wb.create_sheet("Tokeniza Academy")
-    
-    headers = [
-        "data",
-        "total_membros_discord",
-        "membros_online",
-        "novos_membros_7d",
-        "novos_membros_30d",
-        "total_alunos_cademi",
-        "alunos_ativos",
-        "total_cursos"
-    ]
-    
-    ws.append(headers)
-    style_header(ws)
-    
-    # Exemplo
-    example_date = datetime.now() - timedelta(days=30)
-    ws.append([
-        example_date.strftime("%Y-%m-%d"),
-        "1854",
-        "154",
-        "5",
-        "6",
-        "450",
-        "320",
-        "8"
-    ])
-    
-    for i in range(6):
-        ws.append([""] * len(headers))
-    
-    auto_adjust_columns(ws)
-    
-    ws['A10'] = "INSTRUÇÕES:"
-    ws['A10'].font = Font(bold=True, size=11)
-    ws['A11'] = "• data: Formato YYYY-MM-DD"
-    ws['A12'] = "• total_membros_discord: Total de membros no Discord"
-    ws['A13'] = "• membros_online: Membros online no momento"
-    ws['A14'] = "• novos_membros_7d: Novos membros nos últimos 7 dias"
-    ws['A15'] = "• novos_membros_30d: Novos membros nos últimos 30 dias"
-    ws['A16'] = "• total_alunos_cademi: Total de alunos cadastrados"
-    ws['A17'] = "• alunos_ativos: Alunos com acesso ativo"
-    ws['A18'] = "• total_cursos: Número de cursos disponíveis"
-
-def create_metricool_sheet(wb):
-    """Sheet para Metricool (Redes Sociais)"""
-    ws = wb.create_sheet("Redes Sociais")
-    
-    headers = [
-        "data",
-        "empresa",
-        "total_posts",
-        "total_interacoes",
-        "engagement_medio",
-        "alcance_total",
-        "impressoes_total",
-        "seguidores_instagram",
-        "seguidores_facebook",
-        "seguidores_youtube",
-        "seguidores_twitter",
-        "seguidores_linkedin",
-        "seguidores_tiktok",
-        "seguidores_threads"
-    ]
-    
-    ws.append(headers)
-    style_header(ws)
-    
-    # Exemplos para cada empresa
-    example_date = datetime.now() - timedelta(days=30)
-    companies = [
-        ("Blue Consult", "61", "363", "2.09", "6600", "95400", "14200", "1", "202", "0", "0", "0", "0"),
-        ("Tokeniza", "61", "363", "2.09", "6600", "95400", "14200", "1", "202", "0", "0", "0", "0"),
-        ("Tokeniza Academy", "180", "229", "0.1", "4940", "8500", "1200", "50", "100", "0", "0", "0", "0"),
-        ("Mychel Mendes", "725", "9400", "0.57", "99200", "190300", "52800", "1", "97200", "0", "0", "300", "0"),
-    ]
-    
-    for company_data in companies:
-        row = [example_date.strftime("%Y-%m-%d")] + list(company_data)
+class ColumnWidths:
+    """Largura das colunas acompanhada linha a linha, sem reler as células depois"""
+
+    def __init__(self, width):
+        self.lengths = [0] * width
+
+    def update(self, row):
+        lengths = self.lengths
+        for index, value in enumerate(row):
+            if value is None or lengths[index] >= MAX_COLUMN_WIDTH:
+                continue
+            length = len(value) if isinstance(value, str) else len(str(value))
+            if length > lengths[index]:
+                lengths[index] = length
+
+    def apply(self, ws):
+        for index, length in enumerate(self.lengths, start=1):
+            ws.column_dimensions[get_column_letter(index)].width = min(length + 2, MAX_COLUMN_WIDTH)
+
+def create_data_sheet(wb, spec, rows=None):
+    """
+    Sheet de dados de uma aba do registro (cabeçalho, exemplos ou linhas da fonte,
+    linhas vazias e instruções). Retorna o número de linhas de dados gravadas.
+    """
+    ws = wb.create_sheet(spec.name)
+    widths = ColumnWidths(spec.width)
+    widths.update(spec.headers)
+
+    if rows is None:
+        # Linhas de exemplo
+        example_date = (datetime.now() - timedelta(days=30)).strftime(DATE_FORMAT)
+        rows = ([example_date] + list(example) for example in spec.examples)
+
+    # As primeiras linhas definem a largura das colunas antes de começar a gravar
+    rows = iter(rows)
+    sample = []
+    for row in rows:
+        widths.update(row)
+        sample.append(row)
+        if len(sample) >= WIDTH_SAMPLE_ROWS:
+            break
+    widths.apply(ws)
+
+    ws.append(header_cells(ws, spec.headers))
+    count = 0
+    for row in sample:
         ws.append(row)
-    
-    for i in range(3):
-        ws.append([""] * len(headers))
-    
-    auto_adjust_columns(ws)
-    
-    ws['A12'] = "INSTRUÇÕES:"
-    ws['A12'].font = Font(bold=True, size=11)
-    ws['A13'] = "• data: Formato YYYY-MM-DD"
-    ws['A14'] = "• empresa: Nome da empresa (Blue Consult, Tokeniza, Tokeniza Academy, Mychel Mendes)"
-    ws['A15'] = "• total_posts: Número de posts publicados"
-    ws['A16'] = "• total_interacoes: Soma de curtidas, comentários, compartilhamentos"
-    ws['A17'] = "• engagement_medio: Taxa de engajamento em % sem símbolo (ex: 2.09)"
-    ws['A18'] = "• alcance_total: Número de pessoas alcançadas"
-    ws['A19'] = "• impressoes_total: Número total de impressões"
-    ws['A20'] = "• seguidores_*: Número de seguidores em cada rede social"
-
-def create_cademi_sheet(wb):
-    """Sheet para Cademi (Cursos)"""
-    ws = wb.create_sheet("Cademi Cursos")
-    
-    headers = [
-        "data",
-        "total_alunos",
-        "alunos_ativos",
-        "alunos_inativos",
-        "total_cursos",
-        "taxa_ativacao"
-    ]
-    
-    ws.append(headers)
-    style_header(ws)
-    
-    # Exemplo
-    example_date = datetime.now() - timedelta(days=30)
-    ws.append([
-        example_date.strftime("%Y-%m-%d"),
-        "450",
-        "320",
-        "130",
-        "8",
-        "71.1"
-    ])
-    
-    for i in range(6):
-        ws.append([""] * len(headers))
-    
-    auto_adjust_columns(ws)
-    
-    ws['A10'] = "INSTRUÇÕES:"
-    ws['A10'].font = Font(bold=True, size=11)
-    ws['A11'] = "• data: Formato YYYY-MM-DD"
-    ws['A12'] = "• total_alunos: Total de alunos cadastrados"
-    ws['A13'] = "• alunos_ativos: Alunos com acesso ativo aos cursos"
-    ws['A14'] = "• alunos_inativos: Alunos sem acesso ativo"
-    ws['A15'] = "• total_cursos: Número de cursos disponíveis"
-    ws['A16'] = "• taxa_ativacao: Percentual de alunos ativos (ex: 71.1)"
+        count += 1
+    for row in rows:
+        ws.append(row)
+        count += 1
+
+    # Linhas vazias para preenchimento
+    for i in range(spec.empty_rows):
+        ws.append([""] * spec.width)
+
+    # Instruções abaixo dos dados (ignoradas pelo importador)
+    ws.append([])
+    title = WriteOnlyCell(ws, value="INSTRUÇÕES:")
+    title.font = Font(bold=True, size=11)
+    ws.append([title])
+    for column in spec.columns:
+        ws.append([f"• {column.name}: {column.description}"])
+    return count
 
 def create_instructions_sheet(wb):
     """Sheet com instruções gerais"""
-    ws = wb.create_sheet("📋 INSTRUÇÕES", 0)  # Primeira aba
-    
+    ws = wb.create_sheet("📋 INSTRUÇÕES")  # Primeira aba
+
     ws.column_dimensions['A'].width = 100
-    
+
     instructions = [
         ("PLANILHA MODELO PARA IMPORTAÇÃO DE DADOS HISTÓRICOS DE KPIs", "title"),
         ("", ""),
@@ -271,10 +169,7 @@ def create_instructions_sheet(wb):
         ("", ""),
         ("📊 ABAS DISPONÍVEIS:", "header"),
         ("", ""),
-        ("• Blue Consult: Dados de vendas (Pipedrive) e financeiro (Nibo)", "text"),
-        ("• Tokeniza Academy: Dados do Discord e plataforma Cademi", "text"),
-        ("• Redes Sociais: Métricas de todas as redes sociais (Metricool)", "text"),
-        ("• Cademi Cursos: Dados detalhados da plataforma de cursos", "text"),
+        *[(f"• {spec.name}: {spec.description}", "text") for spec in SHEETS],
         ("", ""),
         ("⚠️ IMPORTANTE:", "header"),
         ("", ""),
@@ -293,11 +188,10 @@ def create_instructions_sheet(wb):
         ("", ""),
         ("Criado em: " + datetime.now().strftime("%d/%m/%Y %H:%M"), "footer"),
     ]
-    
-    row = 1
-    for text, style_type in instructions:
-        cell = ws.cell(row=row, column=1, value=text)
-        
+
+    for row_num, (text, style_type) in enumerate(instructions, start=1):
+        cell = WriteOnlyCell(ws, value=text)
+
         if style_type == "title":
             cell.font = Font(bold=True, size=16, color="1F4E78")
             cell.alignment = Alignment(horizontal="center", vertical="center")
@@ -309,12 +203,128 @@ def create_instructions_sheet(wb):
         elif style_type == "footer":
             cell.font = Font(size=9, italic=True, color="7F7F7F")
             cell.alignment = Alignment(horizontal="right")
-        
-        row += 1
-    
-    # Ajustar altura das linhas
-    for row_num in range(1, row):
+
+        # Ajustar altura das linhas
         ws.row_dimensions[row_num].height = 20
+        ws.append([cell])
+
+def snapshot_rows(connection, spec, start_date=None, end_date=None, companies=None):
+    """
+    Fonte de linhas a partir de kpiSnapshots, no layout da aba `spec`.
+    Lê com cursor não bufferizado, em blocos; se houver mais de um snapshot na mesma
+    data (e empresa), fica o mais recente.
+    """
+    company_index = spec.index_of("company")
+    company_names = {company_id: name for name, company_id in COMPANY_MAP.items()}
+
+    conditions = ["kpiType = %s"]
+    params = [spec.kpi_type]
+    if company_index is None:
+        conditions.append("companyId = %s")
+        params.append(spec.company_id)
+    elif companies:
+        conditions.append(f"companyId IN ({', '.join(['%s'] * len(companies))})")
+        params.extend(companies)
+    if start_date:
+        conditions.append("snapshotDate >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("snapshotDate <= %s")
+        params.append(end_date)
+
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(
+            f"""
+            SELECT companyId, snapshotDate, data FROM kpiSnapshots
+            WHERE {' AND '.join(conditions)}
+            ORDER BY snapshotDate, companyId, id
+            """,
+            params,
+        )
+        previous_key = previous_row = None
+        while True:
+            batch = cursor.fetchmany(FETCH_SIZE)
+            if not batch:
+                break
+            for company_id, snapshot_date, data in batch:
+                if company_index is not None and company_id not in company_names:
+                    continue
+                if isinstance(data, (bytes, bytearray)):
+                    data = data.decode("utf-8")
+                data = json.loads(data) if isinstance(data, str) else (data or {})
+                row = []
+                for column in spec.columns:
+                    if column.type == "date":
+                        row.append(snapshot_date.strftime(DATE_FORMAT))
+                    elif column.type == "company":
+                        row.append(company_names[company_id])
+                    else:
+                        value = data
+                        for key in column.path:
+                            value = value.get(key) if isinstance(value, dict) else None
+                        row.append(value)
+                key = (snapshot_date.date(), company_id)
+                if previous_row is not None and key != previous_key:
+                    yield previous_row
+                previous_key, previous_row = key, row
+        if previous_row is not None:
+            yield previous_row
+    finally:
+        cursor.close()
+
+def _date_arg(value):
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value} (use YYYY-MM-DD)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cria a planilha modelo de importação de KPIs")
+    parser.add_argument(
+        "output_file",
+        nargs="?",
+        default=DEFAULT_OUTPUT,
+        help="Arquivo .xlsx de saída (padrão: KPI_Import_Template.xlsx na raiz do projeto)",
+    )
+    parser.add_argument(
+        "--from-db",
+        action="store_true",
+        help="Preenche as abas com os snapshots de kpiSnapshots (DATABASE_URL) em vez dos exemplos",
+    )
+    parser.add_argument("--start", type=_date_arg, help="Com --from-db: data inicial (YYYY-MM-DD)")
+    parser.add_argument("--end", type=_date_arg, help="Com --from-db: data final (YYYY-MM-DD)")
+    parser.add_argument("--company", type=int, action="append", help="Com --from-db: companyId da aba Redes Sociais")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if not args.from_db:
+        create_template(args.output_file)
+        return
+
+    import db_utils
+    try:
+        connection = db_utils.get_connection()
+    except Exception as e:
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        sys.exit(1)
+
+    # Data final inclusiva: vai até o fim do dia
+    end_date = args.end.replace(hour=23, minute=59, second=59) if args.end else None
+    try:
+        # As fontes só consultam o banco quando a aba é gravada (uma de cada vez),
+        # então a mesma conexão serve para todas
+        row_sources = {
+            spec.name: snapshot_rows(connection, spec, args.start, end_date, args.company)
+            for spec in SHEETS
+        }
+        create_template(args.output_file, row_sources)
+    except Exception as e:
+        print(f"❌ Erro ao gerar planilha: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
 
 if __name__ == "__main__":
-    create_template()
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Exporta kpiSnapshots para arquivos colunares (Parquet, Arrow ou CSV compactado)
+
+Os snapshots são lidos com um cursor não bufferizado (as linhas vêm do servidor
+em blocos, sem carregar a tabela inteira) e o JSON `data` é achatado em colunas
+tipadas, com um arquivo por kpiType. A memória fica limitada a um bloco por kpiType.
+
+As colunas de cada arquivo são fixadas antes da gravação: as do registro kpi_sheets
+(abas de importação) e as demais chaves do JSON, levantadas por uma primeira leitura
+só de (kpiType, data) com os mesmos filtros. As colunas do JSON levam o prefixo
+"data." e o caminho da chave (ex: data.seguidores.instagram), sem colidir com as
+colunas da tabela.
+
+Uso:
+    python3 scripts/export_snapshots.py exports/ --format parquet \\
+        --company 1 --kpi-type blue_consult_all --start 2024-01-01 --end 2024-12-31
+
+Dependência opcional: pyarrow (Parquet e Arrow). CSV compactado não precisa de nada extra.
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+from datetime import datetime
+
+from kpi_sheets import SHEETS, parse_date
+import db_utils
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv.gz"}
+
+# Linhas buscadas do servidor e gravadas por bloco
+DEFAULT_BATCH_SIZE = 10000
+
+BASE_COLUMNS = ("id", "companyId", "snapshotDate", "kpiType", "source", "createdAt")
+
+DATA_PREFIX = "data."
+
+def data_column(path):
+    """Nome da coluna de uma chave do JSON `data` (ex: data.seguidores.instagram)"""
+    return DATA_PREFIX + ".".join(path)
+
+# Colunas conhecidas de cada kpiType das abas de importação: (nome, caminho no JSON, tipo)
+REGISTRY_COLUMNS = {
+    spec.kpi_type: [
+        (data_column(column.path), column.path, column.type)
+        for column in spec.columns
+        if column.type in ("int", "float")
+    ]
+    for spec in SHEETS
+}
+
+def require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise Exception("pyarrow não está instalado: pip install pyarrow (ou use --format csv)")
+    return pyarrow
+
+def flatten(data, prefix=()):
+    """Achata o JSON em {caminho: valor}; listas viram texto JSON"""
+    items = {}
+    for key, value in data.items():
+        path = prefix + (str(key),)
+        if isinstance(value, dict):
+            items.update(flatten(value, path))
+        elif isinstance(value, list):
+            items[path] = json.dumps(value, ensure_ascii=False)
+        else:
+            items[path] = value
+    return items
+
+def _value_type(value):
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    return "str"
+
+def merge_types(types, data):
+    """Acumula em `types` o tipo de cada chave achatada do JSON (int e float viram float)"""
+    for path, value in flatten(data).items():
+        if value is None:
+            types.setdefault(path, None)
+            continue
+        kind = _value_type(value)
+        previous = types.get(path)
+        if previous is None:
+            types[path] = kind
+        elif previous != kind:
+            types[path] = "float" if {previous, kind} <= {"int", "float"} else "str"
+
+def schema_columns(kpi_type, types):
+    """Colunas do registro (se houver) seguidas das demais chaves encontradas, em ordem"""
+    columns = list(REGISTRY_COLUMNS.get(kpi_type, []))
+    known = {tuple(path) for _, path, _ in columns}
+    columns += [
+        (data_column(path), list(path), kind or "str")
+        for path, kind in sorted(types.items())
+        if path not in known
+    ]
+    return columns
+
+def _lookup(data, path):
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+def _coerce(value, kind):
+    if value is None:
+        return None
+    try:
+        if kind == "int":
+            return int(value)
+        if kind == "float":
+            return float(value)
+        if kind == "bool":
+            return bool(value)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+class KpiTypeWriter:
+    """Grava os snapshots de um kpiType em blocos, com as colunas levantadas antes da exportação"""
+
+    def __init__(self, path, file_format, kpi_type, columns, batch_size):
+        self.path = path
+        self.file_format = file_format
+        self.kpi_type = kpi_type
+        self.batch_size = batch_size
+        self.columns = columns
+        self.pending = []
+        self.rows = 0
+        self.writer = None
+        self.file = None
+        self.ignored_keys = set()
+
+    def add(self, base, data):
+        self.pending.append((base, data))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        known = {tuple(path) for _, path, _ in self.columns}
+
+        table = {name: [] for name in BASE_COLUMNS}
+        table.update({name: [] for name, _, _ in self.columns})
+        for base, data in self.pending:
+            for name, value in zip(BASE_COLUMNS, base):
+                table[name].append(value)
+            for name, path, kind in self.columns:
+                table[name].append(_coerce(_lookup(data, path), kind))
+            self.ignored_keys.update(path for path in flatten(data) if path not in known)
+
+        self._write(table)
+        self.rows += len(self.pending)
+        self.pending = []
+
+    def _write(self, table):
+        if self.file_format == "csv":
+            if self.writer is None:
+                self.file = gzip.open(self.path, "wt", newline="", encoding="utf-8")
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(table.keys())
+            self.writer.writerows(zip(*table.values()))
+            return
+
+        pa = require_pyarrow()
+        batch = pa.record_batch(list(table.values()), schema=self._arrow_schema(pa))
+        if self.writer is None:
+            if self.file_format == "parquet":
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.path, batch.schema, compression="zstd")
+            else:
+                self.writer = pa.ipc.new_file(self.path, batch.schema)
+        self.writer.write_batch(batch)
+
+    def _arrow_schema(self, pa):
+        types = {"int": pa.int64(), "float": pa.float64(), "bool": pa.bool_(), "str": pa.string()}
+        fields = [
+            pa.field("id", pa.int64()),
+            pa.field("companyId", pa.int64()),
+            pa.field("snapshotDate", pa.timestamp("s")),
+            pa.field("kpiType", pa.string()),
+            pa.field("source", pa.string()),
+            pa.field("createdAt", pa.timestamp("s")),
+        ]
+        fields += [pa.field(name, types[kind]) for name, _, kind in self.columns]
+        return pa.schema(fields)
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+        elif self.writer is not None:
+            self.writer.close()
+
+def build_query(companies, kpi_types, start_date, end_date, columns=", ".join(BASE_COLUMNS + ("data",))):
+    conditions = []
+    params = []
+    if companies:
+        conditions.append(f"companyId IN ({', '.join(['%s'] * len(companies))})")
+        params.extend(companies)
+    if kpi_types:
+        conditions.append(f"kpiType IN ({', '.join(['%s'] * len(kpi_types))})")
+        params.extend(kpi_types)
+    if start_date:
+        conditions.append("snapshotDate >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("snapshotDate <= %s")
+        params.append(end_date)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT {columns}
+        FROM kpiSnapshots
+        {where}
+        ORDER BY id
+    """
+    return query, params
+
+def _load_data(data):
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    return json.loads(data) if isinstance(data, str) else (data or {})
+
+def scan_schema(connection, companies=None, kpi_types=None, start_date=None, end_date=None,
+                batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Primeira leitura, só de (kpiType, data): {kpiType: colunas} com todas as chaves do JSON
+    dos snapshots filtrados, e não só as do primeiro bloco
+    """
+    query, params = build_query(companies, kpi_types, start_date, end_date, columns="kpiType, data")
+    types = {}
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for kpi_type, data in rows:
+                merge_types(types.setdefault(kpi_type, {}), _load_data(data))
+    finally:
+        cursor.close()
+    return {kpi_type: schema_columns(kpi_type, series_types) for kpi_type, series_types in types.items()}
+
+def export_snapshots(connection, output_dir, file_format, companies=None, kpi_types=None,
+                     start_date=None, end_date=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Exporta os snapshots filtrados; retorna {kpiType: (arquivo, linhas)}"""
+    os.makedirs(output_dir, exist_ok=True)
+    schemas = scan_schema(connection, companies, kpi_types, start_date, end_date, batch_size)
+    query, params = build_query(companies, kpi_types, start_date, end_date)
+
+    writers = {}
+    # Cursor não bufferizado: as linhas chegam do servidor conforme fetchmany
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for *base, data in rows:
+                kpi_type = base[3]
+                writer = writers.get(kpi_type)
+                if writer is None:
+                    path = os.path.join(output_dir, kpi_type + FORMATS[file_format])
+                    # kpiType gravado depois da primeira leitura: só as colunas do registro
+                    columns = schemas.get(kpi_type) or schema_columns(kpi_type, {})
+                    writer = writers[kpi_type] = KpiTypeWriter(path, file_format, kpi_type, columns, batch_size)
+                writer.add(base, _load_data(data))
+    finally:
+        cursor.close()
+        for writer in writers.values():
+            writer.close()
+
+    for writer in writers.values():
+        if writer.ignored_keys:
+            keys = ", ".join(sorted(".".join(path) for path in writer.ignored_keys)[:10])
+            print(f"  ⚠️  {writer.kpi_type}: campos gravados durante a exportação ignorados: {keys}")
+    return {kpi_type: (writer.path, writer.rows) for kpi_type, writer in writers.items()}
+
+def _date_arg(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value} (use YYYY-MM-DD)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Exporta kpiSnapshots para Parquet, Arrow ou CSV compactado (um arquivo por kpiType)"
+    )
+    parser.add_argument("output_dir", help="Diretório de saída")
+    parser.add_argument(
+        "--format",
+        choices=sorted(FORMATS),
+        default="parquet",
+        help="Formato dos arquivos (padrão: parquet; csv gera .csv.gz)",
+    )
+    parser.add_argument("--company", type=int, action="append", help="companyId a exportar (pode repetir)")
+    parser.add_argument("--kpi-type", action="append", help="kpiType a exportar (pode repetir)")
+    parser.add_argument("--start", type=_date_arg, help="Data inicial (YYYY-MM-DD, inclusiva)")
+    parser.add_argument("--end", type=_date_arg, help="Data final (YYYY-MM-DD, inclusiva)")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Linhas buscadas e gravadas por bloco (padrão: {DEFAULT_BATCH_SIZE})",
+    )
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.format != "csv":
+        try:
+            require_pyarrow()
+        except Exception as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    # Data final inclusiva: vai até o fim do dia
+    end_date = args.end.replace(hour=23, minute=59, second=59) if args.end else None
+
+    try:
+        connection = db_utils.get_connection()
+    except Exception as e:
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        sys.exit(1)
+
+    started = datetime.now()
+    try:
+        results = export_snapshots(
+            connection, args.output_dir, args.format, args.company, args.kpi_type,
+            args.start, end_date, max(1, args.batch_size),
+        )
+    except Exception as e:
+        print(f"❌ Erro na exportação: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    elapsed = (datetime.now() - started).total_seconds()
+    if not results:
+        print("⚠️  Nenhum snapshot encontrado com os filtros informados")
+        return
+    print(f"✅ Exportação concluída em {elapsed:.1f}s")
+    for kpi_type, (path, rows) in sorted(results.items()):
+        print(f"   {kpi_type}: {rows} snapshots → {path}")
+    print(f"   Total: {sum(rows for _, rows in results.values())} snapshots")
+
+if __name__ == "__main__":
+    main()
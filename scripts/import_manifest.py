@@ -0,0 +1,155 @@
+"""
+Manifesto da importação incremental (--incremental)
+
+Guarda, por aba, um hash do conteúdo de cada linha importada, indexado pela chave da
+linha (data, ou "data - empresa" na aba com coluna de empresa). Numa nova importação
+do mesmo histórico só as linhas novas ou alteradas são convertidas e gravadas; as
+alteradas viram atualizações do snapshot existente.
+
+O manifesto é um JSON ao lado do arquivo importado (ou no caminho informado) e só é
+gravado depois do commit. Ele registra também o banco de destino (host/banco, sem
+senha) e o hash do arquivo: se o arquivo for idêntico ao da última importação sem
+erros, não há nada a fazer.
+"""
+
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime
+
+from kpi_sheets import DATE_FORMAT, parse_date, is_instruction_row
+import db_utils
+import sqlite_backend
+
+# Situação de uma linha em relação ao manifesto
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+DUPLICATE = "duplicate"
+
+def database_target(database_url=None):
+    """Identifica o banco de destino sem expor a senha da DATABASE_URL"""
+    if db_utils.is_sqlite_url(database_url):
+        path = sqlite_backend.parse_sqlite_url(db_utils._database_url(database_url))
+        return f"sqlite:{os.path.abspath(path)}"
+    options = db_utils.parse_database_url(database_url)
+    return f"{options['host']}:{options['port']}/{options['database']}"
+
+def row_digest(row):
+    """Hash do conteúdo bruto da linha (valores das células na ordem das colunas)"""
+    return hashlib.blake2b(repr(tuple(row)).encode("utf-8"), digest_size=16).hexdigest()
+
+class RowManifest:
+    """Hashes das linhas já importadas, por aba e chave"""
+
+    def __init__(self, path, target, sheets=None, file_hash=None):
+        self.path = path
+        self.target = target
+        self.sheets = sheets or {}
+        self.file_hash = file_hash
+        self.staged = {}
+        self.failed = set()
+        self.counts = Counter()
+        # Linhas registradas desde o último checkpoint (desfeitas por rollback)
+        self.pending = []
+        self.committed_counts = Counter()
+
+    @classmethod
+    def open(cls, path, target):
+        """Carrega o manifesto; se não existir ou for de outro banco, começa vazio"""
+        if not os.path.exists(path):
+            return cls(path, target)
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("target") != target:
+            print(f"⚠️  Manifesto {path} é de outro banco ({state.get('target')}); importando tudo")
+            return cls(path, target)
+        return cls(path, target, state["sheets"], state.get("file_hash"))
+
+    def __len__(self):
+        return sum(len(rows) for rows in self.sheets.values())
+
+    @staticmethod
+    def row_key(spec, row):
+        """
+        Chave da linha no mesmo formato do rótulo usado pelo importador.
+        Linhas vazias, de instruções ou com data inválida não têm chave e seguem
+        para o conversor, que as ignora ou reporta o erro.
+        """
+        date_value = row[spec.index_of("date")]
+        if not date_value or is_instruction_row(date_value):
+            return None
+        try:
+            key = parse_date(date_value).strftime(DATE_FORMAT)
+        except ValueError:
+            return None
+        company_index = spec.index_of("company")
+        if company_index is not None:
+            if not row[company_index]:
+                return None
+            key += f" - {str(row[company_index]).strip()}"
+        return key
+
+    def check(self, sheet, key, row):
+        """Classifica a linha (NEW, CHANGED, UNCHANGED ou DUPLICATE) e registra o hash"""
+        staged = self.staged.setdefault(sheet, {})
+        if key in staged:
+            # Mesma chave repetida no arquivo: vale a primeira, como no índice de chaves
+            status = DUPLICATE
+        else:
+            digest = row_digest(row)
+            previous = self.sheets.get(sheet, {}).get(key)
+            staged[key] = digest
+            self.pending.append((sheet, key))
+            if previous is None:
+                status = NEW
+            elif previous == digest:
+                status = UNCHANGED
+            else:
+                status = CHANGED
+        self.counts[status] += 1
+        return status
+
+    def checkpoint(self):
+        """As linhas registradas até aqui tiveram commit no banco"""
+        self.pending = []
+        self.committed_counts = Counter(self.counts)
+
+    def rollback(self):
+        """Esquece as linhas registradas desde o último checkpoint (transação desfeita)"""
+        for sheet, key in self.pending:
+            self.staged[sheet].pop(key, None)
+            self.failed.discard((sheet, key))
+        self.pending = []
+        self.counts = Counter(self.committed_counts)
+
+    def discard(self, sheet, key):
+        """Linha que não chegou a ser gravada: fica fora do manifesto"""
+        self.failed.add((sheet, key))
+
+    def save(self, file_hash=None):
+        """
+        Incorpora as linhas desta importação (após o commit) e grava o manifesto.
+        `file_hash` só deve ser informado quando a importação terminou sem erros.
+        """
+        for sheet, staged in self.staged.items():
+            rows = self.sheets.setdefault(sheet, {})
+            for key, digest in staged.items():
+                if (sheet, key) not in self.failed:
+                    rows[key] = digest
+        self.staged = {}
+        self.failed = set()
+        self.pending = []
+        self.file_hash = file_hash
+        state = {
+            "target": self.target,
+            "file_hash": file_hash,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "sheets": self.sheets,
+        }
+        # Arquivo temporário e troca, como no diário de checkpoints
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
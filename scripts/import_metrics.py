@@ -0,0 +1,200 @@
+"""
+Instrumentação da importação: contadores, tempos por etapa e progresso
+
+- Tempos acumulados por etapa (read, convert, serialize, insert, commit), no total e por aba
+- Linha de progresso com linhas/s e ETA, atualizada no máximo a cada PROGRESS_INTERVAL
+  (no terminal reescreve a mesma linha; em logs, uma linha por intervalo)
+- Resumo final em JSON
+- Níveis de saída: quiet (só erros e resumo), normal (progresso e mensagens) e verbose
+  (também uma linha por snapshot, como antes)
+"""
+
+import json
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+STAGES = ("read", "convert", "serialize", "insert", "commit")
+
+PROGRESS_INTERVAL = 1.0
+LOG_PROGRESS_INTERVAL = 10.0
+
+def _rate(rows, seconds):
+    return round(rows / seconds, 1) if seconds > 0 else None
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class ImportMetrics:
+    """
+    Coleta as medidas de uma importação e controla o que é impresso.
+    Os laços quentes acumulam os tempos localmente e repassam com add_time/rows_done.
+    """
+
+    def __init__(self, quiet=False, verbose=False, stream=None):
+        self.quiet = quiet
+        self.verbose = verbose and not quiet
+        self.stream = stream or sys.stdout
+        self.interactive = self.stream.isatty()
+        self.interval = PROGRESS_INTERVAL if self.interactive else LOG_PROGRESS_INTERVAL
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.stages = Counter()
+        self.sheets = {}
+        self.errors = 0
+        self.current = None
+        self.last_progress = 0.0
+        self.progress_width = 0
+
+    # Saída
+
+    def _emit(self, message):
+        self._clear_progress()
+        print(message, file=self.stream)
+
+    def info(self, message):
+        if not self.quiet:
+            self._emit(message)
+
+    def detail(self, message):
+        """Linha por snapshot, só com --verbose"""
+        if self.verbose:
+            self._emit(message)
+
+    def error(self, message, sheet=None):
+        self.errors += 1
+        if sheet is not None:
+            self._sheet(sheet)["errors"] += 1
+        self._emit(message)
+
+    # Contadores e tempos
+
+    def _sheet(self, sheet):
+        state = self.sheets.get(sheet)
+        if state is None:
+            state = self.sheets[sheet] = {
+                "rows": 0,
+                "errors": 0,
+                "total_rows": None,
+                "seconds": 0.0,
+                "started": None,
+                "stages": Counter(),
+            }
+        return state
+
+    def start_sheet(self, sheet, total_rows=None):
+        state = self._sheet(sheet)
+        state["total_rows"] = total_rows
+        state["started"] = time.perf_counter()
+        self.current = sheet
+        self.last_progress = state["started"]
+
+    def finish_sheet(self, sheet):
+        state = self._sheet(sheet)
+        if state["started"] is not None:
+            state["seconds"] += time.perf_counter() - state["started"]
+            state["started"] = None
+        self.progress(force=True)
+        self._clear_progress(newline=True)
+        self.current = None
+
+    def add_time(self, stage, seconds, sheet=None):
+        self.stages[stage] += seconds
+        if sheet is not None:
+            self._sheet(sheet)["stages"][stage] += seconds
+
+    def rows_done(self, sheet, count=1):
+        self._sheet(sheet)["rows"] += count
+        now = time.perf_counter()
+        if now - self.last_progress >= self.interval:
+            self.last_progress = now
+            self.progress()
+
+    # Progresso
+
+    def progress(self, force=False):
+        if self.quiet or self.current is None:
+            return
+        state = self.sheets[self.current]
+        elapsed = time.perf_counter() - state["started"] if state["started"] else state["seconds"]
+        rows = state["rows"]
+        rate = rows / elapsed if elapsed > 0 else 0
+        line = f"⏳ {self.current}: {rows:,} linhas"
+        total = state["total_rows"]
+        if total:
+            line += f"/{total:,} ({min(rows / total, 1):.0%})"
+        line += f" | {rate:,.0f} linhas/s"
+        if total and rate > 0 and rows < total:
+            line += f" | ETA {format_duration((total - rows) / rate)}"
+        if self.interactive:
+            padding = " " * max(0, self.progress_width - len(line))
+            self.stream.write("\r" + line + padding)
+            self.stream.flush()
+            self.progress_width = len(line)
+        elif not force:
+            print(line, file=self.stream)
+
+    def _clear_progress(self, newline=False):
+        if self.interactive and self.progress_width:
+            self.stream.write("\n" if newline else "\r" + " " * self.progress_width + "\r")
+            self.stream.flush()
+            self.progress_width = 0
+
+    # Resumo
+
+    def merge(self, summary):
+        """Soma o resumo de outro processo (workers)"""
+        for stage, seconds in summary["stages"].items():
+            self.stages[stage] += seconds
+        for sheet, values in summary["sheets"].items():
+            state = self._sheet(sheet)
+            state["rows"] += values["rows"]
+            state["errors"] += values["errors"]
+            state["seconds"] += values["seconds"]
+            state["stages"].update(values["stages"])
+        self.errors += summary["errors"]
+
+    def summary(self, counters=None):
+        """
+        Resumo em dict (serializável em JSON). `counters` são os Counters por aba do
+        SnapshotBatcher (inserted, updated, skipped, failed).
+        """
+        elapsed = time.perf_counter() - self.started
+        rows = sum(state["rows"] for state in self.sheets.values())
+        sheets = {}
+        for sheet, state in self.sheets.items():
+            sheets[sheet] = {
+                "rows": state["rows"],
+                "errors": state["errors"],
+                "seconds": round(state["seconds"], 4),
+                "rows_per_sec": _rate(state["rows"], state["seconds"]),
+                "stages": {stage: round(seconds, 4) for stage, seconds in state["stages"].items()},
+            }
+            for name, counter in (counters or {}).items():
+                sheets[sheet][name] = counter.get(sheet, 0)
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "elapsed_seconds": round(elapsed, 4),
+            "rows": rows,
+            "rows_per_sec": _rate(rows, elapsed),
+            "errors": self.errors,
+            "stages": {stage: round(self.stages.get(stage, 0.0), 4) for stage in STAGES},
+            "sheets": sheets,
+            **{name: sum(counter.values()) for name, counter in (counters or {}).items()},
+        }
+
+    def print_stages(self):
+        if self.quiet:
+            return
+        timed = [(stage, self.stages.get(stage, 0.0)) for stage in STAGES]
+        print("   Tempo por etapa: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timed))
+
+def write_summary(summary, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,148 @@
+"""
+Validação offline (sem banco de dados) de planilhas e arquivos de importação
+
+Cada aba é carregada em um DataFrame e verificada coluna a coluna: tipos, formato de
+data, empresas desconhecidas, limites (ex: percentuais entre 0 e 100) e datas
+repetidas para a mesma empresa. O resultado é um relatório JSON com todas as
+ocorrências, para corrigir o arquivo antes de importar.
+"""
+
+import json
+import os
+import time
+from collections import Counter
+
+from openpyxl import load_workbook
+
+from kpi_sheets import SHEETS, INSTRUCTION_PREFIXES
+import columnar_ingest
+
+def read_sheet_frame(ws, spec, pd):
+    """Carrega as linhas de dados de uma aba (a partir da linha 2) em um DataFrame"""
+    width = spec.width
+    rows = (
+        tuple(row) + (None,) * (width - len(row)) if len(row) < width else row
+        for row in ws.iter_rows(min_row=2, max_col=width, values_only=True)
+    )
+    frame = pd.DataFrame.from_records(rows, columns=spec.headers)
+    # Linhas de instruções deixadas abaixo dos dados no modelo
+    date_column = frame[spec.headers[spec.index_of("date")]]
+    instructions = date_column.map(type).eq(str) & date_column.astype(str).str.startswith(INSTRUCTION_PREFIXES)
+    return frame[~instructions]
+
+def _issue(row, column, code, value, message):
+    return {"row": int(row), "column": column, "code": code, "value": str(value), "message": message}
+
+def check_limits(frame, spec, pd):
+    """Valores numéricos fora dos limites declarados no registro (min_value/max_value)"""
+    issues = []
+    for column in spec.columns:
+        if column.min_value is None and column.max_value is None:
+            continue
+        values = pd.to_numeric(frame[column.name], errors="coerce")
+        # Valores não numéricos já são reportados pela conversão (NaN não entra nas comparações)
+        bad = pd.Series(False, index=frame.index)
+        if column.min_value is not None:
+            bad |= values < column.min_value
+        if column.max_value is not None:
+            bad |= values > column.max_value
+        limits = f"[{column.min_value if column.min_value is not None else '-∞'}, " \
+                 f"{column.max_value if column.max_value is not None else '∞'}]"
+        for index, value in frame.loc[bad, column.name].items():
+            issues.append(_issue(
+                index + 2, column.name, "out_of_range", value,
+                f"'{column.name}' fora do intervalo {limits}: {value}",
+            ))
+    return issues
+
+def check_duplicates(frame, spec, pd):
+    """Datas repetidas para a mesma empresa dentro da aba"""
+    date_column = spec.headers[spec.index_of("date")]
+    keys = pd.DataFrame({"date": columnar_ingest.parse_dates(frame[date_column], pd)}, index=frame.index)
+    company_index = spec.index_of("company")
+    if company_index is not None:
+        keys["company"] = frame[spec.headers[company_index]].astype(str).str.strip()
+    keys = keys[keys["date"].notna()]
+    if keys.empty:
+        return []
+
+    subset = list(keys.columns)
+    duplicated = keys.duplicated(subset=subset, keep="first")
+    if not duplicated.any():
+        return []
+    keys["row"] = keys.index + 2
+    first_rows = keys.groupby(subset)["row"].transform("min")
+
+    issues = []
+    for index in keys.index[duplicated]:
+        day = keys.at[index, "date"].strftime("%Y-%m-%d")
+        where = f"{day} - {keys.at[index, 'company']}" if company_index is not None else day
+        issues.append(_issue(
+            index + 2, date_column, "duplicate_date", where,
+            f"Data repetida ({where}); primeira ocorrência na linha {first_rows[index]}",
+        ))
+    return issues
+
+def validate_frame(frame, spec):
+    """Valida um DataFrame no layout da aba `spec` e retorna o relatório da aba"""
+    pd = columnar_ingest.require_pandas()
+    frame = columnar_ingest.drop_blank_rows(frame, spec)
+    _, issues = columnar_ingest.convert_frame(frame, spec)
+    issues += check_limits(frame, spec, pd)
+    issues += check_duplicates(frame, spec, pd)
+    issues.sort(key=lambda issue: issue["row"])
+
+    rows_with_issues = len({issue["row"] for issue in issues})
+    return {
+        "kpiType": spec.kpi_type,
+        "rows": len(frame),
+        "valid_rows": len(frame) - rows_with_issues,
+        "errors": len(issues),
+        "errors_by_code": dict(Counter(issue["code"] for issue in issues)),
+        "issues": issues,
+    }
+
+def validate_file(path, sheet_name=None):
+    """Valida uma planilha .xlsx (todas as abas do registro) ou um arquivo CSV/Parquet/JSONL"""
+    pd = columnar_ingest.require_pandas()
+    started = time.perf_counter()
+    report = {"file": os.path.abspath(path), "valid": True, "sheets": {}, "missing_sheets": []}
+
+    if columnar_ingest.is_columnar_file(path):
+        spec = columnar_ingest.detect_sheet_spec(path, sheet_name)
+        frame = pd.concat(list(columnar_ingest.iter_frames(path, columns=spec.headers)))
+        report["sheets"][spec.name] = validate_frame(frame, spec)
+    else:
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for spec in SHEETS:
+                if spec.name not in wb.sheetnames:
+                    report["missing_sheets"].append(spec.name)
+                    continue
+                frame = read_sheet_frame(wb[spec.name], spec, pd)
+                report["sheets"][spec.name] = validate_frame(frame, spec)
+        finally:
+            wb.close()
+
+    sheets = report["sheets"].values()
+    report["total_rows"] = sum(sheet["rows"] for sheet in sheets)
+    report["total_errors"] = sum(sheet["errors"] for sheet in sheets)
+    report["valid"] = report["total_errors"] == 0
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+def write_report(report, report_path):
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+def print_report_summary(report, max_issues=10):
+    print(f"\n🔎 Validação de {report['file']} ({report['elapsed_seconds']}s)")
+    for sheet in report["missing_sheets"]:
+        print(f"⚠️  Aba '{sheet}' não encontrada")
+    for name, sheet in report["sheets"].items():
+        icon = "✅" if not sheet["errors"] else "❌"
+        print(f"{icon} {name}: {sheet['rows']} linhas, {sheet['valid_rows']} válidas, {sheet['errors']} erros")
+        for issue in sheet["issues"][:max_issues]:
+            print(f"  ✗ Linha {issue['row']}: {issue['message']}")
+        if sheet["errors"] > max_issues:
+            print(f"  ... e mais {sheet['errors'] - max_issues} erros (veja o relatório JSON)")
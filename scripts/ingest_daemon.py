@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Importação contínua a partir de uma pasta monitorada
+
+Fica em execução observando a pasta de entrada: cada planilha .xlsx ou arquivo
+CSV/Parquet/JSONL que chega é importado com import_historical_data.run_import.
+Estrutura da pasta:
+
+    entrada/              arquivos novos (o parceiro ou o cron copia para cá)
+    entrada/processing/   arquivos em importação
+    entrada/done/         importados, com <arquivo>.report.json, .log e .metrics.json
+    entrada/failed/       com erro, com os mesmos relatórios
+    entrada/.manifests/   manifestos do --incremental, um por nome de arquivo
+
+Um arquivo só entra na fila depois de ficar --settle segundos sem mudar de tamanho
+(cópias ainda em andamento não são lidas pela metade). Os arquivos são importados
+em --workers processos em paralelo; cada processo mantém sua conexão com o banco
+entre um arquivo e outro em vez de reconectar a cada importação.
+
+Arquivos que ficaram em processing/ numa parada anterior voltam para a fila ao iniciar.
+
+Com --incremental o manifesto de cada arquivo fica em .manifests/<arquivo>.manifest.json
+e não acompanha o arquivo para done/: quando o parceiro envia de novo um arquivo com o
+mesmo nome, só as linhas novas ou alteradas são importadas.
+
+Uso:
+    python3 scripts/ingest_daemon.py /srv/kpi/entrada
+    python3 scripts/ingest_daemon.py /srv/kpi/entrada --workers 4 -- --idempotent update --streaming
+    python3 scripts/ingest_daemon.py /srv/kpi/entrada --once     # importa o que houver e termina
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime
+
+import columnar_ingest
+from db_utils import DB_ERRORS
+import import_historical_data
+
+EXTENSIONS = (".xlsx",) + columnar_ingest.COLUMNAR_EXTENSIONS
+
+PROCESSING_DIR = "processing"
+DONE_DIR = "done"
+FAILED_DIR = "failed"
+MANIFESTS_DIR = ".manifests"
+
+DEFAULT_WORKERS = 2
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_SETTLE_SECONDS = 5.0
+
+# Opções do importador que não combinam com a importação pela pasta
+UNSUPPORTED_IMPORT_OPTIONS = {
+    "workers": "--workers (use o --workers do daemon)",
+    "resume": "--resume",
+    "validate_only": "--validate-only",
+    "profile": "--profile",
+    "metrics": "--metrics (o resumo vai para done/ ou failed/)",
+}
+
+# Conexão do processo worker, reaproveitada entre os arquivos
+_connection = None
+_connection_overrides = {}
+
+def is_ingestable(name):
+    """Arquivos aceitos; temporários do Excel (~$), ocultos e parciais são ignorados"""
+    lower = name.lower()
+    return lower.endswith(EXTENSIONS) and not name.startswith(("~$", "."))
+
+def unique_path(directory, name):
+    """Caminho livre em `directory`; repetições recebem o horário como prefixo"""
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return path
+    return os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}_{name}")
+
+def prepare_dirs(root):
+    for name in (PROCESSING_DIR, DONE_DIR, FAILED_DIR, MANIFESTS_DIR):
+        os.makedirs(os.path.join(root, name), exist_ok=True)
+
+def manifest_path(root, name):
+    """Manifesto do --incremental de um arquivo: fixo na pasta monitorada, pelo nome do arquivo"""
+    return os.path.join(root, MANIFESTS_DIR, f"{name}.manifest.json")
+
+def recover_processing(root):
+    """Devolve à fila os arquivos que ficaram em processing/ (parada no meio da importação)"""
+    processing = os.path.join(root, PROCESSING_DIR)
+    recovered = 0
+    for name in sorted(os.listdir(processing)):
+        if is_ingestable(name):
+            os.replace(os.path.join(processing, name), unique_path(root, name))
+            recovered += 1
+    return recovered
+
+class DropFolder:
+    """
+    Varre a pasta de entrada e devolve os arquivos prontos: tamanho e mtime iguais
+    aos da varredura anterior e sem alteração há pelo menos `settle` segundos
+    """
+
+    def __init__(self, root, settle):
+        self.root = root
+        self.settle = settle
+        self.seen = {}
+
+    def ready(self):
+        now = time.time()
+        current = {}
+        ready = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.is_file() or not is_ingestable(entry.name):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime)
+                current[entry.path] = signature
+                if self.seen.get(entry.path) == signature and now - stat.st_mtime >= self.settle:
+                    ready.append((stat.st_mtime, entry.path))
+        self.seen = current
+        # Mais antigos primeiro
+        return [path for _, path in sorted(ready)]
+
+    def forget(self, path):
+        self.seen.pop(path, None)
+
+def parse_import_options(options):
+    """Valida as opções repassadas ao importador (as mesmas de import_historical_data.py)"""
+    args = import_historical_data.parse_args(["arquivo.xlsx", *options])
+    defaults = import_historical_data.parse_args(["arquivo.xlsx"])
+    for attr, label in UNSUPPORTED_IMPORT_OPTIONS.items():
+        if getattr(args, attr) != getattr(defaults, attr):
+            raise ValueError(f"{label} não pode ser usado na importação pela pasta")
+    if args.commit_every and not args.idempotent:
+        # Um arquivo que volta de processing/ é importado do início: os blocos já confirmados duplicariam
+        raise ValueError("--commit-every exige --idempotent skip ou update na importação pela pasta")
+    if args.incremental:
+        raise ValueError(
+            f"--incremental não aceita caminho na importação pela pasta (os manifestos ficam em {MANIFESTS_DIR}/)"
+        )
+    return args
+
+def init_worker(overrides):
+    global _connection_overrides
+    _connection_overrides = overrides
+    # Ctrl+C e SIGTERM são tratados pelo processo principal, que espera os arquivos em andamento
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+def worker_connection():
+    """Conexão do processo, reaberta só se tiver caído desde o último arquivo"""
+    global _connection
+    if _connection is not None and not _connection.is_connected():
+        reset_worker_connection()
+    if _connection is None:
+        _connection = import_historical_data.get_db_connection(**_connection_overrides)
+    return _connection
+
+def reset_worker_connection():
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.close()
+        except DB_ERRORS:
+            pass
+    _connection = None
+
+def last_error_line(log_path):
+    """Última mensagem de erro (❌) que o importador imprimiu no log"""
+    sys.stdout.flush()
+    with open(log_path, encoding="utf-8") as f:
+        errors = [line.strip().lstrip("❌").strip() for line in f if line.lstrip().startswith("❌")]
+    return errors[-1] if errors else None
+
+def ingest_file(path, options, manifest=None):
+    """
+    Importa um arquivo de processing/ no processo worker. A saída do importador vai
+    para <arquivo>.log; retorna o relatório (status, contadores, duração e erro).
+    `manifest` é o caminho do manifesto quando as opções incluem --incremental.
+    """
+    args = import_historical_data.parse_args([path, *options])
+    args.metrics = f"{path}.metrics.json"
+    if args.incremental is not None:
+        args.incremental = manifest
+    report = {
+        "file": os.path.basename(path),
+        "worker_pid": os.getpid(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    started = time.perf_counter()
+    counters, error = None, None
+    with open(f"{path}.log", "w", encoding="utf-8") as log, redirect_stdout(log), redirect_stderr(log):
+        try:
+            counters = import_historical_data.run_import(args, connection=worker_connection())
+            if counters is None:
+                error = last_error_line(f"{path}.log") or "falha ao gravar no banco (detalhes no log)"
+        except SystemExit:
+            # O importador encerra com sys.exit em arquivo inválido ou sem conexão
+            error = last_error_line(f"{path}.log") or "importação interrompida (detalhes no log)"
+        except Exception as e:
+            traceback.print_exc()
+            error = str(e)
+            reset_worker_connection()
+    report["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    report["duration_s"] = round(time.perf_counter() - started, 3)
+    report["status"] = "failed" if error else "done"
+    if error:
+        report["error"] = error
+    if counters:
+        report["totals"] = {name: sum(values.values()) for name, values in counters.items()}
+        report["counters"] = counters
+    return report
+
+def finish_file(root, path, report):
+    """Move o arquivo e seus relatórios (.log, .metrics.json, .journal.json) para done/ ou failed/"""
+    target_dir = os.path.join(root, DONE_DIR if report["status"] == "done" else FAILED_DIR)
+    target = unique_path(target_dir, os.path.basename(path))
+    os.replace(path, target)
+    processing = os.path.dirname(path)
+    prefix = os.path.basename(path) + "."
+    for name in os.listdir(processing):
+        if name.startswith(prefix) and not is_ingestable(name):
+            os.replace(os.path.join(processing, name), target + name[len(prefix) - 1:])
+    report["path"] = target
+    with open(f"{target}.report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return target
+
+def failure_report(path, error):
+    now = datetime.now().isoformat(timespec="seconds")
+    return {"file": os.path.basename(path), "started_at": now, "finished_at": now, "status": "failed", "error": error}
+
+def print_result(report):
+    if report["status"] == "done":
+        details = ", ".join(f"{name}: {count}" for name, count in report.get("totals", {}).items() if count)
+        print(f"✅ {report['file']} importado em {report.get('duration_s', 0):.1f}s" + (f" ({details})" if details else ""))
+    else:
+        print(f"❌ {report['file']}: {report['error']}")
+
+def run(args, import_options):
+    root = args.watch_dir
+    import_args = parse_import_options(import_options)
+    # LOAD DATA LOCAL INFILE precisa ser habilitado também no cliente
+    overrides = {"allow_local_infile": True} if import_args.bulk_load else {}
+    prepare_dirs(root)
+    recovered = recover_processing(root)
+    if recovered:
+        print(f"♻️  {recovered} arquivo(s) de uma execução anterior voltaram para a fila")
+    folder = DropFolder(root, args.settle)
+    # --once não espera a acomodação: os arquivos já estão completos na pasta
+    if args.once:
+        folder.settle = 0
+        folder.ready()
+
+    print(f"👀 Monitorando {os.path.abspath(root)} com {args.workers} worker(s)")
+    executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(overrides,))
+    inflight = {}
+    totals = {"done": 0, "failed": 0}
+    stopping = False
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        while True:
+            try:
+                if not stopping:
+                    for path in folder.ready():
+                        folder.forget(path)
+                        processing_path = unique_path(os.path.join(root, PROCESSING_DIR), os.path.basename(path))
+                        try:
+                            os.replace(path, processing_path)
+                        except FileNotFoundError:
+                            continue
+                        print(f"📥 Na fila: {os.path.basename(path)}")
+                        manifest = manifest_path(root, os.path.basename(path))
+                        future = executor.submit(ingest_file, processing_path, import_options, manifest)
+                        inflight[future] = processing_path
+
+                if not inflight:
+                    if args.once or stopping:
+                        break
+                    time.sleep(args.poll_interval)
+                    continue
+
+                finished, _ = wait(inflight, timeout=args.poll_interval, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in finished:
+                    path = inflight.pop(future)
+                    try:
+                        report = future.result()
+                    except BrokenProcessPool as e:
+                        # Um worker morreu (ex.: falta de memória): o pool é recriado
+                        broken = True
+                        report = failure_report(path, f"worker interrompido: {e}")
+                    finish_file(root, path, report)
+                    totals[report["status"]] += 1
+                    print_result(report)
+                if broken:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(overrides,))
+            except KeyboardInterrupt:
+                if stopping:
+                    raise
+                stopping = True
+                print(f"\n⏹️  Encerrando: aguardando {len(inflight)} arquivo(s) em andamento (Ctrl+C de novo para abortar)")
+    except KeyboardInterrupt:
+        print("⚠️  Abortado: arquivos em andamento ficam em processing/ e voltam para a fila no próximo início")
+        for process in multiprocessing.active_children():
+            process.terminate()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    print(f"\n📊 Importados: {totals['done']}, com erro: {totals['failed']}")
+    return totals
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Importa continuamente as planilhas e CSVs que chegam a uma pasta",
+        epilog="Opções após -- são repassadas ao import_historical_data.py (ex.: -- --idempotent skip --streaming)",
+    )
+    parser.add_argument("watch_dir", help="Pasta monitorada (done/, failed/ e processing/ são criadas dentro dela)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Arquivos importados em paralelo, um processo e uma conexão cada (padrão: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=f"Segundos entre as varreduras da pasta (padrão: {DEFAULT_POLL_INTERVAL:g})",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=DEFAULT_SETTLE_SECONDS,
+        help=f"Segundos sem alteração antes de importar um arquivo (padrão: {DEFAULT_SETTLE_SECONDS:g})",
+    )
+    parser.add_argument("--once", action="store_true", help="Importa os arquivos presentes e termina")
+    argv = sys.argv[1:]
+    split = argv.index("--") if "--" in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    args.import_options = argv[split + 1:]
+    if args.workers < 1:
+        parser.error("--workers deve ser pelo menos 1")
+    return args
+
+def main():
+    args = parse_args()
+    if not os.path.isdir(args.watch_dir):
+        print(f"❌ Pasta não encontrada: {args.watch_dir}")
+        sys.exit(1)
+    try:
+        totals = run(args, args.import_options)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    sys.exit(1 if args.once and totals["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
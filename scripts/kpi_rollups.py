@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Pré-calcula tendências dos KPIs a partir de kpiSnapshots (tabela kpiRollups)
+
+Cada série (companyId, kpiType) é lida uma única vez e montada como uma matriz
+NumPy (dias × métricas, com todas as métricas numéricas do JSON `data`, incluindo
+cada rede de `seguidores`). Agregados diários, semanais e mensais, variações em
+relação ao período anterior e médias móveis saem de operações vetorizadas sobre a
+matriz inteira, sem laço por métrica ou por dia.
+
+Por padrão o recálculo é incremental: só os períodos a partir da data mais antiga
+com snapshots novos ou regravados (createdAt ou updatedAt posterior ao último cálculo
+da série) são regravados.
+computedAt é a hora do banco lida antes de carregar a série, então snapshots gravados
+durante o cálculo entram no próximo.
+
+Uso:
+    python3 scripts/kpi_rollups.py                   # todas as séries, incremental
+    python3 scripts/kpi_rollups.py --company 1 --kpi-type blue_consult_all --full
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from export_snapshots import flatten
+from kpi_sheets import parse_date
+import db_utils
+import sqlite_backend
+
+# Tabela declarada em drizzle/schema.ts (kpiRollups) e criada pela migração
+# drizzle/migrations/0004_kpi_rollups.sql; o mesmo DDL é repetido aqui para bancos ainda
+# não migrados. No SQLite local o esquema equivalente vem de sqlite_backend.
+CREATE_ROLLUPS_TABLE = """
+CREATE TABLE IF NOT EXISTS `kpiRollups` (
+    `id` int AUTO_INCREMENT NOT NULL,
+    `companyId` int NOT NULL DEFAULT 0,
+    `kpiType` varchar(100) NOT NULL,
+    `metric` varchar(191) NOT NULL,
+    `period` enum('day','week','month') NOT NULL,
+    `periodStart` timestamp NOT NULL,
+    `lastValue` double,
+    `avgValue` double,
+    `minValue` double,
+    `maxValue` double,
+    `samples` int NOT NULL DEFAULT 0,
+    `delta` double,
+    `deltaPct` double,
+    `rollingAvg` double,
+    `computedAt` timestamp NOT NULL DEFAULT (now()),
+    CONSTRAINT `kpiRollups_id` PRIMARY KEY(`id`),
+    UNIQUE INDEX `kpiRollups_series_period_idx` (`companyId`,`kpiType`,`metric`,`period`,`periodStart`)
+)
+"""
+
+# kpiSnapshots.updatedAt (drizzle/migrations/0009_kpi_snapshots_updated_at.sql), para bancos
+# ainda não migrados
+ADD_UPDATED_AT_COLUMN = """
+ALTER TABLE `kpiSnapshots` ADD `updatedAt` timestamp DEFAULT (now()) NOT NULL ON UPDATE CURRENT_TIMESTAMP
+"""
+
+INSERT_ROLLUP_QUERY = """
+INSERT INTO kpiRollups
+    (companyId, kpiType, metric, period, periodStart, lastValue, avgValue, minValue, maxValue,
+     samples, delta, deltaPct, rollingAvg, computedAt)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Janela da média móvel de cada período (em períodos): 7 dias, 4 semanas, 3 meses
+ROLLING_WINDOWS = {"day": 7, "week": 4, "month": 3}
+
+# Histórico extra lido antes da data de corte no modo incremental, para que
+# variações e médias móveis dos primeiros períodos recalculados fiquem corretas
+LOOKBACK_MONTHS = ROLLING_WINDOWS["month"] + 1
+
+DEFAULT_BATCH_SIZE = 1000
+
+def _month_start(day):
+    return datetime(day.year, day.month, 1)
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return datetime(day.year + month // 12, month % 12 + 1, 1)
+
+class Series:
+    """
+    Série de um (companyId, kpiType) em uma grade diária contínua:
+    `days` (datetime64[D]) e `values` (dias × métricas, NaN onde não há dado).
+    Quando há mais de um snapshot no mesmo dia, vale o último valor de cada métrica.
+    """
+
+    def __init__(self, days, metrics, values):
+        self.days = days
+        self.metrics = metrics
+        self.values = values
+
+    @classmethod
+    def from_snapshots(cls, snapshots):
+        """snapshots: lista de (snapshotDate, data) em ordem de data e id"""
+        if not snapshots:
+            return None
+        points = []
+        metric_index = {}
+        for snapshot_date, data in snapshots:
+            numeric = {}
+            for path, value in flatten(data).items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    numeric[metric_index.setdefault(".".join(path), len(metric_index))] = value
+            points.append((snapshot_date, numeric))
+
+        dates = np.array([np.datetime64(snapshot_date.date(), "D") for snapshot_date, _ in points])
+        first = dates.min()
+        offsets = (dates - first).astype(np.int64)
+        values = np.full((int(offsets.max()) + 1, len(metric_index)), np.nan)
+        # Em ordem: o último snapshot do dia sobrescreve os anteriores
+        for offset, (_, numeric) in zip(offsets, points):
+            if numeric:
+                values[offset, list(numeric)] = list(numeric.values())
+
+        days = first + np.arange(values.shape[0])
+        metrics = sorted(metric_index, key=metric_index.get)
+        return cls(days, metrics, values)
+
+def _period_keys(days, period):
+    if period == "day":
+        return days
+    if period == "week":
+        # Semanas começando na segunda-feira (1970-01-01 foi uma quinta)
+        return days - ((days.astype(np.int64) + 3) % 7)
+    return days.astype("datetime64[M]").astype("datetime64[D]")
+
+def _forward_fill(values):
+    """Repete o último valor conhecido de cada coluna nas linhas seguintes"""
+    present = ~np.isnan(values)
+    index = np.where(present, np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = values[index, np.arange(values.shape[1])]
+    filled[~np.maximum.accumulate(present, axis=0)] = np.nan
+    return filled
+
+def _rolling_mean(values, window):
+    """Média móvel das últimas `window` linhas, ignorando NaN"""
+    present = ~np.isnan(values)
+    sums = np.cumsum(np.where(present, values, 0.0), axis=0)
+    counts = np.cumsum(present, axis=0)
+    sums[window:] = sums[window:] - sums[:-window].copy()
+    counts[window:] = counts[window:] - counts[:-window].copy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+def aggregate(series, period):
+    """
+    Agrega a série por período. Retorna (início de cada período, dict de matrizes
+    períodos × métricas): last, avg, min, max, samples, delta, delta_pct, rolling_avg.
+    `delta` compara o último valor do período com o último valor conhecido antes dele.
+    """
+    keys = _period_keys(series.days, period)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    values = series.values
+    present = ~np.isnan(values)
+    samples = np.add.reduceat(present, starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg = np.add.reduceat(np.where(present, values, 0.0), starts, axis=0) / samples
+        low = np.fmin.reduceat(values, starts, axis=0)
+        high = np.fmax.reduceat(values, starts, axis=0)
+
+        filled = _forward_fill(values)
+        last = np.where(samples > 0, filled[ends], np.nan)
+        previous = np.full_like(last, np.nan)
+        previous[1:] = filled[ends[:-1]]
+        delta = last - previous
+        delta_pct = np.where(previous != 0, delta / np.abs(previous) * 100, np.nan)
+
+    avg[samples == 0] = np.nan
+    return keys[starts], {
+        "last": last,
+        "avg": avg,
+        "min": low,
+        "max": high,
+        "samples": samples,
+        "delta": delta,
+        "delta_pct": delta_pct,
+        "rolling_avg": _rolling_mean(last, ROLLING_WINDOWS[period]),
+    }
+
+def _nullable(value):
+    return None if np.isnan(value) else round(float(value), 6)
+
+def rollup_rows(series, company_id, kpi_type, cutoffs, computed_at):
+    """Gera as linhas de kpiRollups dos períodos iniciados a partir de cutoffs[period]"""
+    for period in ROLLING_WINDOWS:
+        period_starts, stats = aggregate(series, period)
+        cutoff = cutoffs.get(period)
+        selected = np.ones(len(period_starts), dtype=bool)
+        if cutoff is not None:
+            selected = period_starts >= np.datetime64(cutoff.date(), "D")
+        for row, column in zip(*np.nonzero(selected[:, None] & (stats["samples"] > 0))):
+            yield (
+                company_id or 0,
+                kpi_type,
+                series.metrics[column],
+                period,
+                period_starts[row].astype("datetime64[s]").astype(datetime),
+                _nullable(stats["last"][row, column]),
+                _nullable(stats["avg"][row, column]),
+                _nullable(stats["min"][row, column]),
+                _nullable(stats["max"][row, column]),
+                int(stats["samples"][row, column]),
+                _nullable(stats["delta"][row, column]),
+                _nullable(stats["delta_pct"][row, column]),
+                _nullable(stats["rolling_avg"][row, column]),
+                computed_at,
+            )
+
+def _series_condition(company_id):
+    return ("companyId = %s", company_id) if company_id else ("companyId IS NULL", None)
+
+def list_series(cursor, companies=None, kpi_types=None):
+    conditions = []
+    params = []
+    if companies:
+        conditions.append(f"companyId IN ({', '.join(['%s'] * len(companies))})")
+        params.extend(companies)
+    if kpi_types:
+        conditions.append(f"kpiType IN ({', '.join(['%s'] * len(kpi_types))})")
+        params.extend(kpi_types)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor.execute(f"SELECT DISTINCT companyId, kpiType FROM kpiSnapshots {where} ORDER BY companyId, kpiType", params)
+    return cursor.fetchall()
+
+def find_changes_since(cursor, company_id, kpi_type):
+    """
+    Data mais antiga com snapshots gravados ou regravados (--idempotent update,
+    --incremental, carga em massa) depois do último cálculo da série.
+    Retorna None se não houver nada novo e a data mínima da série se nunca foi calculada.
+    """
+    cursor.execute(
+        "SELECT MAX(computedAt) FROM kpiRollups WHERE companyId = %s AND kpiType = %s",
+        (company_id or 0, kpi_type),
+    )
+    computed_at = cursor.fetchone()[0]
+    condition, company_param = _series_condition(company_id)
+    params = [kpi_type] + ([company_param] if company_id else [])
+    query = f"SELECT MIN(snapshotDate) FROM kpiSnapshots WHERE kpiType = %s AND {condition}"
+    if computed_at is not None:
+        # updatedAt é nulo nas linhas inseridas em arquivos SQLite anteriores à coluna
+        query += " AND COALESCE(updatedAt, createdAt) >= %s"
+        params.append(computed_at)
+    cursor.execute(query, params)
+    return db_utils.as_datetime(cursor.fetchone()[0])
+
+def load_series(cursor, company_id, kpi_type, since=None):
+    condition, company_param = _series_condition(company_id)
+    params = [kpi_type] + ([company_param] if company_id else [])
+    query = f"SELECT snapshotDate, data FROM kpiSnapshots WHERE kpiType = %s AND {condition}"
+    if since is not None:
+        query += " AND snapshotDate >= %s"
+        params.append(since)
+    cursor.execute(query + " ORDER BY snapshotDate, id", params)
+    snapshots = []
+    for snapshot_date, data in cursor.fetchall():
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode("utf-8")
+        data = json.loads(data) if isinstance(data, str) else data
+        if isinstance(data, dict):
+            snapshots.append((snapshot_date, data))
+    return Series.from_snapshots(snapshots)
+
+def rollup_series(connection, company_id, kpi_type, since=None, full=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recalcula os rollups de uma série e grava em uma transação.
+    Sem `full`, recalcula a partir de `since` (ou da data mais antiga alterada).
+    Retorna o número de linhas gravadas (None se a série já estava em dia).
+    """
+    cursor = connection.cursor()
+    try:
+        if not full and since is None:
+            since = find_changes_since(cursor, company_id, kpi_type)
+            if since is None:
+                return None
+
+        cutoffs = {}
+        load_from = None
+        if not full:
+            cutoffs = {
+                "day": datetime(since.year, since.month, since.day),
+                "week": datetime(since.year, since.month, since.day) - timedelta(days=since.weekday()),
+                "month": _month_start(since),
+            }
+            load_from = _add_months(_month_start(since), -LOOKBACK_MONTHS)
+
+        # Marca d'água antes da leitura: o que for gravado depois entra no próximo cálculo
+        computed_at = db_utils.server_now(cursor)
+        series = load_series(cursor, company_id, kpi_type, load_from)
+
+        if full:
+            cursor.execute(
+                "DELETE FROM kpiRollups WHERE companyId = %s AND kpiType = %s",
+                (company_id or 0, kpi_type),
+            )
+        else:
+            cursor.execute(
+                """
+                DELETE FROM kpiRollups
+                WHERE companyId = %s AND kpiType = %s
+                  AND ((period = 'day' AND periodStart >= %s)
+                    OR (period = 'week' AND periodStart >= %s)
+                    OR (period = 'month' AND periodStart >= %s))
+                """,
+                (company_id or 0, kpi_type, cutoffs["day"], cutoffs["week"], cutoffs["month"]),
+            )
+
+        written = 0
+        batch = []
+        if series is not None:
+            for row in rollup_rows(series, company_id, kpi_type, cutoffs, computed_at):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    cursor.executemany(INSERT_ROLLUP_QUERY, batch)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(INSERT_ROLLUP_QUERY, batch)
+                written += len(batch)
+        connection.commit()
+        return written
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def ensure_table(connection):
+    if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+        return
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_ROLLUPS_TABLE)
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'kpiSnapshots' AND column_name = 'updatedAt'
+            """
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(ADD_UPDATED_AT_COLUMN)
+    finally:
+        cursor.close()
+
+def _date_arg(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value} (use YYYY-MM-DD)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Pré-calcula agregados, variações e médias móveis dos KPIs em kpiRollups"
+    )
+    parser.add_argument("--company", type=int, action="append", help="companyId a recalcular (pode repetir)")
+    parser.add_argument("--kpi-type", action="append", help="kpiType a recalcular (pode repetir)")
+    parser.add_argument("--full", action="store_true", help="Recalcula a série inteira em vez de só o que mudou")
+    parser.add_argument(
+        "--since",
+        type=_date_arg,
+        help="Recalcula a partir desta data (YYYY-MM-DD), ex: após uma importação com --idempotent update",
+    )
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    try:
+        connection = db_utils.get_connection()
+    except Exception as e:
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        sys.exit(1)
+
+    try:
+        ensure_table(connection)
+        cursor = connection.cursor()
+        series_list = list_series(cursor, args.company, args.kpi_type)
+        cursor.close()
+
+        print(f"📈 {len(series_list)} séries encontradas em kpiSnapshots")
+        total = 0
+        for company_id, kpi_type in series_list:
+            label = f"{kpi_type} (empresa {company_id if company_id else 'global'})"
+            written = db_utils.run_with_retry(
+                lambda: rollup_series(connection, company_id, kpi_type, args.since, args.full)
+            )
+            if written is None:
+                print(f"  ⏭️  {label}: sem snapshots novos")
+                continue
+            total += written
+            print(f"  ✓ {label}: {written} linhas de rollup")
+        print(f"\n✅ Rollups atualizados: {total} linhas gravadas")
+    except Exception as e:
+        print(f"\n❌ Erro ao calcular rollups: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
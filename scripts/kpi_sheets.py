@@ -0,0 +1,271 @@
+"""
+Registro declarativo das abas da planilha de importação de KPIs
+
+Cada aba descreve suas colunas (nome, tipo, caminho no JSON `data`), o kpiType/source
+gravado em kpiSnapshots e a empresa. O importador (import_historical_data.py) e o
+gerador do modelo (create_template.py) usam este registro, então adicionar uma nova
+aba de KPI é só acrescentar um SheetSpec em SHEETS.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+DATE_FORMAT = "%Y-%m-%d"
+
+# Mapeamento de empresas (coluna "empresa") para IDs
+COMPANY_MAP = {
+    "Blue Consult": 1,
+    "Tokeniza": 2,
+    "Tokeniza Academy": 4,
+    "Mychel Mendes": 30004,
+}
+
+# Linhas de instruções deixadas abaixo dos dados no modelo
+INSTRUCTION_PREFIXES = ("INSTRUÇÕES", "•")
+
+# Palavra-chave (propriedades do arquivo) da planilha de reposição de snapshot_coverage.py:
+# nela o importador ignora as linhas sem nenhuma métrica preenchida
+GAP_FILL_KEYWORD = "kpi-gap-fill"
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    type: str  # date, company, int ou float
+    description: str
+    key: Optional[str] = None  # caminho no JSON (ex: "seguidores.instagram"); padrão = name
+    min_value: Optional[float] = None  # limites verificados pela validação (--validate-only)
+    max_value: Optional[float] = None
+
+    @property
+    def path(self):
+        return (self.key or self.name).split(".")
+
+@dataclass(frozen=True)
+class SheetSpec:
+    name: str
+    kpi_type: str
+    source: str
+    description: str
+    columns: Tuple[Column, ...]
+    company_id: Optional[int] = None  # None = empresa vem da coluna "empresa"
+    row_summary: str = ""  # resumo impresso por linha, formatado com o JSON `data`
+    examples: Tuple[Tuple, ...] = ()  # linhas de exemplo do modelo (sem a data)
+    empty_rows: int = 6  # linhas vazias deixadas no modelo para preenchimento
+
+    @property
+    def headers(self):
+        return [column.name for column in self.columns]
+
+    @property
+    def width(self):
+        return len(self.columns)
+
+    def index_of(self, column_type):
+        for index, column in enumerate(self.columns):
+            if column.type == column_type:
+                return index
+        return None
+
+# Limites usuais de validação
+PERCENT = {"min_value": 0, "max_value": 100}
+NON_NEGATIVE = {"min_value": 0}
+
+def _col(name, type, description, key=None, **limits):
+    # Contagens nunca são negativas
+    if type == "int":
+        limits = {**NON_NEGATIVE, **limits}
+    return Column(name, type, description, key, **limits)
+
+SHEETS = (
+    SheetSpec(
+        name="Blue Consult",
+        kpi_type="blue_consult_all",
+        source="consolidated",
+        company_id=1,
+        description="Dados de vendas (Pipedrive) e financeiro (Nibo)",
+        columns=(
+            _col("data", "date", "Formato YYYY-MM-DD (ex: 2024-10-01)"),
+            _col("faturamento_mensal", "float", "Valor em reais sem símbolo (ex: 180000.00)", **NON_NEGATIVE),
+            _col("novos_clientes", "int", "Número inteiro de clientes novos"),
+            _col("clientes_implantacao", "int", "Número de clientes em implantação"),
+            _col("taxa_conversao", "float", "Percentual sem símbolo % (ex: 89.8)", **PERCENT),
+            _col("receitas_nibo", "float", "Receitas do Nibo em reais", **NON_NEGATIVE),
+            _col("despesas_nibo", "float", "Despesas do Nibo em reais", **NON_NEGATIVE),
+            _col("saldo_nibo", "float", "Saldo (receitas - despesas)"),
+        ),
+        row_summary="Faturamento R$ {faturamento_mensal:,.2f}",
+        examples=(("180000.00", "12", "61", "89.8", "17800.00", "246300.00", "-228600.00"),),
+    ),
+    SheetSpec(
+        name="Tokeniza Academy",
+        kpi_type="tokeniza_academy_all",
+        source="consolidated",
+        company_id=4,
+        description="Dados do Discord e plataforma Cademi",
+        columns=(
+            _col("data", "date", "Formato YYYY-MM-DD"),
+            _col("total_membros_discord", "int", "Total de membros no Discord"),
+            _col("membros_online", "int", "Membros online no momento"),
+            _col("novos_membros_7d", "int", "Novos membros nos últimos 7 dias"),
+            _col("novos_membros_30d", "int", "Novos membros nos últimos 30 dias"),
+            _col("total_alunos_cademi", "int", "Total de alunos cadastrados"),
+            _col("alunos_ativos", "int", "Alunos com acesso ativo"),
+            _col("total_cursos", "int", "Número de cursos disponíveis"),
+        ),
+        row_summary="{total_membros_discord} membros Discord",
+        examples=(("1854", "154", "5", "6", "450", "320", "8"),),
+    ),
+    SheetSpec(
+        name="Redes Sociais",
+        kpi_type="metricool_social",
+        source="metricool",
+        description="Métricas de todas as redes sociais (Metricool)",
+        columns=(
+            _col("data", "date", "Formato YYYY-MM-DD"),
+            _col("empresa", "company", "Nome da empresa (" + ", ".join(COMPANY_MAP) + ")"),
+            _col("total_posts", "int", "Número de posts publicados"),
+            _col("total_interacoes", "int", "Soma de curtidas, comentários, compartilhamentos"),
+            _col("engagement_medio", "float", "Taxa de engajamento em % sem símbolo (ex: 2.09)", **PERCENT),
+            _col("alcance_total", "int", "Número de pessoas alcançadas"),
+            _col("impressoes_total", "int", "Número total de impressões"),
+            _col("seguidores_instagram", "int", "Seguidores no Instagram", "seguidores.instagram"),
+            _col("seguidores_facebook", "int", "Seguidores no Facebook", "seguidores.facebook"),
+            _col("seguidores_youtube", "int", "Seguidores no YouTube", "seguidores.youtube"),
+            _col("seguidores_twitter", "int", "Seguidores no Twitter/X", "seguidores.twitter"),
+            _col("seguidores_linkedin", "int", "Seguidores no LinkedIn", "seguidores.linkedin"),
+            _col("seguidores_tiktok", "int", "Seguidores no TikTok", "seguidores.tiktok"),
+            _col("seguidores_threads", "int", "Seguidores no Threads", "seguidores.threads"),
+        ),
+        row_summary="{total_posts} posts",
+        examples=(
+            ("Blue Consult", "61", "363", "2.09", "6600", "95400", "14200", "1", "202", "0", "0", "0", "0"),
+            ("Tokeniza", "61", "363", "2.09", "6600", "95400", "14200", "1", "202", "0", "0", "0", "0"),
+            ("Tokeniza Academy", "180", "229", "0.1", "4940", "8500", "1200", "50", "100", "0", "0", "0", "0"),
+            ("Mychel Mendes", "725", "9400", "0.57", "99200", "190300", "52800", "1", "97200", "0", "0", "300", "0"),
+        ),
+        empty_rows=3,
+    ),
+    SheetSpec(
+        name="Cademi Cursos",
+        kpi_type="cademi_courses",
+        source="cademi",
+        company_id=4,
+        description="Dados detalhados da plataforma de cursos",
+        columns=(
+            _col("data", "date", "Formato YYYY-MM-DD"),
+            _col("total_alunos", "int", "Total de alunos cadastrados"),
+            _col("alunos_ativos", "int", "Alunos com acesso ativo aos cursos"),
+            _col("alunos_inativos", "int", "Alunos sem acesso ativo"),
+            _col("total_cursos", "int", "Número de cursos disponíveis"),
+            _col("taxa_ativacao", "float", "Percentual de alunos ativos (ex: 71.1)", **PERCENT),
+        ),
+        row_summary="{total_alunos} alunos",
+        examples=(("450", "320", "130", "8", "71.1"),),
+    ),
+)
+
+SHEETS_BY_NAME = {sheet.name: sheet for sheet in SHEETS}
+
+def parse_date(value):
+    """
+    Converte a célula de data em datetime (meia-noite).
+    Células de data nativas do openpyxl são usadas diretamente, sem ida e volta por str.
+    """
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = str(value).strip()
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        try:
+            return datetime.fromisoformat(text)
+        except ValueError:
+            pass
+    # Formato inválido: strptime levanta o erro com a mensagem padrão
+    return datetime.strptime(text, DATE_FORMAT)
+
+class UnknownCompanyError(ValueError):
+    """Empresa fora de COMPANY_MAP: o importador avisa e ignora a linha (não é erro)"""
+
+def resolve_company(value):
+    company_name = str(value).strip()
+    if company_name not in COMPANY_MAP:
+        raise UnknownCompanyError(f"Empresa desconhecida: {company_name}")
+    return COMPANY_MAP[company_name]
+
+def is_instruction_row(value):
+    return isinstance(value, str) and value.startswith(INSTRUCTION_PREFIXES)
+
+def _to_int(value):
+    return int(value) if value else 0
+
+def _to_float(value):
+    return float(value) if value else 0
+
+CASTS = {"int": _to_int, "float": _to_float}
+
+def _fields(spec, typed):
+    """(chaves pai, chave, índice, conversão) de cada coluna de métrica, na ordem das colunas"""
+    fields = []
+    for index, column in enumerate(spec.columns):
+        if column.type in ("date", "company"):
+            continue
+        if column.type not in CASTS:
+            raise ValueError(f"Tipo de coluna inválido para valor: {column.type}")
+        *parents, leaf = column.path
+        fields.append((tuple(parents), leaf, index, None if typed else CASTS[column.type]))
+    return fields
+
+def _build_data(fields, row):
+    data = {}
+    for parents, leaf, index, cast in fields:
+        node = data
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        value = row[index]
+        node[leaf] = cast(value) if cast is not None else value
+    return data
+
+def build_converter(spec, typed=False):
+    """
+    Monta uma função convert(row) -> (company_id, snapshot_date, data) para a aba.
+    O plano de conversão (índice, caminho no JSON e tipo de cada coluna) é resolvido
+    uma única vez a partir do registro; por linha só restam as conversões.
+    Retorna None para linhas vazias ou de instruções.
+
+    Com typed=True a linha já chega convertida e validada (data como datetime,
+    empresa como id, números prontos), como no ingest colunar: o conversor só
+    monta o JSON `data`.
+    """
+    date_index = spec.index_of("date")
+    company_index = spec.index_of("company")
+    fields = _fields(spec, typed)
+
+    if typed:
+        def convert_typed(row):
+            company_id = row[company_index] if company_index is not None else spec.company_id
+            return company_id, row[date_index], _build_data(fields, row)
+        return convert_typed
+
+    def convert(row):
+        date_value = row[date_index]
+        if not date_value or (company_index is not None and not row[company_index]):
+            return None
+        if is_instruction_row(date_value):
+            return None
+        company_id = resolve_company(row[company_index]) if company_index is not None else spec.company_id
+        return company_id, parse_date(date_value), _build_data(fields, row)
+    return convert
+
+def build_unfilled_check(spec):
+    """
+    Monta uma função unfilled(row) -> True se nenhuma métrica da linha foi preenchida
+    (só a data e a empresa), como as linhas ainda não preenchidas da planilha de
+    reposição de snapshot_coverage.py. Zero é valor preenchido; só células vazias contam.
+    """
+    metric_indexes = [index for index, column in enumerate(spec.columns) if column.type not in ("date", "company")]
+
+    def unfilled(row):
+        return all(row[index] is None or row[index] == "" for index in metric_indexes)
+    return unfilled
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Pré-aquecimento em lote do cache da Jornada de Leads (leadJourneyCache)
+
+leadJourneyService.getLeadJourney() busca Mautic e Pipedrive em série para cada
+e-mail e guarda o resultado por 24h: a primeira consulta do dia a cada lead é lenta.
+Este script busca vários leads ao mesmo tempo e grava o cache antes do uso:
+
+- e-mails da linha de comando, de um arquivo (um por linha) ou das buscas recentes
+  em leadJourneySearches
+- entradas ainda válidas por mais de --refresh-within horas são mantidas; as
+  ausentes, expiradas ou perto de expirar são buscadas de novo
+- concorrência limitada (--concurrency leads em paralelo) e limite de requisições
+  por segundo separado para cada API, com novas tentativas em 429 e 5xx
+- upsert em lote em leadJourneyCache, no mesmo formato gravado pelo servidor
+  (mauticData com `acquisition`, datas normalizadas, expiresAt em 24h)
+
+Os clientes de API são objetos com uma corrotina (`get_lead_journey(email)` no Mautic,
+`get_person_data(email)` no Pipedrive). Os padrões falam HTTP com urllib; --mautic-url
+e --pipedrive-url apontam para servidores locais de teste.
+
+Uso:
+    python3 scripts/lead_journey_warmer.py --from-searches 30
+    python3 scripts/lead_journey_warmer.py --emails-file leads.txt --concurrency 16
+    python3 scripts/lead_journey_warmer.py lead@exemplo.com outro@exemplo.com --dry-run
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import re
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from datetime import datetime, timedelta
+
+import db_utils
+import sqlite_backend
+
+# Validade do cache, como em leadJourneyService.getLeadJourney()
+CACHE_TTL = timedelta(hours=24)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_REFRESH_WITHIN_HOURS = 2.0
+DEFAULT_MAUTIC_RPS = 5.0
+DEFAULT_PIPEDRIVE_RPS = 8.0
+DEFAULT_BATCH_SIZE = 50
+
+DEFAULT_MAUTIC_URL = "https://mautic.grupoblue.com.br"
+DEFAULT_PIPEDRIVE_URL = "https://api.pipedrive.com/v1"
+
+HTTP_TIMEOUT = 30.0
+HTTP_ATTEMPTS = 4
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+UPSERT_CACHE_QUERY = """
+INSERT INTO leadJourneyCache (email, mauticData, pipedriveData, aiAnalysis, cachedAt, expiresAt)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    mauticData = VALUES(mauticData), pipedriveData = VALUES(pipedriveData),
+    aiAnalysis = VALUES(aiAnalysis), cachedAt = VALUES(cachedAt), expiresAt = VALUES(expiresAt)
+"""
+
+UTM_FIELDS = ("utm_source", "utm_medium", "utm_campaign", "utm_content", "utm_term")
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}")
+
+class RateLimiter:
+    """Balde de fichas: no máximo `rate` requisições por segundo, com rajada de `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HttpError(Exception):
+    def __init__(self, status, url, message=""):
+        super().__init__(f"HTTP {status} em {url} {message}".strip())
+        self.status = status
+
+class HttpJsonClient:
+    """GET com resposta JSON, limitado pelo RateLimiter; a chamada bloqueante roda em uma thread"""
+
+    def __init__(self, base_url, limiter, headers=None, params=None, timeout=HTTP_TIMEOUT, attempts=HTTP_ATTEMPTS):
+        self.base_url = base_url.rstrip("/")
+        self.limiter = limiter
+        self.headers = {"Accept": "application/json", **(headers or {})}
+        self.params = params or {}
+        self.timeout = timeout
+        self.attempts = attempts
+        self.requests = 0
+
+    def _fetch(self, url):
+        request = urllib.request.Request(url, headers=self.headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode("utf-8") or "null")
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get("Retry-After") if e.headers else None
+            error = HttpError(e.code, url.split("?")[0])
+            error.retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            raise error
+
+    async def get(self, path, params=None):
+        query = urllib.parse.urlencode({**self.params, **(params or {})})
+        url = f"{self.base_url}/{path.lstrip('/')}" + (f"?{query}" if query else "")
+        for attempt in range(1, self.attempts + 1):
+            await self.limiter.acquire()
+            self.requests += 1
+            try:
+                return await asyncio.to_thread(self._fetch, url)
+            except (HttpError, urllib.error.URLError, TimeoutError) as e:
+                status = getattr(e, "status", None)
+                if attempt == self.attempts or (status is not None and status not in RETRYABLE_STATUS):
+                    raise
+                delay = getattr(e, "retry_after", None) or min(0.5 * 2 ** (attempt - 1), 10.0)
+                await asyncio.sleep(delay)
+
+class MauticClient:
+    """Mesmo fluxo de mauticService.getLeadJourney(): contato, depois atividades, campanhas e segmentos"""
+
+    def __init__(self, http):
+        self.http = http
+
+    async def search_contact(self, email):
+        response = await self.http.get("/api/contacts", {"search": f"email:{email}", "limit": 1})
+        contacts = (response or {}).get("contacts") or {}
+        if not contacts:
+            return None
+        if isinstance(contacts, list):
+            return contacts[0]
+        return contacts[next(iter(contacts))]
+
+    async def all_activity(self, contact_id):
+        events = []
+        page = 1
+        while True:
+            response = await self.http.get(f"/api/contacts/{contact_id}/activity", {"page": page, "limit": 100})
+            events.extend(response.get("events") or [])
+            if page >= (response.get("maxPages") or 1):
+                return events
+            page += 1
+
+    async def _values(self, path, key):
+        response = await self.http.get(path)
+        values = (response or {}).get(key) or {}
+        return list(values.values()) if isinstance(values, dict) else list(values)
+
+    async def get_lead_journey(self, email):
+        contact = await self.search_contact(email)
+        if not contact:
+            return None
+        activities, campaigns, segments = await asyncio.gather(
+            self.all_activity(contact["id"]),
+            self._values(f"/api/contacts/{contact['id']}/campaigns", "campaigns"),
+            self._values(f"/api/contacts/{contact['id']}/segments", "lists"),
+        )
+        return {"contact": contact, "activities": activities, "campaigns": campaigns, "segments": segments}
+
+class PipedriveClient:
+    """Mesmo resultado de getPipedriveDataByEmail(): pessoa, negócios e o negócio ganho"""
+
+    def __init__(self, http):
+        self.http = http
+
+    async def get_person_data(self, email):
+        empty = {"person": None, "deals": [], "wonDeal": None}
+        response = await self.http.get("persons/search", {"term": email})
+        if not response or not response.get("success") or not response.get("data"):
+            return empty
+        data = response["data"]
+        # A busca da API v1 devolve {"items": [{"item": pessoa}]}
+        if isinstance(data, dict):
+            items = data.get("items") or []
+            person = items[0].get("item") if items else None
+        else:
+            person = data[0]
+        if not person:
+            return empty
+        deals_response = await self.http.get(f"persons/{person['id']}/deals") or {}
+        deals = (deals_response.get("data") or []) if deals_response.get("success") else []
+        won_deal = next((deal for deal in deals if deal.get("status") == "won"), None)
+        return {"person": person, "deals": deals, "wonDeal": won_deal}
+
+def default_clients(args):
+    """Clientes HTTP com as credenciais do servidor (MAUTIC_* e PIPEDRIVE_API_TOKEN)"""
+    mautic_auth = f"{os.getenv('MAUTIC_CLIENT_ID', '')}:{os.getenv('MAUTIC_CLIENT_SECRET', '')}"
+    mautic_http = HttpJsonClient(
+        args.mautic_url or os.getenv("MAUTIC_BASE_URL") or DEFAULT_MAUTIC_URL,
+        RateLimiter(args.mautic_rps),
+        headers={"Authorization": "Basic " + base64.b64encode(mautic_auth.encode()).decode("ascii")},
+    )
+    pipedrive_http = HttpJsonClient(
+        args.pipedrive_url or DEFAULT_PIPEDRIVE_URL,
+        RateLimiter(args.pipedrive_rps),
+        params={"api_token": os.getenv("PIPEDRIVE_API_TOKEN", ""), "limit": 500, "status": "all_not_deleted"},
+    )
+    return MauticClient(mautic_http), PipedriveClient(pipedrive_http)
+
+def _timestamp(event):
+    try:
+        return datetime.fromisoformat(str(event.get("timestamp")).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return float("inf")
+
+def analyze_acquisition(mautic_data):
+    """UTMs da primeira visita (page.hit) ou, na falta, a primeira utmtag do contato"""
+    page_hits = [event for event in mautic_data.get("activities") or [] if event.get("event") == "page.hit"]
+    first_hit = min(page_hits, key=_timestamp) if page_hits else None
+    details = (first_hit or {}).get("details") or {}
+    query = details.get("query") or (details.get("properties") or {}).get("query")
+    if isinstance(query, str):
+        query = dict(urllib.parse.parse_qsl(query.lstrip("?")))
+    if isinstance(query, dict):
+        acquisition = {field: query.get(field) or None for field in UTM_FIELDS}
+        if any(acquisition.values()):
+            return acquisition
+    utm_tags = (mautic_data.get("contact") or {}).get("utmtags") or []
+    return utm_tags[0] if utm_tags else None
+
+def normalize_dates(value):
+    """Datas ISO em strings viram 'YYYY-MM-DD HH:MM:SS', como normalizeDates() em leadJourneyDb.ts"""
+    if isinstance(value, str):
+        if _ISO_DATE.match(value):
+            value = value.replace("T", " ", 1)
+            value = re.sub(r"\.\d{3}Z?$", "", value)
+            value = re.sub(r"[+-]\d{2}:\d{2}$", "", value)
+        return value
+    if isinstance(value, list):
+        return [normalize_dates(item) for item in value]
+    if isinstance(value, dict):
+        return {key: normalize_dates(item) for key, item in value.items()}
+    return value
+
+def load_search_emails(connection, days=None, limit=None):
+    """E-mails distintos de leadJourneySearches, dos mais buscados recentemente para os mais antigos"""
+    conditions, params = [], []
+    if days:
+        conditions.append("searchedAt >= %s")
+        params.append(datetime.now() - timedelta(days=days))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT email, MAX(searchedAt) AS lastSearch FROM leadJourneySearches {where} GROUP BY email ORDER BY lastSearch DESC"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def fresh_emails(connection, emails, refresh_before):
+    """E-mails cujo cache ainda vale depois de `refresh_before` (não precisam ser buscados)"""
+    fresh = set()
+    cursor = connection.cursor()
+    try:
+        step = max(1, db_utils.max_params(connection) - 1)
+        for offset in range(0, len(emails), step):
+            chunk = emails[offset:offset + step]
+            cursor.execute(
+                f"SELECT email FROM leadJourneyCache WHERE expiresAt > %s AND email IN ({', '.join(['%s'] * len(chunk))})",
+                [refresh_before, *chunk],
+            )
+            fresh.update(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+    return fresh
+
+def cache_row(email, mautic_data, pipedrive_data, now):
+    mautic_data = {**mautic_data, "acquisition": analyze_acquisition(mautic_data)}
+    return (
+        email,
+        json.dumps(normalize_dates(mautic_data), ensure_ascii=False),
+        json.dumps(normalize_dates(pipedrive_data), ensure_ascii=False),
+        "",  # a análise por IA é refeita pelo servidor, como em saveLeadJourneyCache()
+        now,
+        now + CACHE_TTL,
+    )
+
+def write_rows(connection, rows):
+    """Upsert em lote (uma transação por lote, com novas tentativas)"""
+    query = sqlite_backend.UPSERT_LEAD_CACHE_QUERY if db_utils.dialect(connection) == sqlite_backend.DIALECT else UPSERT_CACHE_QUERY
+
+    def write():
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(query, rows)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    db_utils.run_with_retry(write)
+
+class CacheWarmer:
+    """Busca os leads com no máximo `concurrency` em paralelo e grava em lotes de `batch_size`"""
+
+    def __init__(self, connection, mautic, pipedrive, concurrency=DEFAULT_CONCURRENCY,
+                 batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+        self.connection = connection
+        self.mautic = mautic
+        self.pipedrive = pipedrive
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.batch_size = max(1, batch_size)
+        self.dry_run = dry_run
+        self.pending = []
+        self.counts = Counter()
+        self.errors = []
+
+    async def fetch(self, email):
+        async with self.semaphore:
+            mautic_data = await self.mautic.get_lead_journey(email)
+            if not mautic_data:
+                return None
+            pipedrive_data = await self.pipedrive.get_person_data(email)
+            return cache_row(email, mautic_data, pipedrive_data, datetime.now().replace(microsecond=0))
+
+    def flush(self):
+        if self.pending and not self.dry_run:
+            # Gravação síncrona e curta: só um lote por vez usa a conexão
+            write_rows(self.connection, self.pending)
+        self.counts["written"] += len(self.pending)
+        self.pending = []
+
+    async def run(self, emails):
+        tasks = {asyncio.ensure_future(self.fetch(email)): email for email in emails}
+        for done in asyncio.as_completed(tasks):
+            try:
+                row = await done
+            except Exception as e:
+                self.counts["failed"] += 1
+                self.errors.append(str(e))
+                continue
+            if row is None:
+                self.counts["not_found"] += 1
+                continue
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+            done_count = sum(self.counts.values()) + len(self.pending)
+            if done_count % 100 == 0:
+                print(f"  ⏳ {done_count}/{len(emails)} leads processados")
+        self.flush()
+
+def read_emails(args):
+    emails = list(args.emails)
+    if args.emails_file:
+        with open(args.emails_file, encoding="utf-8") as f:
+            emails.extend(line.strip() for line in f)
+    return emails
+
+def normalize_emails(emails):
+    """Sem vazios nem repetidos, na ordem original"""
+    return list(dict.fromkeys(email.strip() for email in emails if email and email.strip() and "@" in email))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pré-aquece o cache da Jornada de Leads (leadJourneyCache)")
+    parser.add_argument("emails", nargs="*", help="E-mails dos leads")
+    parser.add_argument("--emails-file", help="Arquivo com um e-mail por linha")
+    parser.add_argument(
+        "--from-searches",
+        type=int,
+        nargs="?",
+        const=0,
+        metavar="DIAS",
+        help="Inclui os e-mails de leadJourneySearches (opcionalmente só dos últimos N dias)",
+    )
+    parser.add_argument("--limit", type=int, help="Com --from-searches: no máximo N e-mails, dos mais recentes")
+    parser.add_argument(
+        "--refresh-within",
+        type=float,
+        default=DEFAULT_REFRESH_WITHIN_HOURS,
+        help=f"Busca de novo entradas que expiram nas próximas N horas (padrão: {DEFAULT_REFRESH_WITHIN_HOURS:g})",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Leads buscados em paralelo (padrão: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--mautic-rps",
+        type=float,
+        default=DEFAULT_MAUTIC_RPS,
+        help=f"Requisições por segundo ao Mautic (padrão: {DEFAULT_MAUTIC_RPS:g}; 0 = sem limite)",
+    )
+    parser.add_argument(
+        "--pipedrive-rps",
+        type=float,
+        default=DEFAULT_PIPEDRIVE_RPS,
+        help=f"Requisições por segundo ao Pipedrive (padrão: {DEFAULT_PIPEDRIVE_RPS:g}; 0 = sem limite)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Leads por upsert em lote (padrão: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument("--mautic-url", help="URL base do Mautic (padrão: MAUTIC_BASE_URL)")
+    parser.add_argument("--pipedrive-url", help=f"URL base da API do Pipedrive (padrão: {DEFAULT_PIPEDRIVE_URL})")
+    parser.add_argument("--dry-run", action="store_true", help="Busca nas APIs mas não grava o cache")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    try:
+        connection = db_utils.get_connection()
+    except Exception as e:
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        sys.exit(1)
+
+    try:
+        emails = read_emails(args)
+        if args.from_searches is not None:
+            emails.extend(load_search_emails(connection, args.from_searches, args.limit))
+        emails = normalize_emails(emails)
+        if not emails:
+            print("❌ Nenhum e-mail informado (use e-mails, --emails-file ou --from-searches)")
+            sys.exit(1)
+
+        fresh = fresh_emails(connection, emails, datetime.now() + timedelta(hours=args.refresh_within))
+        # A leitura não deve segurar a transação durante as buscas
+        connection.commit()
+        stale = [email for email in emails if email not in fresh]
+        print(f"🔥 {len(emails)} leads: {len(fresh)} com cache válido, {len(stale)} a buscar")
+        if not stale:
+            return
+
+        mautic, pipedrive = default_clients(args)
+        warmer = CacheWarmer(connection, mautic, pipedrive, args.concurrency, args.batch_size, args.dry_run)
+        started = time.perf_counter()
+        asyncio.run(warmer.run(stale))
+        elapsed = time.perf_counter() - started
+
+        counts = warmer.counts
+        verb = "buscados (simulação, sem gravar)" if args.dry_run else "gravados no cache"
+        print(f"\n✅ {counts['written']} leads {verb} em {elapsed:.1f}s ({len(stale) / elapsed:.1f} leads/s)")
+        print(f"   Não encontrados no Mautic: {counts['not_found']}")
+        print(f"   Requisições: Mautic {mautic.http.requests}, Pipedrive {pipedrive.http.requests}")
+        if counts["failed"]:
+            print(f"   ⚠️  Falhas: {counts['failed']}")
+            for error in warmer.errors[:10]:
+                print(f"     ✗ {error}")
+    except Exception as e:
+        print(f"\n❌ Erro no pré-aquecimento: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Tabela estreita de métricas numéricas (kpiMetricValues) ao lado do JSON de kpiSnapshots
+
+Cada valor numérico do JSON `data` (incluindo os aninhados, como seguidores.instagram)
+vira uma linha (snapshotId, companyId, snapshotDate, kpiType, metric, value). O índice
+(metric, companyId, snapshotDate, value) atende consultas de intervalo de uma métrica
+sem ler nem interpretar o JSON, ex: faturamento_mensal da empresa 1 no último ano.
+
+As linhas são gravadas pelo importador (--metric-values) ou por este script, que
+preenche os snapshots que ainda não têm métricas (backfill). Snapshots processados
+são retomados naturalmente: cada bloco é confirmado com commit e só os snapshots sem
+linhas em kpiMetricValues são lidos de novo.
+
+Os ids de AUTO_INCREMENT são alocados na ordem do INSERT, não do commit: um snapshot
+de outra transação pode ficar visível depois de outro com id maior. Por isso a marca
+d'água do importador recua ID_OVERLAP ids, e a regravação é idempotente (o NOT EXISTS
+ignora os snapshots já processados e o INSERT atualiza a linha se ela já existir).
+
+Uso:
+    python3 scripts/metric_values.py                           # backfill de tudo o que falta
+    python3 scripts/metric_values.py --kpi-type blue_consult_all --start 2024-01-01
+    python3 scripts/metric_values.py --company 1 --rebuild      # regrava as métricas da empresa
+"""
+
+import argparse
+import json
+import math
+import sys
+
+from export_snapshots import flatten
+from kpi_sheets import parse_date
+import db_utils
+import sqlite_backend
+
+# Tabela declarada em drizzle/schema.ts (kpiMetricValues) e criada pela migração
+# drizzle/migrations/0005_kpi_metric_values.sql; o mesmo DDL é repetido aqui para bancos
+# ainda não migrados. No SQLite local o esquema equivalente vem de sqlite_backend.
+CREATE_METRIC_VALUES_TABLE = """
+CREATE TABLE IF NOT EXISTS `kpiMetricValues` (
+    `id` int AUTO_INCREMENT NOT NULL,
+    `snapshotId` int NOT NULL,
+    `companyId` int NOT NULL DEFAULT 0,
+    `snapshotDate` timestamp NOT NULL,
+    `kpiType` varchar(100) NOT NULL,
+    `metric` varchar(191) NOT NULL,
+    `value` double NOT NULL,
+    CONSTRAINT `kpiMetricValues_id` PRIMARY KEY(`id`),
+    UNIQUE INDEX `kpiMetricValues_snapshot_metric_idx` (`snapshotId`,`metric`),
+    INDEX `kpiMetricValues_metric_company_date_idx` (`metric`,`companyId`,`snapshotDate`,`value`)
+)
+"""
+
+# Idempotente: uma linha já gravada por outra transação é atualizada em vez de duplicar
+UPSERT_METRIC_VALUE_QUERY = """
+INSERT INTO kpiMetricValues (snapshotId, companyId, snapshotDate, kpiType, metric, value)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    companyId = VALUES(companyId), snapshotDate = VALUES(snapshotDate),
+    kpiType = VALUES(kpiType), value = VALUES(value)
+"""
+
+SNAPSHOT_COLUMNS = "s.id, s.companyId, s.snapshotDate, s.kpiType, s.data"
+
+# Snapshots lidos (e confirmados, no backfill) por bloco
+DEFAULT_CHUNK_SIZE = 1000
+
+# Linhas de métricas por INSERT em lote
+DEFAULT_BATCH_SIZE = 1000
+
+# Ids relidos abaixo da marca d'água, para os snapshots confirmados fora de ordem
+ID_OVERLAP = 1000
+
+def ensure_table(connection):
+    if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+        return
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_METRIC_VALUES_TABLE)
+    finally:
+        cursor.close()
+
+def metric_rows(snapshot_id, company_id, snapshot_date, kpi_type, data):
+    """Linhas de kpiMetricValues de um snapshot: só folhas numéricas e finitas do JSON"""
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    if isinstance(data, str):
+        data = json.loads(data)
+    if not isinstance(data, dict):
+        return []
+    rows = []
+    for path, value in flatten(data).items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if not math.isfinite(value):
+            continue
+        rows.append((snapshot_id, company_id or 0, snapshot_date, kpi_type, ".".join(path), float(value)))
+    return rows
+
+def max_snapshot_id(cursor):
+    cursor.execute("SELECT MAX(id) FROM kpiSnapshots")
+    return cursor.fetchone()[0] or 0
+
+def _in_list(column, values):
+    return f"{column} IN ({', '.join(['%s'] * len(values))})"
+
+def snapshot_filters(companies=None, kpi_types=None, start=None, end=None):
+    """Condições (sobre o alias s de kpiSnapshots) e parâmetros dos filtros da linha de comando"""
+    conditions = []
+    params = []
+    if companies:
+        conditions.append(_in_list("s.companyId", companies))
+        params.extend(companies)
+    if kpi_types:
+        conditions.append(_in_list("s.kpiType", kpi_types))
+        params.extend(kpi_types)
+    if start:
+        conditions.append("s.snapshotDate >= %s")
+        params.append(start)
+    if end:
+        conditions.append("s.snapshotDate <= %s")
+        params.append(end)
+    return conditions, params
+
+class MetricValueWriter:
+    """
+    Grava as métricas dos snapshots novos ou atualizados dentro da transação de quem chama.
+
+    `after_id` é a marca d'água: snapshots com id maior e ainda sem métricas são lidos em
+    blocos (paginação pelo id, com o cursor bufferizado para poder gravar na mesma conexão).
+    Sem `after_id`, começa ID_OVERLAP ids antes do maior id atual.
+    Snapshots atualizados são informados pelo id e têm as métricas apagadas e regravadas.
+    """
+
+    def __init__(self, connection, after_id=None, chunk_size=DEFAULT_CHUNK_SIZE, conditions=(), params=()):
+        self.connection = connection
+        self.chunk_size = max(1, chunk_size)
+        self.conditions = list(conditions)
+        self.params = list(params)
+        self.cursor = connection.cursor()
+        if after_id is None:
+            after_id = max(0, max_snapshot_id(self.cursor) - ID_OVERLAP)
+        self.after_id = after_id
+        self.upsert_query = UPSERT_METRIC_VALUE_QUERY
+        if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+            self.upsert_query = sqlite_backend.UPSERT_METRIC_VALUE_QUERY
+        self.written = 0
+        self.snapshots = 0
+        self.max_params = db_utils.max_params(connection)
+
+    def _select(self, conditions, params, limit=None):
+        where = " AND ".join(self.conditions + conditions) or "1 = 1"
+        query = f"SELECT {SNAPSHOT_COLUMNS} FROM kpiSnapshots s WHERE {where} ORDER BY s.id"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        self.cursor.execute(query, self.params + params)
+        return self.cursor.fetchall()
+
+    def _write(self, snapshots):
+        rows = []
+        for snapshot in snapshots:
+            rows.extend(metric_rows(*snapshot))
+        for offset in range(0, len(rows), DEFAULT_BATCH_SIZE):
+            self.cursor.executemany(self.upsert_query, rows[offset:offset + DEFAULT_BATCH_SIZE])
+        self.written += len(rows)
+        self.snapshots += len(snapshots)
+
+    def _delete(self, snapshot_ids):
+        self.cursor.execute(
+            f"DELETE FROM kpiMetricValues WHERE {_in_list('snapshotId', snapshot_ids)}", list(snapshot_ids)
+        )
+
+    def rewrite(self, snapshot_ids):
+        """Apaga e regrava as métricas dos snapshots informados (ex: atualizados pelo importador)"""
+        snapshot_ids = list(dict.fromkeys(snapshot_ids))
+        step = min(self.chunk_size, self.max_params - len(self.params))
+        for offset in range(0, len(snapshot_ids), step):
+            chunk = snapshot_ids[offset:offset + step]
+            self._delete(chunk)
+            self._write(self._select([_in_list("s.id", chunk)], chunk))
+
+    def next_missing(self):
+        """
+        Grava o próximo bloco de snapshots após a marca d'água que ainda não têm métricas.
+        Retorna False quando não há mais nada.
+        """
+        snapshots = self._select(
+            [
+                "s.id > %s",
+                "NOT EXISTS (SELECT 1 FROM kpiMetricValues m WHERE m.snapshotId = s.id)",
+            ],
+            [self.after_id],
+            self.chunk_size,
+        )
+        if not snapshots:
+            return False
+        self._write(snapshots)
+        self.after_id = snapshots[-1][0]
+        return True
+
+    def next_rebuild(self):
+        """Regrava as métricas do próximo bloco de snapshots após a marca d'água"""
+        snapshots = self._select(["s.id > %s"], [self.after_id], self.chunk_size)
+        if not snapshots:
+            return False
+        self._delete([snapshot[0] for snapshot in snapshots])
+        self._write(snapshots)
+        self.after_id = snapshots[-1][0]
+        return True
+
+    def sync(self, updated_ids=()):
+        """Grava tudo o que falta desde a marca d'água e regrava os snapshots atualizados"""
+        if updated_ids:
+            self.rewrite(updated_ids)
+        while self.next_missing():
+            pass
+
+    def close(self):
+        self.cursor.close()
+
+def backfill(connection, conditions, params, rebuild=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Percorre kpiSnapshots em blocos, com um commit (e novas tentativas) por bloco"""
+    writer = MetricValueWriter(connection, 0, chunk_size, conditions, params)
+    step = writer.next_rebuild if rebuild else writer.next_missing
+    try:
+        while True:
+            after_id, written, snapshots = writer.after_id, writer.written, writer.snapshots
+
+            def chunk():
+                # Em uma nova tentativa o bloco é refeito do início
+                writer.after_id, writer.written, writer.snapshots = after_id, written, snapshots
+                try:
+                    more = step()
+                    connection.commit()
+                    return more
+                except Exception:
+                    connection.rollback()
+                    raise
+
+            if not db_utils.run_with_retry(chunk):
+                break
+            print(f"  ✓ {writer.snapshots} snapshots, {writer.written} métricas (até o id {writer.after_id})")
+    finally:
+        writer.close()
+    return writer.snapshots, writer.written
+
+def _date_arg(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value} (use YYYY-MM-DD)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Preenche kpiMetricValues com as métricas numéricas dos snapshots de kpiSnapshots"
+    )
+    parser.add_argument("--company", type=int, action="append", help="companyId a processar (pode repetir)")
+    parser.add_argument("--kpi-type", action="append", help="kpiType a processar (pode repetir)")
+    parser.add_argument("--start", type=_date_arg, help="Data inicial dos snapshots (YYYY-MM-DD)")
+    parser.add_argument("--end", type=_date_arg, help="Data final dos snapshots, inclusiva (YYYY-MM-DD)")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Apaga e regrava as métricas de todos os snapshots do filtro (não só dos que faltam)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Snapshots por bloco e commit (padrão: {DEFAULT_CHUNK_SIZE})",
+    )
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    try:
+        connection = db_utils.get_connection()
+    except Exception as e:
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        sys.exit(1)
+
+    # Data final inclusiva: vai até o fim do dia
+    end = args.end.replace(hour=23, minute=59, second=59) if args.end else None
+    try:
+        ensure_table(connection)
+        conditions, params = snapshot_filters(args.company, args.kpi_type, args.start, end)
+        print("📐 Gravando métricas numéricas em kpiMetricValues...")
+        snapshots, written = backfill(connection, conditions, params, args.rebuild, args.chunk_size)
+        print(f"\n✅ Backfill concluído: {snapshots} snapshots, {written} métricas gravadas")
+    except Exception as e:
+        print(f"\n❌ Erro no backfill: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
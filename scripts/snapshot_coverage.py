@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Cobertura diária do histórico de kpiSnapshots: lacunas, dias duplicados e planilha de reposição
+
+Quando o job da meia-noite (SnapshotService) falha, o erro só aparece no log de
+dailySnapshot.ts e o dia fica faltando. Este script lê só (companyId, kpiType,
+snapshotDate) de kpiSnapshots, em uma única consulta ordenada pelo índice
+(companyId, kpiType, snapshotDate), e monta para cada série um bitmap de dias:
+
+- lacunas: diferenças maiores que 1 dia entre datas consecutivas do array ordenado
+- duplicados: diferenças iguais a 0 (mais de um snapshot no mesmo dia)
+
+Com --retention, a janela segue a política de snapshot_retention.py (mesmos
+--daily-days, --weekly-days e --as-of): antes do corte diário, o esperado é um snapshot
+por semana e, antes do corte semanal, um por mês. Os dias apagados pela compactação não
+contam como lacunas; só as semanas ou meses sem nenhum snapshot.
+
+Com --workbook, gera uma planilha no layout de create_template.py só com as datas
+faltantes (e a empresa, na aba Redes Sociais), para preencher e importar com
+import_historical_data.py --idempotent skip. A planilha leva a marca GAP_FILL_KEYWORD
+nas propriedades do arquivo: nela o importador ignora (e conta) as linhas deixadas sem
+nenhuma métrica, em vez de gravá-las como snapshots zerados.
+
+Uso:
+    python3 scripts/snapshot_coverage.py
+    python3 scripts/snapshot_coverage.py --start 2024-01-01 --end 2024-12-31 --workbook lacunas.xlsx
+    python3 scripts/snapshot_coverage.py --kpi-type metricool_social --report cobertura.json
+    python3 scripts/snapshot_coverage.py --retention --daily-days 90 --weekly-days 365
+"""
+
+import argparse
+import base64
+import json
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from create_template import create_template
+from kpi_sheets import SHEETS, COMPANY_MAP, DATE_FORMAT, GAP_FILL_KEYWORD, parse_date
+from snapshot_retention import DEFAULT_DAILY_DAYS, DEFAULT_WEEKLY_DAYS, retention_cutoffs
+import db_utils
+
+# Séries esperadas pelo modelo: (companyId, kpiType) -> aba
+EXPECTED_SERIES = {}
+for _spec in SHEETS:
+    if _spec.index_of("company") is None:
+        EXPECTED_SERIES[(_spec.company_id, _spec.kpi_type)] = _spec
+    else:
+        for _company_id in COMPANY_MAP.values():
+            EXPECTED_SERIES[(_company_id, _spec.kpi_type)] = _spec
+
+# Linhas lidas do banco por vez
+FETCH_SIZE = 10000
+
+def _day(value):
+    return np.datetime64(value.date() if isinstance(value, datetime) else value, "D")
+
+def _date(day):
+    return day.astype("datetime64[D]").astype(datetime).strftime(DATE_FORMAT)
+
+def slot_starts(days, daily_from=None, weekly_from=None):
+    """
+    Início do período esperado de cada dia: o próprio dia a partir de `daily_from`, a
+    segunda-feira da semana entre `weekly_from` e `daily_from` e o dia 1 do mês antes
+    disso, como em snapshot_retention.period_key. Sem cortes, todo dia é um período.
+    """
+    if daily_from is None:
+        return days
+    # 1970-01-01 foi uma quinta-feira: (dias desde a época + 3) % 7 é o dia da semana, com segunda = 0
+    weeks = days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    months = days.astype("datetime64[M]").astype("datetime64[D]")
+    return np.where(days >= _day(daily_from), days, np.where(days >= _day(weekly_from), weeks, months))
+
+class SeriesCoverage:
+    """
+    Cobertura de uma série (companyId, kpiType) na janela [first, last]:
+    `bitmap[i]` indica se há snapshot no dia first + i; `duplicates` são os dias
+    com mais de um snapshot (datetime64[D]), `counts` quantos snapshots cada um tem.
+
+    `slots` marca o início de cada período esperado (índices em ordem no bitmap): um por
+    dia, ou por semana e por mês nos trechos compactados pela retenção. Um período está
+    coberto se algum dia dele tiver snapshot.
+    """
+
+    def __init__(self, company_id, kpi_type, first, bitmap, duplicates, counts, snapshots, slots=None):
+        self.company_id = company_id
+        self.kpi_type = kpi_type
+        self.first = first
+        self.bitmap = bitmap
+        self.duplicates = duplicates
+        self.counts = counts
+        self.snapshots = snapshots
+        self.slots = np.arange(len(bitmap)) if slots is None else slots
+
+    @classmethod
+    def from_days(cls, company_id, kpi_type, days, start=None, end=None, daily_from=None, weekly_from=None):
+        """
+        `days`: array datetime64[D] ordenado (um item por snapshot). Com `daily_from` e
+        `weekly_from` (cortes de snapshot_retention.retention_cutoffs), os trechos
+        compactados esperam um snapshot por semana ou por mês.
+        """
+        start = _day(start) if start is not None else (days[0] if len(days) else None)
+        end = _day(end) if end is not None else (days[-1] if len(days) else None)
+        if start is None or end is None or end < start:
+            return cls(company_id, kpi_type, start, np.zeros(0, dtype=bool), days[:0], np.zeros(0, dtype=np.int64), 0)
+        days = days[(days >= start) & (days <= end)]
+
+        # Diferença 0 entre datas consecutivas: dia repetido
+        repeated = np.diff(days) == np.timedelta64(0, "D")
+        duplicates, counts = np.unique(days[1:][repeated], return_counts=True)
+
+        bitmap = np.zeros(int((end - start).astype(np.int64)) + 1, dtype=bool)
+        bitmap[(days - start).astype(np.int64)] = True
+        window = start + np.arange(len(bitmap)).astype("timedelta64[D]")
+        periods = slot_starts(window, daily_from, weekly_from)
+        slots = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+        return cls(company_id, kpi_type, start, bitmap, duplicates, counts + 1, len(days), slots)
+
+    @property
+    def last(self):
+        return self.first + np.timedelta64(len(self.bitmap) - 1, "D") if len(self.bitmap) else None
+
+    def _covered_slots(self):
+        if not len(self.bitmap):
+            return np.zeros(0, dtype=bool)
+        return np.logical_or.reduceat(self.bitmap, self.slots)
+
+    def _slot_ends(self):
+        return np.r_[self.slots[1:], len(self.bitmap)] - 1
+
+    @property
+    def expected(self):
+        """Períodos esperados na janela (dias, ou semanas e meses nos trechos compactados)"""
+        return len(self.slots)
+
+    @property
+    def covered(self):
+        return int(self._covered_slots().sum())
+
+    def missing_days(self):
+        """Um dia por período sem snapshot: o último, como o representante mantido pela retenção"""
+        missing = self._slot_ends()[~self._covered_slots()]
+        return self.first + missing.astype("timedelta64[D]")
+
+    def gaps(self):
+        """Lacunas como (primeiro dia, último dia) de cada sequência de períodos sem snapshot, em ordem"""
+        padded = np.r_[True, self._covered_slots(), True]
+        edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+        starts, ends = self.slots[edges[0::2]], self._slot_ends()[edges[1::2] - 1]
+        return [
+            (self.first + np.timedelta64(int(start), "D"), self.first + np.timedelta64(int(stop), "D"))
+            for start, stop in zip(starts, ends)
+        ]
+
+    def summary(self):
+        """Resumo serializável em JSON; o bitmap vai compactado (1 bit por dia, base64)"""
+        gaps = self.gaps()
+        return {
+            "companyId": self.company_id,
+            "kpiType": self.kpi_type,
+            "first": _date(self.first) if len(self.bitmap) else None,
+            "last": _date(self.last) if len(self.bitmap) else None,
+            "days": len(self.bitmap),
+            "expected": self.expected,
+            "covered": self.covered,
+            "missing": self.expected - self.covered,
+            "snapshots": self.snapshots,
+            "gaps": [[_date(start), _date(stop)] for start, stop in gaps],
+            "duplicates": {_date(day): int(count) for day, count in zip(self.duplicates, self.counts)},
+            "bitmap": base64.b64encode(np.packbits(self.bitmap).tobytes()).decode("ascii"),
+        }
+
+def iter_series_days(connection, companies=None, kpi_types=None, start=None, end=None):
+    """(companyId, kpiType, array datetime64[D] ordenado) de cada série, em uma única consulta"""
+    conditions = []
+    params = []
+    if companies:
+        conditions.append(f"companyId IN ({', '.join(['%s'] * len(companies))})")
+        params.extend(companies)
+    if kpi_types:
+        conditions.append(f"kpiType IN ({', '.join(['%s'] * len(kpi_types))})")
+        params.extend(kpi_types)
+    if start:
+        conditions.append("snapshotDate >= %s")
+        params.append(start)
+    if end:
+        conditions.append("snapshotDate <= %s")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(
+            f"SELECT companyId, kpiType, snapshotDate FROM kpiSnapshots {where} ORDER BY companyId, kpiType, snapshotDate",
+            params,
+        )
+        key, dates = None, []
+        while True:
+            batch = cursor.fetchmany(FETCH_SIZE)
+            if not batch:
+                break
+            for company_id, kpi_type, snapshot_date in batch:
+                if (company_id, kpi_type) != key:
+                    if dates:
+                        yield key[0], key[1], np.array(dates, dtype="datetime64[D]")
+                    key, dates = (company_id, kpi_type), []
+                dates.append(snapshot_date.date())
+        if dates:
+            yield key[0], key[1], np.array(dates, dtype="datetime64[D]")
+    finally:
+        cursor.close()
+
+def build_coverage(connection, companies=None, kpi_types=None, start=None, end=None, cutoffs=(None, None)):
+    """
+    Cobertura de todas as séries do banco e das esperadas pelo modelo (estas aparecem
+    mesmo sem nenhum snapshot, se a janela tiver início e fim).
+    Com `end` a janela vai até essa data, para detectar também as lacunas no final.
+    `cutoffs`: (daily_from, weekly_from) da política de retenção, ou (None, None).
+    """
+    end_of_day = end.replace(hour=23, minute=59, second=59) if end else None
+    coverage = {}
+    for company_id, kpi_type, days in iter_series_days(connection, companies, kpi_types, start, end_of_day):
+        coverage[(company_id, kpi_type)] = SeriesCoverage.from_days(company_id, kpi_type, days, start, end, *cutoffs)
+    for company_id, kpi_type in EXPECTED_SERIES:
+        if (company_id, kpi_type) in coverage:
+            continue
+        if companies and company_id not in companies or kpi_types and kpi_type not in kpi_types:
+            continue
+        empty = np.array([], dtype="datetime64[D]")
+        coverage[(company_id, kpi_type)] = SeriesCoverage.from_days(company_id, kpi_type, empty, start, end, *cutoffs)
+    return coverage
+
+def gap_rows(coverage):
+    """
+    Fontes de linhas para create_template: para cada aba, uma linha por data faltante
+    (e empresa), com as colunas de métricas vazias. Séries sem aba no modelo ficam de fora.
+    Nos trechos compactados vai uma linha por semana ou mês faltante, no último dia.
+    """
+    company_names = {company_id: name for name, company_id in COMPANY_MAP.items()}
+    missing = {}
+    for (company_id, kpi_type), series in coverage.items():
+        spec = EXPECTED_SERIES.get((company_id, kpi_type))
+        if spec is None:
+            continue
+        for day in series.missing_days():
+            missing.setdefault(spec.name, []).append((day, company_names.get(company_id, "")))
+
+    row_sources = {}
+    for spec in SHEETS:
+        company_index = spec.index_of("company")
+        rows = []
+        for day, company in sorted(missing.get(spec.name, [])):
+            row = [None] * spec.width
+            row[spec.index_of("date")] = _date(day)
+            if company_index is not None:
+                row[company_index] = company
+            rows.append(row)
+        row_sources[spec.name] = rows
+    return row_sources
+
+def _date_arg(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value} (use YYYY-MM-DD)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Mostra lacunas e dias duplicados de cada série de kpiSnapshots e gera a planilha de reposição"
+    )
+    parser.add_argument("--company", type=int, action="append", help="companyId a verificar (pode repetir)")
+    parser.add_argument("--kpi-type", action="append", help="kpiType a verificar (pode repetir)")
+    parser.add_argument(
+        "--start", type=_date_arg, help="Início da janela (padrão: primeiro snapshot de cada série)"
+    )
+    parser.add_argument(
+        "--end",
+        type=_date_arg,
+        help="Fim da janela, inclusivo (padrão: último snapshot de cada série; use ontem para ver falhas recentes)",
+    )
+    parser.add_argument(
+        "--retention",
+        action="store_true",
+        help="Segue a política de snapshot_retention.py: trechos compactados esperam um snapshot por semana ou mês",
+    )
+    parser.add_argument(
+        "--daily-days",
+        type=int,
+        default=DEFAULT_DAILY_DAYS,
+        help=f"Com --retention, o mesmo --daily-days da retenção (padrão: {DEFAULT_DAILY_DAYS})",
+    )
+    parser.add_argument(
+        "--weekly-days",
+        type=int,
+        default=DEFAULT_WEEKLY_DAYS,
+        help=f"Com --retention, o mesmo --weekly-days da retenção (padrão: {DEFAULT_WEEKLY_DAYS})",
+    )
+    parser.add_argument("--as-of", type=_date_arg, help="Com --retention, data de referência da política (padrão: hoje)")
+    parser.add_argument("--workbook", help="Gera uma planilha no layout do modelo só com as datas faltantes")
+    parser.add_argument("--report", help="Salva o relatório em JSON (lacunas, duplicados e bitmap por série)")
+    parser.add_argument(
+        "--max-gaps",
+        type=int,
+        default=10,
+        help="Lacunas listadas por série na saída (padrão: 10; o relatório JSON tem todas)",
+    )
+    return parser.parse_args()
+
+def print_series(series, max_gaps, unit="dias"):
+    summary = series.summary()
+    label = f"{series.kpi_type} (empresa {series.company_id if series.company_id else 'global'})"
+    if not summary["days"]:
+        print(f"  ⚪ {label}: sem snapshots")
+        return
+    window = f"{summary['first']} a {summary['last']}"
+    if not summary["missing"] and not summary["duplicates"]:
+        print(f"  ✓ {label}: {window}, completa ({summary['covered']} {unit})")
+        return
+    print(
+        f"  ⚠️  {label}: {window}, {summary['covered']}/{summary['expected']} {unit}, "
+        f"{summary['missing']} faltando em {len(summary['gaps'])} lacuna(s), "
+        f"{len(summary['duplicates'])} dia(s) duplicado(s)"
+    )
+    for start, stop in summary["gaps"][:max_gaps]:
+        print(f"     ✗ {start}" + (f" a {stop}" if stop != start else ""))
+    if len(summary["gaps"]) > max_gaps:
+        print(f"     ... mais {len(summary['gaps']) - max_gaps} lacuna(s)")
+
+def main():
+    args = parse_args()
+    try:
+        connection = db_utils.get_connection()
+    except Exception as e:
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        sys.exit(1)
+
+    cutoffs = (None, None)
+    unit = "dias"
+    if args.retention:
+        cutoffs = retention_cutoffs(args.as_of or datetime.now(), args.daily_days, args.weekly_days)
+        unit = "períodos"
+    try:
+        coverage = build_coverage(connection, args.company, args.kpi_type, args.start, args.end, cutoffs)
+    except Exception as e:
+        print(f"❌ Erro ao ler kpiSnapshots: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    print(f"📅 Cobertura diária de {len(coverage)} séries")
+    if args.retention:
+        daily_from, weekly_from = cutoffs
+        print(f"   Retenção: diários desde {daily_from:%Y-%m-%d}, semanais desde {weekly_from:%Y-%m-%d}, mensais antes disso")
+    for key in sorted(coverage, key=lambda key: (key[1], key[0] or 0)):
+        print_series(coverage[key], args.max_gaps, unit)
+
+    missing = sum(series.expected - series.covered for series in coverage.values())
+    duplicated = sum(len(series.duplicates) for series in coverage.values())
+    print(f"\n📊 {unit.capitalize()} faltando: {missing} | Dias duplicados: {duplicated}")
+    if duplicated:
+        print("   Para remover duplicatas: import_historical_data.py --dedupe")
+
+    if args.report:
+        report = {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "start": args.start.strftime(DATE_FORMAT) if args.start else None,
+            "end": args.end.strftime(DATE_FORMAT) if args.end else None,
+            "retention": {
+                "daily_from": cutoffs[0].strftime(DATE_FORMAT),
+                "weekly_from": cutoffs[1].strftime(DATE_FORMAT),
+            } if args.retention else None,
+            "series": [coverage[key].summary() for key in sorted(coverage, key=lambda key: (key[1], key[0] or 0))],
+        }
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📝 Relatório salvo em: {args.report}")
+
+    if args.workbook:
+        if not missing:
+            print("✅ Nenhuma data faltando: planilha de reposição não gerada")
+            return
+        create_template(args.workbook, gap_rows(coverage), keywords=GAP_FILL_KEYWORD)
+        print("   Preencha as métricas e importe com: import_historical_data.py <planilha> --idempotent skip")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Retenção e compactação do histórico de kpiSnapshots
+
+O job diário (SnapshotService.executeAllSnapshots) e as importações de histórico só
+acrescentam snapshots com o JSON completo. Este script aplica uma política de retenção
+por série (companyId, kpiType):
+
+- snapshots dos últimos --daily-days dias ficam todos
+- até --weekly-days dias, fica um snapshot por semana (segunda a domingo)
+- antes disso, fica um snapshot por mês
+
+O representante de cada semana ou mês é o último snapshot do período (maior data e,
+no empate, maior id), o mesmo valor que kpiRollups usa como `lastValue`. Médias,
+mínimos e máximos dos períodos ficam em kpiRollups: rode scripts/kpi_rollups.py antes
+da primeira compactação e não use --full nele depois (os dias apagados não voltam).
+
+As exclusões são feitas em blocos de ids, com um commit (e novas tentativas) por bloco,
+junto das linhas de kpiMetricValues dos snapshots apagados. A política é determinística
+e o representante de cada período nunca é apagado: uma execução interrompida é retomada
+rodando o comando de novo. Os cortes são alinhados ao início da semana e do mês, para
+não compactar um período pela metade.
+
+O script também cria o índice (companyId, kpiType, snapshotDate) de kpiSnapshots,
+declarado em drizzle/schema.ts, se nenhum índice com essas colunas existir.
+
+Uso:
+    python3 scripts/snapshot_retention.py --dry-run
+    python3 scripts/snapshot_retention.py --daily-days 90 --weekly-days 365
+    python3 scripts/snapshot_retention.py --kpi-type metricool_social --optimize
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from kpi_rollups import list_series
+from kpi_sheets import parse_date
+import db_utils
+import sqlite_backend
+
+# Declarado em drizzle/schema.ts e criado pela migração 0007_kpi_snapshots_series_index.sql
+SNAPSHOT_INDEX = "kpiSnapshots_company_type_date_idx"
+SNAPSHOT_INDEX_COLUMNS = ("companyId", "kpiType", "snapshotDate")
+
+DEFAULT_DAILY_DAYS = 90
+DEFAULT_WEEKLY_DAYS = 365
+
+# Snapshots apagados por bloco e commit
+DEFAULT_CHUNK_SIZE = 1000
+
+def ensure_snapshot_index(connection):
+    """
+    Cria o índice composto de kpiSnapshots no MySQL se nenhum índice começar por
+    (companyId, kpiType, snapshotDate). No SQLite ele já vem no esquema.
+    Retorna True se o índice foi criado.
+    """
+    if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+        return False
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT index_name, column_name FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'kpiSnapshots'
+            ORDER BY index_name, seq_in_index
+            """
+        )
+        indexes = {}
+        for index_name, column_name in cursor.fetchall():
+            indexes.setdefault(index_name, []).append(column_name)
+        prefix = list(SNAPSHOT_INDEX_COLUMNS)
+        if any(columns[:len(prefix)] == prefix for columns in indexes.values()):
+            return False
+        column_list = ",".join(f"`{column}`" for column in prefix)
+        cursor.execute(f"CREATE INDEX `{SNAPSHOT_INDEX}` ON `kpiSnapshots` ({column_list})")
+        return True
+    finally:
+        cursor.close()
+
+def _week_start(day):
+    day = datetime(day.year, day.month, day.day)
+    return day - timedelta(days=day.weekday())
+
+def _month_start(day):
+    return datetime(day.year, day.month, 1)
+
+def retention_cutoffs(as_of, daily_days, weekly_days):
+    """
+    (início do período diário, início do período semanal), alinhados à semana e ao mês.
+    Snapshots a partir do primeiro ficam todos; entre os dois, um por semana; antes, um por mês.
+    """
+    daily_from = _week_start(as_of - timedelta(days=daily_days))
+    weekly_from = _month_start(as_of - timedelta(days=max(weekly_days, daily_days)))
+    return daily_from, min(weekly_from, daily_from)
+
+def period_key(snapshot_date, daily_from, weekly_from):
+    """Período de retenção do snapshot: None para os que ficam todos"""
+    if snapshot_date >= daily_from:
+        return None
+    if snapshot_date >= weekly_from:
+        return ("week", _week_start(snapshot_date))
+    return ("month", _month_start(snapshot_date))
+
+def compaction_ids(snapshots, daily_from, weekly_from):
+    """
+    Ids a apagar de uma série. `snapshots`: (id, snapshotDate) em ordem de data e id;
+    em cada período fica só o último.
+    """
+    keep = {}
+    for snapshot_id, snapshot_date in snapshots:
+        key = period_key(snapshot_date, daily_from, weekly_from)
+        if key is not None:
+            keep[key] = snapshot_id
+    kept = set(keep.values())
+    return [
+        snapshot_id
+        for snapshot_id, snapshot_date in snapshots
+        if snapshot_date < daily_from and snapshot_id not in kept
+    ]
+
+def load_series_dates(cursor, company_id, kpi_type, before):
+    """(id, snapshotDate) da série antes do corte diário, sem ler o JSON"""
+    condition = "companyId = %s" if company_id else "companyId IS NULL"
+    params = [kpi_type] + ([company_id] if company_id else []) + [before]
+    cursor.execute(
+        f"""
+        SELECT id, snapshotDate FROM kpiSnapshots
+        WHERE kpiType = %s AND {condition} AND snapshotDate < %s
+        ORDER BY snapshotDate, id
+        """,
+        params,
+    )
+    return cursor.fetchall()
+
+def _in_list(column, values):
+    return f"{column} IN ({', '.join(['%s'] * len(values))})"
+
+def _payload_size(connection):
+    """Expressão do tamanho do JSON armazenado no dialeto da conexão"""
+    if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+        return "LENGTH(data)"
+    return "JSON_STORAGE_SIZE(data)"
+
+def has_metric_values(connection):
+    """kpiMetricValues só existe no MySQL depois do primeiro uso de metric_values.py"""
+    if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+        return True
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = 'kpiMetricValues'
+            """
+        )
+        return bool(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+def delete_chunk(connection, snapshot_ids, metric_values=False, dry_run=False):
+    """
+    Apaga um bloco de snapshots (e suas métricas em kpiMetricValues) e confirma.
+    Retorna o tamanho somado do JSON dos snapshots do bloco.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"SELECT COALESCE(SUM({_payload_size(connection)}), 0) FROM kpiSnapshots WHERE {_in_list('id', snapshot_ids)}",
+            snapshot_ids,
+        )
+        payload = int(cursor.fetchone()[0])
+        if not dry_run:
+            if metric_values:
+                cursor.execute(f"DELETE FROM kpiMetricValues WHERE {_in_list('snapshotId', snapshot_ids)}", snapshot_ids)
+            cursor.execute(f"DELETE FROM kpiSnapshots WHERE {_in_list('id', snapshot_ids)}", snapshot_ids)
+        connection.commit()
+        return payload
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def compact_series(connection, company_id, kpi_type, daily_from, weekly_from, chunk_size=DEFAULT_CHUNK_SIZE,
+                   metric_values=False, dry_run=False):
+    """Compacta uma série em blocos. Retorna (snapshots apagados, bytes de JSON)"""
+    cursor = connection.cursor()
+    try:
+        snapshots = load_series_dates(cursor, company_id, kpi_type, daily_from)
+    finally:
+        cursor.close()
+    # A leitura não deve segurar a transação enquanto os blocos são apagados
+    connection.commit()
+
+    snapshot_ids = compaction_ids(snapshots, daily_from, weekly_from)
+    step = max(1, min(chunk_size, db_utils.max_params(connection)))
+    payload = 0
+    for offset in range(0, len(snapshot_ids), step):
+        chunk = snapshot_ids[offset:offset + step]
+        payload += db_utils.run_with_retry(lambda: delete_chunk(connection, chunk, metric_values, dry_run))
+    return len(snapshot_ids), payload
+
+def table_size(connection):
+    """(bytes ocupados, bytes livres) de kpiSnapshots, ou None se o banco não informar"""
+    cursor = connection.cursor()
+    try:
+        if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+            # No SQLite o arquivo inteiro: as páginas livres só voltam com VACUUM
+            cursor.execute("PRAGMA page_size")
+            page_size = cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_count")
+            pages = cursor.fetchone()[0]
+            cursor.execute("PRAGMA freelist_count")
+            free = cursor.fetchone()[0]
+            return pages * page_size, free * page_size
+        cursor.execute(
+            """
+            SELECT data_length + index_length, data_free FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = 'kpiSnapshots'
+            """
+        )
+        row = cursor.fetchone()
+        return (int(row[0]), int(row[1])) if row else None
+    finally:
+        cursor.close()
+
+def optimize_table(connection):
+    """Devolve ao sistema o espaço liberado (OPTIMIZE TABLE no MySQL, VACUUM no SQLite)"""
+    connection.commit()
+    cursor = connection.cursor()
+    try:
+        if db_utils.dialect(connection) == sqlite_backend.DIALECT:
+            cursor.execute("VACUUM")
+        else:
+            # O InnoDB recria a tabela (online); o resultado vem como linhas de status
+            cursor.execute("OPTIMIZE TABLE kpiSnapshots")
+            cursor.fetchall()
+            cursor.execute("ANALYZE TABLE kpiSnapshots")
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def _date_arg(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value} (use YYYY-MM-DD)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compacta o histórico de kpiSnapshots: diários recentes, depois semanais e mensais"
+    )
+    parser.add_argument("--company", type=int, action="append", help="companyId a compactar (pode repetir)")
+    parser.add_argument("--kpi-type", action="append", help="kpiType a compactar (pode repetir)")
+    parser.add_argument(
+        "--daily-days",
+        type=int,
+        default=DEFAULT_DAILY_DAYS,
+        help=f"Mantém todos os snapshots dos últimos N dias (padrão: {DEFAULT_DAILY_DAYS})",
+    )
+    parser.add_argument(
+        "--weekly-days",
+        type=int,
+        default=DEFAULT_WEEKLY_DAYS,
+        help=f"Até N dias mantém um snapshot por semana; antes, um por mês (padrão: {DEFAULT_WEEKLY_DAYS})",
+    )
+    parser.add_argument("--as-of", type=_date_arg, help="Data de referência da política (padrão: hoje)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Snapshots apagados por bloco e commit (padrão: {DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Só mostra o que seria apagado")
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Ao final, devolve o espaço ao disco (OPTIMIZE TABLE no MySQL, VACUUM no SQLite)",
+    )
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.daily_days < 0 or args.weekly_days < 0:
+        print("❌ --daily-days e --weekly-days não podem ser negativos")
+        sys.exit(1)
+
+    try:
+        connection = db_utils.get_connection()
+    except Exception as e:
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        sys.exit(1)
+
+    as_of = args.as_of or datetime.now()
+    daily_from, weekly_from = retention_cutoffs(as_of, args.daily_days, args.weekly_days)
+    try:
+        if ensure_snapshot_index(connection):
+            print(f"🗂️  Índice {SNAPSHOT_INDEX} criado em kpiSnapshots")
+
+        metric_values = has_metric_values(connection)
+        before = table_size(connection)
+        cursor = connection.cursor()
+        series_list = list_series(cursor, args.company, args.kpi_type)
+        cursor.close()
+
+        print(f"🗜️  {len(series_list)} séries em kpiSnapshots")
+        print(f"   Diários desde {daily_from:%Y-%m-%d}, semanais desde {weekly_from:%Y-%m-%d}, mensais antes disso")
+        if args.dry_run:
+            print("   (simulação: nada será apagado)")
+
+        total, total_payload = 0, 0
+        for company_id, kpi_type in series_list:
+            label = f"{kpi_type} (empresa {company_id if company_id else 'global'})"
+            deleted, payload = compact_series(
+                connection, company_id, kpi_type, daily_from, weekly_from, args.chunk_size, metric_values, args.dry_run
+            )
+            if not deleted:
+                print(f"  ⏭️  {label}: nada a compactar")
+                continue
+            total += deleted
+            total_payload += payload
+            print(f"  ✓ {label}: {deleted} snapshots, {format_bytes(payload)} de JSON")
+
+        verb = "seriam apagados" if args.dry_run else "apagados"
+        print(f"\n✅ Compactação concluída: {total} snapshots {verb}, {format_bytes(total_payload)} de JSON")
+
+        if args.optimize and not args.dry_run:
+            print("🧹 Devolvendo o espaço ao disco...")
+            optimize_table(connection)
+        after = table_size(connection)
+        if before and after:
+            print(
+                f"   kpiSnapshots: {format_bytes(before[0])} → {format_bytes(after[0])} "
+                f"(livre para reuso: {format_bytes(after[1])})"
+            )
+            if not args.optimize and not args.dry_run:
+                print("   O espaço apagado é reaproveitado pela tabela; use --optimize para devolvê-lo ao disco")
+    except Exception as e:
+        print(f"\n❌ Erro na compactação: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
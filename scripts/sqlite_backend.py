@@ -0,0 +1,414 @@
+"""
+Backend SQLite local para os scripts (DATABASE_URL=sqlite:///caminho.db)
+
+Substitui o MySQL em testes e benchmarks sem rede: as tabelas usadas pelos scripts
+(kpiSnapshots, kpiMetricValues, kpiRollups, discordMetricsSnapshots, socialMediaMetrics,
+as da Jornada de Leads, apiStatus e apiLatencyRollups) são criadas com o mesmo esquema
+de drizzle/schema.ts, a staging da carga em massa tem um equivalente próprio e a
+conexão imita o que os scripts usam do mysql.connector (placeholders %s, cursor(prepared=...), in_transaction, database).
+Datas são gravadas como texto 'YYYY-MM-DD HH:MM:SS' e voltam como datetime.
+"""
+
+import sqlite3
+from datetime import datetime
+
+DIALECT = "sqlite"
+
+# Espelho de kpiSnapshots em drizzle/schema.ts
+KPI_SNAPSHOTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kpiSnapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    companyId INTEGER,
+    snapshotDate TIMESTAMP NOT NULL,
+    kpiType VARCHAR(100) NOT NULL,
+    source VARCHAR(100) NOT NULL,
+    data JSON NOT NULL,
+    createdAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Arquivos criados antes de updatedAt: o SQLite não aceita ADD COLUMN com DEFAULT
+# CURRENT_TIMESTAMP, então a coluna fica nula nas linhas inseridas e vale o createdAt
+KPI_SNAPSHOTS_UPGRADES = (
+    ("updatedAt", "ALTER TABLE kpiSnapshots ADD COLUMN updatedAt TIMESTAMP"),
+)
+
+KPI_SNAPSHOTS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS kpiSnapshots_company_type_date_idx ON kpiSnapshots (companyId, kpiType, snapshotDate)",
+)
+
+# Espelho de kpiMetricValues (metric_values.py)
+KPI_METRIC_VALUES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kpiMetricValues (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    snapshotId INTEGER NOT NULL,
+    companyId INTEGER NOT NULL DEFAULT 0,
+    snapshotDate TIMESTAMP NOT NULL,
+    kpiType VARCHAR(100) NOT NULL,
+    metric VARCHAR(191) NOT NULL,
+    value DOUBLE NOT NULL
+)
+"""
+
+KPI_METRIC_VALUES_INDEXES = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS kpiMetricValues_snapshot_metric_idx ON kpiMetricValues (snapshotId, metric)",
+    "CREATE INDEX IF NOT EXISTS kpiMetricValues_metric_company_date_idx "
+    "ON kpiMetricValues (metric, companyId, snapshotDate, value)",
+)
+
+# Espelho de kpiRollups (kpi_rollups.py); period é o ENUM do MySQL
+KPI_ROLLUPS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kpiRollups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    companyId INTEGER NOT NULL DEFAULT 0,
+    kpiType VARCHAR(100) NOT NULL,
+    metric VARCHAR(191) NOT NULL,
+    period VARCHAR(5) NOT NULL CHECK (period IN ('day', 'week', 'month')),
+    periodStart TIMESTAMP NOT NULL,
+    lastValue DOUBLE,
+    avgValue DOUBLE,
+    minValue DOUBLE,
+    maxValue DOUBLE,
+    samples INTEGER NOT NULL DEFAULT 0,
+    delta DOUBLE,
+    deltaPct DOUBLE,
+    rollingAvg DOUBLE,
+    computedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT kpiRollups_series_period_idx UNIQUE (companyId, kpiType, metric, period, periodStart)
+)
+"""
+
+# Espelho das tabelas dedicadas de Discord e redes sociais (typed_metrics.py)
+DISCORD_METRICS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS discordMetricsSnapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guildId VARCHAR(100) NOT NULL,
+    totalMembers INTEGER NOT NULL DEFAULT 0,
+    onlineMembers INTEGER NOT NULL DEFAULT 0,
+    newMembers7days INTEGER NOT NULL DEFAULT 0,
+    newMembers30days INTEGER NOT NULL DEFAULT 0,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+SOCIAL_MEDIA_METRICS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS socialMediaMetrics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    companyId INTEGER NOT NULL,
+    network VARCHAR(50) NOT NULL,
+    recordDate TIMESTAMP NOT NULL,
+    followers INTEGER NOT NULL DEFAULT 0,
+    posts INTEGER NOT NULL DEFAULT 0,
+    totalLikes INTEGER NOT NULL DEFAULT 0,
+    totalComments INTEGER NOT NULL DEFAULT 0,
+    totalShares INTEGER NOT NULL DEFAULT 0,
+    totalViews INTEGER NOT NULL DEFAULT 0,
+    totalReach INTEGER NOT NULL DEFAULT 0,
+    totalImpressions INTEGER NOT NULL DEFAULT 0,
+    notes TEXT,
+    createdBy INTEGER,
+    createdAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+TYPED_METRICS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS discordMetricsSnapshots_guild_timestamp_idx "
+    "ON discordMetricsSnapshots (guildId, timestamp)",
+    "CREATE INDEX IF NOT EXISTS socialMediaMetrics_company_network_date_idx "
+    "ON socialMediaMetrics (companyId, network, recordDate)",
+)
+
+# Espelho das tabelas da Jornada de Leads (lead_journey_warmer.py)
+LEAD_JOURNEY_SEARCHES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leadJourneySearches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email VARCHAR(320) NOT NULL,
+    leadName VARCHAR(255),
+    mauticId INTEGER,
+    pipedrivePersonId INTEGER,
+    pipedriveDealId INTEGER,
+    conversionStatus VARCHAR(20) NOT NULL DEFAULT 'lead',
+    dealValue INTEGER,
+    daysInBase INTEGER,
+    daysToConversion INTEGER,
+    searchedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    searchedBy INTEGER NOT NULL
+)
+"""
+
+LEAD_JOURNEY_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leadJourneyCache (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email VARCHAR(320) NOT NULL UNIQUE,
+    mauticData JSON,
+    pipedriveData JSON,
+    aiAnalysis TEXT,
+    cachedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expiresAt TIMESTAMP NOT NULL
+)
+"""
+
+# Espelho de apiStatus e apiLatencyRollups (api_latency.py)
+API_STATUS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS apiStatus (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    apiName VARCHAR(100) NOT NULL,
+    companyId INTEGER,
+    status VARCHAR(10) NOT NULL CHECK (status IN ('online', 'offline')),
+    endpoint VARCHAR(255),
+    errorMessage TEXT,
+    responseTime INTEGER,
+    lastChecked TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+API_STATUS_INDEX = "CREATE INDEX IF NOT EXISTS apiStatus_timestamp_idx ON apiStatus (timestamp)"
+
+API_LATENCY_ROLLUPS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS apiLatencyRollups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    apiName VARCHAR(100) NOT NULL,
+    endpoint VARCHAR(255) NOT NULL DEFAULT '',
+    companyId INTEGER NOT NULL DEFAULT 0,
+    hourStart TIMESTAMP NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    sumMs DOUBLE NOT NULL DEFAULT 0,
+    minMs INTEGER,
+    maxMs INTEGER,
+    buckets TEXT NOT NULL,
+    lastStatusId INTEGER NOT NULL,
+    computedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT apiLatencyRollups_series_hour_idx UNIQUE (apiName, endpoint, companyId, hourStart)
+)
+"""
+
+SCHEMA = (
+    KPI_SNAPSHOTS_SCHEMA,
+    *KPI_SNAPSHOTS_INDEXES,
+    KPI_METRIC_VALUES_SCHEMA,
+    *KPI_METRIC_VALUES_INDEXES,
+    KPI_ROLLUPS_SCHEMA,
+    DISCORD_METRICS_SCHEMA,
+    SOCIAL_MEDIA_METRICS_SCHEMA,
+    *TYPED_METRICS_INDEXES,
+    LEAD_JOURNEY_SEARCHES_SCHEMA,
+    LEAD_JOURNEY_CACHE_SCHEMA,
+    API_STATUS_SCHEMA,
+    API_STATUS_INDEX,
+    API_LATENCY_ROLLUPS_SCHEMA,
+)
+
+# Equivalentes SQLite das instruções específicas do MySQL usadas pelo importador
+UPSERT_SNAPSHOT_QUERY = """
+INSERT INTO kpiSnapshots (id, companyId, snapshotDate, kpiType, source, data)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON CONFLICT(id) DO UPDATE SET source = excluded.source, data = excluded.data, updatedAt = CURRENT_TIMESTAMP
+"""
+
+DEDUPE_SNAPSHOTS_QUERY = """
+DELETE FROM kpiSnapshots
+WHERE id NOT IN (
+    SELECT MAX(id) FROM kpiSnapshots GROUP BY companyId, snapshotDate, kpiType
+)
+"""
+
+DEDUPE_METRIC_VALUES_QUERY = """
+DELETE FROM kpiMetricValues
+WHERE snapshotId NOT IN (
+    SELECT MAX(id) FROM kpiSnapshots GROUP BY companyId, snapshotDate, kpiType
+)
+"""
+
+UPSERT_METRIC_VALUE_QUERY = """
+INSERT INTO kpiMetricValues (snapshotId, companyId, snapshotDate, kpiType, metric, value)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON CONFLICT(snapshotId, metric) DO UPDATE SET
+    companyId = excluded.companyId, snapshotDate = excluded.snapshotDate,
+    kpiType = excluded.kpiType, value = excluded.value
+"""
+
+UPSERT_LEAD_CACHE_QUERY = """
+INSERT INTO leadJourneyCache (email, mauticData, pipedriveData, aiAnalysis, cachedAt, expiresAt)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON CONFLICT(email) DO UPDATE SET
+    mauticData = excluded.mauticData, pipedriveData = excluded.pipedriveData,
+    aiAnalysis = excluded.aiAnalysis, cachedAt = excluded.cachedAt, expiresAt = excluded.expiresAt
+"""
+
+UPSERT_LATENCY_ROLLUP_QUERY = """
+INSERT INTO apiLatencyRollups
+    (apiName, endpoint, companyId, hourStart, requests, errors, sumMs, minMs, maxMs, buckets, lastStatusId, computedAt)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT(apiName, endpoint, companyId, hourStart) DO UPDATE SET
+    requests = excluded.requests, errors = excluded.errors, sumMs = excluded.sumMs,
+    minMs = excluded.minMs, maxMs = excluded.maxMs, buckets = excluded.buckets,
+    lastStatusId = excluded.lastStatusId, computedAt = excluded.computedAt
+"""
+
+# Staging da carga em massa (bulk_load.py); {staging} é o nome da tabela da execução
+CREATE_STAGING_TABLE = """
+CREATE TABLE {staging} (
+    stagingId INTEGER PRIMARY KEY AUTOINCREMENT,
+    sheet TEXT NOT NULL,
+    label TEXT NOT NULL,
+    companyId INTEGER,
+    snapshotDate TIMESTAMP,
+    kpiType TEXT NOT NULL,
+    source TEXT NOT NULL,
+    data TEXT NOT NULL,
+    existingId INTEGER
+)
+"""
+
+INVALID_STAGING_ROWS_QUERY = """
+SELECT stagingId, sheet, label FROM {staging}
+WHERE snapshotDate IS NULL OR json_valid(data) = 0
+"""
+
+DELETE_REPEATED_STAGING_QUERY = """
+DELETE FROM {staging}
+WHERE stagingId NOT IN (
+    SELECT MIN(stagingId) FROM {staging} GROUP BY companyId, snapshotDate, kpiType
+)
+"""
+
+# UPDATE ... FROM (SQLite 3.33+): kpiSnapshots é agrupada uma vez, sem subconsulta por linha
+RESOLVE_EXISTING_STAGING_QUERY = """
+UPDATE {staging} SET existingId = k.id
+FROM (
+    SELECT MAX(id) AS id, companyId, snapshotDate, kpiType FROM kpiSnapshots
+    WHERE kpiType IN (SELECT DISTINCT kpiType FROM {staging}) AND snapshotDate BETWEEN %s AND %s
+    GROUP BY companyId, snapshotDate, kpiType
+) k
+WHERE k.companyId IS {staging}.companyId AND k.snapshotDate = {staging}.snapshotDate
+  AND k.kpiType = {staging}.kpiType
+"""
+
+MERGE_UPDATE_STAGING_QUERY = """
+UPDATE kpiSnapshots SET source = s.source, data = s.data, updatedAt = CURRENT_TIMESTAMP
+FROM {staging} s
+WHERE kpiSnapshots.id = s.existingId
+"""
+
+# Limite de parâmetros por instrução (SQLITE_MAX_VARIABLE_NUMBER desde o 3.32)
+MAX_PARAMS = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+def _adapt_datetime(value):
+    return value.isoformat(" ")
+
+def _convert_timestamp(value):
+    return datetime.fromisoformat(value.decode())
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+
+_placeholders = {}
+
+def _translate(sql):
+    """Troca os placeholders %s do mysql.connector pelos ? do sqlite3"""
+    translated = _placeholders.get(sql)
+    if translated is None:
+        translated = _placeholders[sql] = sql.replace("%s", "?")
+    return translated
+
+def parse_sqlite_url(url):
+    """sqlite:///relativo.db, sqlite:////absoluto.db ou sqlite:///:memory:"""
+    path = url[len("sqlite://"):]
+    if path.startswith("/"):
+        path = path[1:]
+    if not path:
+        raise Exception("DATABASE_URL do SQLite sem caminho: use sqlite:///caminho.db")
+    return path
+
+class SQLiteCursor:
+    dialect = DIALECT
+    max_params = MAX_PARAMS
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_translate(sql), params or ())
+        return self
+
+    def executemany(self, sql, params):
+        self._cursor.executemany(_translate(sql), params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+class SQLiteConnection:
+    dialect = DIALECT
+    max_params = MAX_PARAMS
+
+    def __init__(self, path, timeout=30.0):
+        self.database = path
+        # check_same_thread=False: o modo streaming grava por uma thread dedicada
+        self._connection = sqlite3.connect(
+            path, timeout=timeout, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            self._connection.execute(statement)
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(kpiSnapshots)")}
+        for column, statement in KPI_SNAPSHOTS_UPGRADES:
+            if column not in columns:
+                self._connection.execute(statement)
+        self._connection.commit()
+
+    def cursor(self, prepared=False, buffered=None):
+        # O sqlite3 já mantém um cache de instruções preparadas por conexão
+        return SQLiteCursor(self._connection.cursor())
+
+    @property
+    def in_transaction(self):
+        return self._connection.in_transaction
+
+    def is_connected(self):
+        return True
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+class SQLitePool:
+    """Mesma interface do pool do mysql.connector; cada empréstimo abre uma conexão"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_connection(self):
+        return SQLiteConnection(self.path)
+
+def connect(url):
+    return SQLiteConnection(parse_sqlite_url(url))
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from api_latency import BUCKETS_PER_OCTAVE, LatencyHistogram, _trend, load_rollups, summarize, update_rollups
+
+# Erro relativo máximo de um percentil interpolado dentro de um balde
+BUCKET_ERROR = 2 ** (1 / BUCKETS_PER_OCTAVE) - 1
+
+def histogram(latencies, errors=0):
+    result = LatencyHistogram()
+    result.add(np.asarray(latencies, dtype=np.int64), errors)
+    return result
+
+def test_empty_histogram_has_no_percentiles():
+    empty = LatencyHistogram()
+    assert empty.percentile(50) is None
+    assert empty.mean is None
+    assert empty.error_rate is None
+
+@pytest.mark.parametrize("p", [50, 90, 95, 99])
+def test_percentiles_stay_within_one_bucket_of_the_exact_value(p):
+    latencies = np.arange(1, 5001)
+    expected = np.percentile(latencies, p)
+    assert histogram(latencies).percentile(p) == pytest.approx(expected, rel=BUCKET_ERROR)
+
+def test_percentiles_are_clamped_to_the_observed_range():
+    result = histogram([120, 130, 180, 250])
+    assert result.percentile(0) == 120
+    assert result.percentile(100) == 250
+    assert result.mean == 170
+
+def test_errors_count_as_requests_without_latency():
+    result = histogram([100, 200], errors=2)
+    assert result.requests == 4
+    assert result.samples == 2
+    assert result.error_rate == 0.5
+
+def test_merge_matches_a_single_histogram_of_all_latencies():
+    rng = np.random.default_rng(7)
+    first = rng.lognormal(5, 1, 2000).astype(np.int64) + 1
+    second = rng.lognormal(6, 0.5, 3000).astype(np.int64) + 1
+    merged = histogram(first, errors=3).merge(histogram(second, errors=1))
+    combined = histogram(np.concatenate([first, second]), errors=4)
+
+    assert np.array_equal(merged.counts, combined.counts)
+    assert (merged.requests, merged.errors) == (combined.requests, combined.errors)
+    assert (merged.min_ms, merged.max_ms) == (combined.min_ms, combined.max_ms)
+    assert merged.sum_ms == pytest.approx(combined.sum_ms)
+    for p in (50, 95, 99):
+        assert merged.percentile(p) == combined.percentile(p)
+
+def test_merge_with_an_empty_histogram_keeps_min_and_max():
+    result = LatencyHistogram().merge(histogram([40, 90]))
+    assert (result.min_ms, result.max_ms) == (40, 90)
+    assert result.merge(LatencyHistogram()).percentile(100) == 90
+
+def test_encode_and_decode_round_trip():
+    original = histogram([1, 15, 15, 300, 9000], errors=1)
+    decoded = LatencyHistogram.decode(
+        original.encode(), original.requests, original.errors, original.sum_ms, original.min_ms, original.max_ms
+    )
+    assert np.array_equal(decoded.counts, original.counts)
+    assert decoded.percentile(50) == original.percentile(50)
+
+@pytest.mark.parametrize("change, expected", [
+    (None, ""),
+    (0, " 0%"),
+    (0.4, " 0%"),
+    (-0.4, " 0%"),
+    (12.6, " ▲13%"),
+    (-30, " ▼30%"),
+])
+def test_trend_has_no_arrow_without_a_change(change, expected):
+    assert _trend(change) == expected
+
+def insert_status(connection, rows):
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT INTO apiStatus (apiName, endpoint, companyId, status, responseTime, timestamp) VALUES (%s, %s, %s, %s, %s, %s)",
+        rows,
+    )
+    connection.commit()
+    cursor.close()
+
+def test_update_rollups_rebuilds_changed_hours_without_double_counting(database_url, connection):
+    insert_status(connection, [
+        ("discord", "/guilds", None, "online", 100, datetime(2024, 10, 1, 9, 5)),
+        ("discord", "/guilds", None, "offline", None, datetime(2024, 10, 1, 9, 40)),
+        ("discord", "/guilds", None, "online", 300, datetime(2024, 10, 1, 10, 15)),
+    ])
+    assert update_rollups(connection) == (3, 2)
+
+    # Uma linha nova na hora das 9h: a hora é refeita inteira, e não somada
+    insert_status(connection, [("discord", "/guilds", None, "online", 200, datetime(2024, 10, 1, 9, 50))])
+    update_rollups(connection)
+
+    rollups = load_rollups(connection)
+    nine = rollups[(("discord", "/guilds", 0), datetime(2024, 10, 1, 9))]
+    assert (nine.requests, nine.errors, nine.min_ms, nine.max_ms) == (3, 1, 100, 200)
+    ten = rollups[(("discord", "/guilds", 0), datetime(2024, 10, 1, 10))]
+    assert (ten.requests, ten.errors) == (1, 0)
+
+def test_summarize_splits_recent_and_previous_windows():
+    key = ("discord", "", 0)
+    hourly = {
+        (key, datetime(2024, 10, 20, 12)): histogram([100, 100]),
+        (key, datetime(2024, 10, 12, 12)): histogram([400], errors=1),
+        (key, datetime(2024, 9, 1, 12)): histogram([900]),
+    }
+    entry = summarize(hourly, now=datetime(2024, 10, 21), trend_days=7, period="day")[key]
+    assert entry["total"].requests == 5
+    assert entry["recent"].requests == 2
+    assert (entry["previous"].requests, entry["previous"].errors) == (2, 1)
+    assert sorted(entry["periods"]) == [datetime(2024, 9, 1), datetime(2024, 10, 12), datetime(2024, 10, 20)]
@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+
+import pytest
+from openpyxl import Workbook
+
+import bulk_load
+from bulk_load import parse_tsv_field, tsv_field
+from import_historical_data import parse_args, run_import
+from kpi_sheets import SHEETS_BY_NAME
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+ACADEMY = SHEETS_BY_NAME["Tokeniza Academy"]
+
+def write_workbook(path, revenue=1000.0, repeat=False):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = BLUE.name
+    ws.append(BLUE.headers)
+    for day in (1, 2, 3):
+        ws.append([f"2024-10-0{day}", revenue * day, day, 1, 50.0, 10.0, 5.0, 5.0])
+    if repeat:
+        ws.append(["2024-10-01", 1.0, 1, 1, 50.0, 10.0, 5.0, 5.0])
+    ws = wb.create_sheet(ACADEMY.name)
+    ws.append(ACADEMY.headers)
+    ws.append(["2024-10-01", 1854, 154, 5, 6, 450, 320, 8])
+    wb.save(path)
+    return str(path)
+
+def import_args(path, *options):
+    return parse_args([path, "--bulk-load", "--quiet", "--discord-guild-id", "123", *options])
+
+def count(connection, table):
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    total = cursor.fetchone()[0]
+    cursor.close()
+    return total
+
+@pytest.mark.parametrize("value", ["texto", "com\ttab", "linha\nnova", "barra\\n literal", "\\N", "", None, 42])
+def test_tsv_fields_round_trip(value):
+    expected = None if value is None else str(value)
+    assert parse_tsv_field(tsv_field(value)) == expected
+
+def test_bulk_load_merges_new_and_existing_snapshots(tmp_path, database_url, connection):
+    counters = run_import(import_args(write_workbook(tmp_path / "kpis.xlsx")))
+    assert counters["inserted"][BLUE.name] == 3
+
+    path = write_workbook(tmp_path / "kpis-corrigido.xlsx", revenue=2000.0, repeat=True)
+    counters = run_import(import_args(path, "--idempotent", "update"))
+    assert counters["updated"][BLUE.name] == 3
+    assert counters["skipped"][BLUE.name] == 1
+    assert counters["inserted"][BLUE.name] == 0
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT data FROM kpiSnapshots WHERE kpiType = %s ORDER BY snapshotDate", (BLUE.kpi_type,))
+    assert [json.loads(data)["faturamento_mensal"] for (data,) in cursor.fetchall()] == [2000.0, 4000.0, 6000.0]
+    cursor.execute("SELECT name FROM sqlite_master WHERE name LIKE %s", (f"{bulk_load.STAGING_PREFIX}%",))
+    assert cursor.fetchall() == []
+    cursor.close()
+    assert count(connection, "discordMetricsSnapshots") == 1
+
+def test_failed_merge_leaves_no_typed_rows(tmp_path, database_url, connection, monkeypatch):
+    monkeypatch.setattr(bulk_load, "MERGE_INSERT_QUERY", "INSERT INTO tabelaInexistente SELECT * FROM {staging}")
+    assert run_import(import_args(write_workbook(tmp_path / "kpis.xlsx"))) is None
+    assert count(connection, "kpiSnapshots") == 0
+    assert count(connection, "discordMetricsSnapshots") == 0
@@ -0,0 +1,75 @@
+import json
+from datetime import datetime
+
+import pandas as pd
+
+from columnar_ingest import UNKNOWN_COMPANY, convert_frame, detect_sheet_spec, iter_frames
+from import_historical_data import parse_args, run_import
+from kpi_sheets import SHEETS_BY_NAME
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+SOCIAL = SHEETS_BY_NAME["Redes Sociais"]
+
+def blue_frame(days):
+    return pd.DataFrame(
+        [[f"2024-10-{day:02d}", str(1000.0 * day), str(day), "1", "50", "10", "5", "5"] for day in days],
+        columns=BLUE.headers,
+    )
+
+def snapshots(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT companyId, snapshotDate, data FROM kpiSnapshots ORDER BY snapshotDate, id")
+    rows = [(company_id, snapshot_date, json.loads(data)) for company_id, snapshot_date, data in cursor.fetchall()]
+    cursor.close()
+    return rows
+
+def test_detect_sheet_spec_prefers_the_widest_matching_sheet(tmp_path):
+    path = tmp_path / "social.csv"
+    pd.DataFrame(columns=SOCIAL.headers).to_csv(path, index=False)
+    assert detect_sheet_spec(str(path)) is SOCIAL
+
+    path = tmp_path / "blue.csv"
+    blue_frame([1]).to_csv(path, index=False)
+    assert detect_sheet_spec(str(path)) is BLUE
+
+def test_convert_frame_reports_errors_with_spreadsheet_row_numbers():
+    frame = blue_frame([1, 2, 3, 4])
+    frame.loc[1, "faturamento_mensal"] = "abc"
+    frame.loc[2, "data"] = "04/10/2024"
+    frame.loc[3, "novos_clientes"] = "2.5"
+
+    rows, errors = convert_frame(frame, BLUE)
+    assert [row_number for row_number, _ in rows] == [2]
+    assert rows[0][1][:3] == (datetime(2024, 10, 1), 1000.0, 1)
+    assert [(error["row"], error["code"]) for error in errors] == [
+        (3, "invalid_float"), (4, "invalid_date"), (5, "invalid_int"),
+    ]
+
+def test_unknown_company_is_an_error_code_of_its_own():
+    frame = pd.DataFrame([["2024-10-01", "Acme", *["1"] * 12]], columns=SOCIAL.headers)
+    rows, errors = convert_frame(frame, SOCIAL)
+    assert rows == []
+    assert [error["code"] for error in errors] == [UNKNOWN_COMPANY]
+
+def test_parquet_frames_keep_a_continuous_index(tmp_path):
+    path = tmp_path / "blue.parquet"
+    blue_frame(range(1, 6)).to_parquet(path)
+    frames = list(iter_frames(str(path), columns=BLUE.headers, chunk_rows=2))
+    assert [list(frame.index) for frame in frames] == [[0, 1], [2, 3], [4]]
+
+def test_csv_import_skips_blank_rows_and_reimports_without_duplicates(tmp_path, database_url, connection):
+    frame = blue_frame([1, 2, 3])
+    frame.loc[1, "data"] = ""
+    path = str(tmp_path / "blue.csv")
+    frame.to_csv(path, index=False)
+
+    args = parse_args([path, "--no-typed-tables", "--quiet", "--idempotent", "skip", "--commit-every", "2"])
+    run_import(args)
+    run_import(args)
+
+    rows = snapshots(connection)
+    assert [(company_id, snapshot_date) for company_id, snapshot_date, _ in rows] == [
+        (1, datetime(2024, 10, 1)), (1, datetime(2024, 10, 3)),
+    ]
+    assert rows[1][2]["faturamento_mensal"] == 3000.0
+    assert rows[1][2]["novos_clientes"] == 3
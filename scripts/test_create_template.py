@@ -0,0 +1,68 @@
+import json
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+import create_template
+from create_template import create_template as build_template, snapshot_rows
+from import_validation import validate_file
+from kpi_sheets import SHEETS, SHEETS_BY_NAME
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+SOCIAL = SHEETS_BY_NAME["Redes Sociais"]
+
+def data_rows(path, sheet):
+    wb = load_workbook(path, read_only=True)
+    try:
+        rows = [row for row in wb[sheet].iter_rows(min_row=2, values_only=True) if row and row[0]]
+    finally:
+        wb.close()
+    # Só as linhas de dados, antes das instruções
+    return [row for row in rows if not str(row[0]).startswith(("INSTRUÇÕES", "•"))]
+
+def insert_snapshot(connection, company_id, snapshot_date, kpi_type, data):
+    cursor = connection.cursor()
+    cursor.execute(
+        "INSERT INTO kpiSnapshots (companyId, snapshotDate, kpiType, source, data) VALUES (%s, %s, %s, 'manual', %s)",
+        (company_id, snapshot_date, kpi_type, json.dumps(data)),
+    )
+    connection.commit()
+    cursor.close()
+
+def test_default_template_has_every_sheet_and_valid_examples(tmp_path):
+    path = str(tmp_path / "modelo.xlsx")
+    build_template(path)
+    wb = load_workbook(path, read_only=True)
+    assert wb.sheetnames == ["📋 INSTRUÇÕES", *(spec.name for spec in SHEETS)]
+    assert next(wb[BLUE.name].iter_rows(max_row=1, values_only=True))[:BLUE.width] == tuple(BLUE.headers)
+    wb.close()
+    assert validate_file(path)["valid"]
+
+def test_row_sources_stream_past_the_width_sample_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(create_template, "WIDTH_SAMPLE_ROWS", 3)
+    rows = ([f"2024-10-{day:02d}", 1000.0 * day, day, 1, 50.0, 10.0, 5.0, 5.0] for day in range(1, 11))
+    path = str(tmp_path / "blue.xlsx")
+    build_template(path, {BLUE.name: rows}, keywords="teste")
+
+    written = data_rows(path, BLUE.name)
+    assert [row[0] for row in written] == [f"2024-10-{day:02d}" for day in range(1, 11)]
+    assert written[-1][1] == 10000.0
+    wb = load_workbook(path)
+    assert wb.properties.keywords == "teste"
+    # Sem fonte, a aba mantém os exemplos
+    assert len(data_rows(path, SOCIAL.name)) == len(SOCIAL.examples)
+
+def test_snapshot_rows_keep_the_latest_snapshot_of_each_day(database_url, connection):
+    insert_snapshot(connection, 1, datetime(2024, 10, 1), BLUE.kpi_type, {"faturamento_mensal": 100})
+    insert_snapshot(connection, 1, datetime(2024, 10, 1, 18), BLUE.kpi_type, {"faturamento_mensal": 150})
+    insert_snapshot(connection, 1, datetime(2024, 10, 2), BLUE.kpi_type, {"faturamento_mensal": 200})
+    insert_snapshot(connection, 2, datetime(2024, 10, 1), SOCIAL.kpi_type, {"seguidores": {"instagram": 50}})
+    insert_snapshot(connection, 99, datetime(2024, 10, 1), SOCIAL.kpi_type, {"seguidores": {"instagram": 70}})
+
+    rows = list(snapshot_rows(connection, BLUE))
+    assert [(row[0], row[1], row[2]) for row in rows] == [("2024-10-01", 150, None), ("2024-10-02", 200, None)]
+
+    # Empresas fora de COMPANY_MAP não entram na aba Redes Sociais
+    rows = list(snapshot_rows(connection, SOCIAL))
+    instagram = SOCIAL.headers.index("seguidores_instagram")
+    assert [(row[0], row[1], row[instagram]) for row in rows] == [("2024-10-01", "Tokeniza", 50)]
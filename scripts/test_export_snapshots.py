@@ -0,0 +1,63 @@
+import csv
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+from export_snapshots import BASE_COLUMNS, export_snapshots
+
+def insert(connection, rows):
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT INTO kpiSnapshots (companyId, snapshotDate, kpiType, source, data) VALUES (1, %s, %s, 'teste', %s)",
+        [(snapshot_date, kpi_type, json.dumps(data)) for snapshot_date, kpi_type, data in rows],
+    )
+    connection.commit()
+    cursor.close()
+
+def read_csv(path):
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+def test_columns_cover_keys_after_the_first_block(tmp_path, connection):
+    insert(connection, [
+        (datetime(2024, 10, 1), "pipedrive_revenue", {"total": 10, "id": "colide"}),
+        (datetime(2024, 10, 2), "pipedrive_revenue", {"total": 12.5}),
+        # Chave que só aparece depois do primeiro bloco
+        (datetime(2024, 10, 3), "pipedrive_revenue", {"total": 13, "deals": {"won": 2}}),
+    ])
+    results = export_snapshots(connection, str(tmp_path), "csv", batch_size=2)
+    path, rows = results["pipedrive_revenue"]
+    assert rows == 3
+
+    records = read_csv(path)
+    assert list(records[0]) == [*BASE_COLUMNS, "data.deals.won", "data.id", "data.total"]
+    assert [record["data.total"] for record in records] == ["10.0", "12.5", "13.0"]
+    assert [record["data.deals.won"] for record in records] == ["", "", "2"]
+    # A chave `id` do JSON não sobrescreve o id do snapshot
+    assert records[0]["data.id"] == "colide"
+    assert records[0]["id"] != "colide"
+
+def test_registry_kpi_types_start_with_the_template_columns(tmp_path, connection):
+    insert(connection, [
+        (datetime(2024, 10, 1), "metricool_social", {"total_posts": 61, "seguidores": {"instagram": 14200}, "extra": True}),
+    ])
+    path, _ = export_snapshots(connection, str(tmp_path), "csv")["metricool_social"]
+    record = read_csv(path)[0]
+    columns = list(record)
+    assert columns.index("data.total_posts") < columns.index("data.seguidores.instagram") < columns.index("data.extra")
+    assert record["data.seguidores.instagram"] == "14200"
+    assert record["data.seguidores.tiktok"] == ""
+    assert record["data.extra"] == "True"
+
+def test_parquet_export_uses_typed_columns(tmp_path, connection):
+    pq = pytest.importorskip("pyarrow.parquet")
+    insert(connection, [
+        (datetime(2024, 10, 1), "pipedrive_revenue", {"total": 10}),
+        (datetime(2024, 10, 2), "pipedrive_revenue", {"total": 12.5, "owner": "Ana"}),
+    ])
+    path, _ = export_snapshots(connection, str(tmp_path), "parquet", batch_size=1)["pipedrive_revenue"]
+    table = pq.read_table(path)
+    assert str(table.schema.field("data.total").type) == "double"
+    assert table.column("data.owner").to_pylist() == [None, "Ana"]
@@ -0,0 +1,146 @@
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+from openpyxl import Workbook
+
+from import_historical_data import ChunkCommitter, ImportJournal, SnapshotBatcher, SnapshotKeyIndex, parse_args, run_import
+from kpi_sheets import SHEETS_BY_NAME
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+
+def write_workbook(path, days):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = BLUE.name
+    ws.append(BLUE.headers)
+    for day in range(1, days + 1):
+        ws.append([f"2024-10-{day:02d}", 1000.0 * day, day, 1, 50.0, 10.0, 5.0, 5.0])
+    wb.save(path)
+    return str(path)
+
+def snapshots(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT snapshotDate, data FROM kpiSnapshots ORDER BY snapshotDate, id")
+    rows = [(snapshot_date, json.loads(data)["faturamento_mensal"]) for snapshot_date, data in cursor.fetchall()]
+    cursor.close()
+    return rows
+
+def import_args(path, *options):
+    return parse_args([path, "--no-typed-tables", "--quiet", *options])
+
+def add(batcher, day, revenue):
+    batcher.add(BLUE.name, f"2024-10-{day:02d}", 1, datetime(2024, 10, day), BLUE.kpi_type, BLUE.source,
+                {"faturamento_mensal": revenue})
+
+def test_batcher_writes_in_batches_and_skips_or_updates_existing_keys(connection):
+    cursor = connection.cursor()
+    batcher = SnapshotBatcher(cursor, batch_size=2)
+    add(batcher, 1, 100)
+    add(batcher, 2, 200)
+    assert batcher.pending == []
+    add(batcher, 3, 300)
+    batcher.close()
+    connection.commit()
+    assert batcher.inserted[BLUE.name] == 3
+
+    key_index = SnapshotKeyIndex.load(cursor, [BLUE.kpi_type], datetime(2024, 10, 1), datetime(2024, 10, 31))
+    assert len(key_index) == 3
+    batcher = SnapshotBatcher(cursor, batch_size=10, key_index=key_index, on_conflict="update")
+    add(batcher, 2, 250)
+    add(batcher, 2, 999)  # repetida na planilha: ignorada
+    add(batcher, 4, 400)
+    batcher.close()
+    connection.commit()
+    assert batcher.updated[BLUE.name] == 1
+    assert batcher.inserted[BLUE.name] == 1
+    assert batcher.skipped[BLUE.name] == 1
+    assert batcher.updated_ids == [key_index.existing_ids[(1, datetime(2024, 10, 2), BLUE.kpi_type)]]
+    assert [revenue for _, revenue in snapshots(connection)] == [100, 250, 300, 400]
+    cursor.close()
+
+def test_journal_save_and_load(tmp_path):
+    path = str(tmp_path / "kpis.xlsx.journal.json")
+    journal = ImportJournal(path, "abc")
+    journal.mark(BLUE.name, 41)
+    journal.mark("Cademi Cursos", 10, done=True)
+
+    loaded = ImportJournal.load(path)
+    assert loaded.file_hash == "abc"
+    assert loaded.last_row(BLUE.name) == 41
+    assert not loaded.is_done(BLUE.name)
+    assert loaded.is_done("Cademi Cursos")
+    assert loaded.last_row("Redes Sociais") is None
+
+def test_resume_continues_after_the_last_committed_chunk(tmp_path, database_url, connection, monkeypatch):
+    path = write_workbook(tmp_path / "kpis.xlsx", 7)
+    commits = []
+    original_commit = ChunkCommitter.commit
+
+    def failing_commit(self, sheet, done=False):
+        # O terceiro bloco (linhas 6 e 7) falha depois de dois blocos confirmados
+        if len(commits) == 2:
+            raise RuntimeError("conexão perdida")
+        commits.append(self.last_row)
+        original_commit(self, sheet, done)
+
+    monkeypatch.setattr(ChunkCommitter, "commit", failing_commit)
+    assert run_import(import_args(path, "--commit-every", "2", "--idempotent", "skip")) is None
+    assert commits == [3, 5]
+
+    journal = ImportJournal.load(f"{path}.journal.json")
+    assert journal.last_row(BLUE.name) == 5
+    assert not journal.is_done(BLUE.name)
+    assert len(snapshots(connection)) == 4
+
+    monkeypatch.setattr(ChunkCommitter, "commit", original_commit)
+    counters = run_import(import_args(path, "--resume", "--idempotent", "skip"))
+    assert counters["inserted"][BLUE.name] == 3
+    assert counters["skipped"][BLUE.name] == 0
+    assert [revenue for _, revenue in snapshots(connection)] == [1000.0 * day for day in range(1, 8)]
+    assert ImportJournal.load(f"{path}.journal.json").is_done(BLUE.name)
+
+def test_resume_refuses_a_changed_file(tmp_path, database_url):
+    path = write_workbook(tmp_path / "kpis.xlsx", 3)
+    ImportJournal(f"{path}.journal.json", "outro-hash").save()
+    with pytest.raises(SystemExit):
+        run_import(import_args(path, "--resume"))
+
+@pytest.mark.parametrize("options", [(), ("--commit-every", "2")], ids=["single-commit", "chunked"])
+def test_transient_error_retries_the_import_without_duplicates(tmp_path, database_url, connection, monkeypatch, options):
+    path = write_workbook(tmp_path / "kpis.xlsx", 7)
+    calls = []
+    original_execute = SnapshotBatcher._execute_batch
+
+    def locked_once(self, query, batch, counter):
+        calls.append(len(batch))
+        # O segundo lote encontra o banco bloqueado por outro processo
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("database is locked")
+        original_execute(self, query, batch, counter)
+
+    monkeypatch.setattr(SnapshotBatcher, "_execute_batch", locked_once)
+    counters = run_import(import_args(path, "--batch-size", "2", *options))
+    assert counters["inserted"][BLUE.name] == 7
+    assert counters["failed"][BLUE.name] == 0
+    assert [revenue for _, revenue in snapshots(connection)] == [1000.0 * day for day in range(1, 8)]
+
+def test_dedupe_removes_the_metric_values_of_the_deleted_snapshots(tmp_path, database_url, connection):
+    path = write_workbook(tmp_path / "kpis.xlsx", 3)
+    # Duas importações sem --idempotent duplicam os snapshots e suas métricas
+    run_import(import_args(path, "--metric-values"))
+    run_import(import_args(path, "--metric-values"))
+    assert len(snapshots(connection)) == 6
+
+    counters = run_import(import_args(path, "--dedupe", "--idempotent", "skip", "--metric-values"))
+    assert counters["skipped"][BLUE.name] == 3
+    cursor = connection.cursor()
+    cursor.execute("SELECT id FROM kpiSnapshots")
+    kept = {row[0] for row in cursor.fetchall()}
+    cursor.execute("SELECT snapshotId, COUNT(*) FROM kpiMetricValues GROUP BY snapshotId")
+    metric_counts = dict(cursor.fetchall())
+    cursor.close()
+    assert len(kept) == 3
+    assert set(metric_counts) == kept
+    assert set(metric_counts.values()) == {len(BLUE.columns) - 1}
@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+from import_manifest import CHANGED, DUPLICATE, NEW, UNCHANGED, RowManifest
+from kpi_sheets import SHEETS_BY_NAME
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+SOCIAL = SHEETS_BY_NAME["Redes Sociais"]
+TARGET = "sqlite:/tmp/kpis.db"
+
+def blue_row(day, revenue):
+    return (day, revenue, 12, 61, 89.8, 17800.0, 246300.0, -228600.0)
+
+def test_row_key_matches_importer_labels():
+    assert RowManifest.row_key(BLUE, blue_row(datetime(2024, 10, 1), 1)) == "2024-10-01"
+    assert RowManifest.row_key(BLUE, blue_row("2024-10-01", 1)) == "2024-10-01"
+    social_row = ("2024-10-01", " Tokeniza ") + (0,) * 12
+    assert RowManifest.row_key(SOCIAL, social_row) == "2024-10-01 - Tokeniza"
+
+def test_row_key_is_none_for_rows_the_converter_handles():
+    assert RowManifest.row_key(BLUE, blue_row(None, 1)) is None
+    assert RowManifest.row_key(BLUE, blue_row("INSTRUÇÕES", 1)) is None
+    assert RowManifest.row_key(BLUE, blue_row("01/10/2024", 1)) is None
+    assert RowManifest.row_key(SOCIAL, ("2024-10-01", None) + (0,) * 12) is None
+
+def test_check_diffs_rows_against_the_saved_manifest(tmp_path):
+    path = str(tmp_path / "kpis.xlsx.manifest.json")
+    manifest = RowManifest.open(path, TARGET)
+    assert manifest.check(BLUE.name, "2024-10-01", blue_row("2024-10-01", 100)) == NEW
+    assert manifest.check(BLUE.name, "2024-10-02", blue_row("2024-10-02", 200)) == NEW
+    assert manifest.check(BLUE.name, "2024-10-01", blue_row("2024-10-01", 999)) == DUPLICATE
+    manifest.save("hash-1")
+
+    manifest = RowManifest.open(path, TARGET)
+    assert len(manifest) == 2
+    assert manifest.file_hash == "hash-1"
+    assert manifest.check(BLUE.name, "2024-10-01", blue_row("2024-10-01", 100)) == UNCHANGED
+    assert manifest.check(BLUE.name, "2024-10-02", blue_row("2024-10-02", 250)) == CHANGED
+    assert manifest.check(BLUE.name, "2024-10-03", blue_row("2024-10-03", 300)) == NEW
+    assert manifest.counts == {UNCHANGED: 1, CHANGED: 1, NEW: 1}
+
+def test_discarded_rows_stay_out_of_the_manifest(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = RowManifest.open(path, TARGET)
+    manifest.check(BLUE.name, "2024-10-01", blue_row("2024-10-01", 100))
+    manifest.check(BLUE.name, "2024-10-02", blue_row("2024-10-02", 200))
+    manifest.discard(BLUE.name, "2024-10-02")
+    manifest.save()
+
+    manifest = RowManifest.open(path, TARGET)
+    assert manifest.file_hash is None
+    assert manifest.check(BLUE.name, "2024-10-01", blue_row("2024-10-01", 100)) == UNCHANGED
+    assert manifest.check(BLUE.name, "2024-10-02", blue_row("2024-10-02", 200)) == NEW
+
+def test_manifest_of_another_database_starts_empty(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = RowManifest.open(path, TARGET)
+    manifest.check(BLUE.name, "2024-10-01", blue_row("2024-10-01", 100))
+    manifest.save("hash-1")
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["target"] == TARGET
+
+    other = RowManifest.open(path, "db.exemplo.com:3306/kpis")
+    assert len(other) == 0
+    assert other.file_hash is None
+    assert other.check(BLUE.name, "2024-10-01", blue_row("2024-10-01", 100)) == NEW
@@ -0,0 +1,82 @@
+import json
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from import_historical_data import parse_args, run_import
+from import_validation import validate_file
+from kpi_sheets import SHEETS_BY_NAME
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+SOCIAL = SHEETS_BY_NAME["Redes Sociais"]
+
+def blue_row(day, **values):
+    row = dict(zip(BLUE.headers, [f"2024-10-{day:02d}", 1000.0, 3, 1, 50.0, 10.0, 5.0, 5.0]))
+    row.update(values)
+    return [row[header] for header in BLUE.headers]
+
+def write_workbook(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = BLUE.name
+    ws.append(BLUE.headers)
+    ws.append(blue_row(1))
+    ws.append(blue_row(2, taxa_conversao=140))
+    ws.append(blue_row(3, novos_clientes=-2))
+    ws.append(blue_row(1))
+    ws.append(blue_row(4, data="2024/10/04"))
+    ws.append([])
+    ws.append(["INSTRUÇÕES:"])
+    ws.append(["• Formato de data: YYYY-MM-DD"])
+    wb.save(path)
+    return str(path)
+
+def codes(sheet):
+    return [(issue["row"], issue["column"], issue["code"]) for issue in sheet["issues"]]
+
+def test_workbook_report_lists_every_issue_with_its_row(tmp_path):
+    report = validate_file(write_workbook(tmp_path / "kpis.xlsx"))
+    assert not report["valid"]
+    assert report["missing_sheets"] == ["Tokeniza Academy", "Redes Sociais", "Cademi Cursos"]
+
+    sheet = report["sheets"][BLUE.name]
+    assert codes(sheet) == [
+        (3, "taxa_conversao", "out_of_range"),
+        (4, "novos_clientes", "out_of_range"),
+        (5, "data", "duplicate_date"),
+        (6, "data", "invalid_date"),
+    ]
+    assert "primeira ocorrência na linha 2" in sheet["issues"][2]["message"]
+    # Linha vazia e linha de instruções não contam
+    assert (sheet["rows"], sheet["valid_rows"], report["total_errors"]) == (5, 1, 4)
+
+def test_duplicates_are_per_company_in_columnar_files(tmp_path):
+    metrics = ["1"] * (SOCIAL.width - 2)
+    frame = pd.DataFrame(
+        [
+            ["2024-10-01", "Blue Consult", *metrics],
+            ["2024-10-01", "Tokeniza", *metrics],
+            ["2024-10-01", "Tokeniza", *metrics],
+            ["2024-10-02", "Acme", *metrics],
+        ],
+        columns=SOCIAL.headers,
+    )
+    path = tmp_path / "social.csv"
+    frame.to_csv(path, index=False)
+
+    sheet = validate_file(str(path))["sheets"][SOCIAL.name]
+    assert codes(sheet) == [(4, "data", "duplicate_date"), (5, "empresa", "unknown_company")]
+
+def test_validate_only_writes_the_report_without_touching_the_database(tmp_path, database_url, connection):
+    path = write_workbook(tmp_path / "kpis.xlsx")
+    report_path = tmp_path / "relatorio.json"
+    with pytest.raises(SystemExit) as exit_info:
+        run_import(parse_args([path, "--validate-only", "--report", str(report_path)]))
+    assert exit_info.value.code == 1
+    assert json.loads(report_path.read_text(encoding="utf-8"))["total_errors"] == 4
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM kpiSnapshots")
+    assert cursor.fetchone()[0] == 0
+    cursor.close()
@@ -0,0 +1,91 @@
+import json
+import os
+import signal
+from argparse import Namespace
+
+import pytest
+from openpyxl import Workbook
+
+import ingest_daemon
+from kpi_sheets import SHEETS_BY_NAME
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+
+@pytest.fixture(autouse=True)
+def restore_signal_handlers():
+    # run() instala seus próprios tratadores de SIGINT e SIGTERM
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+    yield
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+def write_workbook(path, days):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = BLUE.name
+    ws.append(BLUE.headers)
+    for day in range(1, days + 1):
+        ws.append([f"2024-10-{day:02d}", 1000.0 * day, day, 1, 50.0, 10.0, 5.0, 5.0])
+    wb.save(path)
+
+def run_once(root, *options):
+    args = Namespace(watch_dir=str(root), workers=1, poll_interval=0.05, settle=0, once=True)
+    return ingest_daemon.run(args, ["--no-typed-tables", "--quiet", *options])
+
+def report(root, status, name):
+    with open(os.path.join(root, status, f"{name}.report.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def snapshot_count(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM kpiSnapshots")
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return count
+
+@pytest.mark.parametrize("options, message", [
+    (["--workers", "2"], "--workers"),
+    (["--commit-every", "100"], "--commit-every exige --idempotent"),
+    (["--incremental", "outro.json"], "--incremental não aceita caminho"),
+])
+def test_unsupported_import_options_are_refused(options, message):
+    with pytest.raises(ValueError, match=message):
+        ingest_daemon.parse_import_options(options)
+
+def test_temporary_and_hidden_files_are_ignored():
+    assert ingest_daemon.is_ingestable("kpis.xlsx")
+    assert ingest_daemon.is_ingestable("blue.csv.gz")
+    assert not ingest_daemon.is_ingestable("~$kpis.xlsx")
+    assert not ingest_daemon.is_ingestable(".kpis.xlsx")
+    assert not ingest_daemon.is_ingestable("kpis.xlsx.part")
+
+def test_files_are_moved_to_done_or_failed_with_their_reports(tmp_path, database_url, connection):
+    write_workbook(tmp_path / "kpis.xlsx", 3)
+    (tmp_path / "outro.csv").write_text("coluna,desconhecida\n1,2\n", encoding="utf-8")
+    # Arquivo de uma parada anterior volta para a fila
+    os.makedirs(tmp_path / ingest_daemon.PROCESSING_DIR)
+    write_workbook(tmp_path / ingest_daemon.PROCESSING_DIR / "antigo.xlsx", 1)
+
+    assert run_once(tmp_path) == {"done": 2, "failed": 1}
+    assert sorted(os.listdir(tmp_path / ingest_daemon.PROCESSING_DIR)) == []
+
+    done = report(tmp_path, ingest_daemon.DONE_DIR, "kpis.xlsx")
+    assert done["status"] == "done"
+    assert done["totals"]["inserted"] == 3
+    assert os.path.exists(tmp_path / ingest_daemon.DONE_DIR / "kpis.xlsx.log")
+    failed = report(tmp_path, ingest_daemon.FAILED_DIR, "outro.csv")
+    assert "não corresponde a nenhuma aba" in failed["error"]
+    assert snapshot_count(connection) == 4
+
+def test_incremental_manifest_stays_in_the_watch_folder(tmp_path, database_url, connection):
+    write_workbook(tmp_path / "kpis.xlsx", 2)
+    assert run_once(tmp_path, "--incremental") == {"done": 1, "failed": 0}
+    assert os.path.exists(ingest_daemon.manifest_path(str(tmp_path), "kpis.xlsx"))
+
+    # O parceiro envia de novo o arquivo com o mesmo nome e um dia a mais
+    write_workbook(tmp_path / "kpis.xlsx", 3)
+    assert run_once(tmp_path, "--incremental") == {"done": 1, "failed": 0}
+    assert snapshot_count(connection) == 3
+    repeated = [name for name in os.listdir(tmp_path / ingest_daemon.DONE_DIR) if name.endswith("_kpis.xlsx.report.json")]
+    with open(tmp_path / ingest_daemon.DONE_DIR / repeated[0], encoding="utf-8") as f:
+        assert json.load(f)["totals"]["inserted"] == 1
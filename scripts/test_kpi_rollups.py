@@ -0,0 +1,91 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from import_historical_data import SnapshotBatcher, SnapshotKeyIndex
+from kpi_rollups import Series, aggregate, find_changes_since, rollup_rows, rollup_series
+
+COMPUTED_AT = datetime(2024, 2, 1, 12, 0)
+
+# 2024-01-01 é uma segunda-feira
+SNAPSHOTS = [
+    (datetime(2024, 1, 1, 9, 0), {"receita": 100, "seguidores": {"instagram": 10}}),
+    (datetime(2024, 1, 3, 9, 0), {"receita": 120, "seguidores": {"instagram": 11}}),
+    (datetime(2024, 1, 3, 18, 0), {"receita": 130}),
+    (datetime(2024, 1, 9, 9, 0), {"receita": 65, "seguidores": {"instagram": 15}, "ativo": True}),
+]
+
+def test_series_uses_a_daily_grid_and_the_last_value_of_each_day():
+    series = Series.from_snapshots(SNAPSHOTS)
+    assert series.metrics == ["receita", "seguidores.instagram"]
+    assert series.days[0] == np.datetime64("2024-01-01")
+    assert len(series.days) == 9
+    receita = series.values[:, 0]
+    assert receita[2] == 130
+    assert series.values[2, 1] == 11
+    assert np.isnan(receita[1])
+
+def test_weekly_aggregate_starts_on_monday_and_compares_with_the_previous_week():
+    starts, stats = aggregate(Series.from_snapshots(SNAPSHOTS), "week")
+    assert list(starts) == [np.datetime64("2024-01-01"), np.datetime64("2024-01-08")]
+    assert list(stats["last"][:, 0]) == [130, 65]
+    assert list(stats["samples"][:, 0]) == [2, 1]
+    assert stats["avg"][0, 0] == 115
+    assert stats["min"][0, 0] == 100 and stats["max"][0, 0] == 130
+    assert np.isnan(stats["delta"][0, 0])
+    assert stats["delta"][1, 0] == -65
+    assert stats["delta_pct"][1, 0] == pytest.approx(-50.0)
+    assert stats["rolling_avg"][1, 0] == pytest.approx(97.5)
+
+def test_rollup_rows_only_cover_periods_from_the_cutoff_with_data():
+    series = Series.from_snapshots(SNAPSHOTS)
+    cutoffs = {"day": datetime(2024, 1, 3), "week": datetime(2024, 1, 8)}
+    rows = list(rollup_rows(series, None, "blue_consult_all", cutoffs, COMPUTED_AT))
+    selected = {(period, metric, start) for _, _, metric, period, start, *_ in rows}
+    assert selected == {
+        ("day", "receita", datetime(2024, 1, 3)),
+        ("day", "seguidores.instagram", datetime(2024, 1, 3)),
+        ("day", "receita", datetime(2024, 1, 9)),
+        ("day", "seguidores.instagram", datetime(2024, 1, 9)),
+        ("week", "receita", datetime(2024, 1, 8)),
+        ("week", "seguidores.instagram", datetime(2024, 1, 8)),
+        ("month", "receita", datetime(2024, 1, 1)),
+        ("month", "seguidores.instagram", datetime(2024, 1, 1)),
+    }
+    # Empresa ausente é gravada como 0, e o dia 09 compara com o último valor conhecido (dia 03)
+    day_9 = next(row for row in rows if row[3] == "day" and row[2] == "receita" and row[4] == datetime(2024, 1, 9))
+    assert day_9[0] == 0
+    assert day_9[5] == 65 and day_9[10] == -65
+    assert day_9[-1] == COMPUTED_AT
+
+def test_snapshot_updated_in_place_is_rolled_up_again(connection):
+    cursor = connection.cursor()
+    # Snapshots gravados bem antes do primeiro cálculo
+    cursor.executemany(
+        "INSERT INTO kpiSnapshots (companyId, snapshotDate, kpiType, source, data, createdAt, updatedAt)"
+        " VALUES (1, %s, 'blue_consult_all', 'manual', %s, '2024-01-10 00:00:00', '2024-01-10 00:00:00')",
+        [(datetime(2024, 1, day), json.dumps({"receita": 100 * day})) for day in (1, 2, 3)],
+    )
+    connection.commit()
+    assert rollup_series(connection, 1, "blue_consult_all") > 0
+    assert find_changes_since(cursor, 1, "blue_consult_all") is None
+
+    # --idempotent update regrava o dia 2 sem mudar createdAt
+    key_index = SnapshotKeyIndex.load(cursor, ["blue_consult_all"], datetime(2024, 1, 1), datetime(2024, 1, 3))
+    batcher = SnapshotBatcher(cursor, key_index=key_index, on_conflict="update")
+    batcher.add("Blue Consult", "2024-01-02", 1, datetime(2024, 1, 2), "blue_consult_all", "manual", {"receita": 250})
+    batcher.close()
+    connection.commit()
+    assert batcher.updated["Blue Consult"] == 1
+    assert find_changes_since(cursor, 1, "blue_consult_all") == datetime(2024, 1, 2)
+
+    rollup_series(connection, 1, "blue_consult_all")
+    cursor.execute(
+        "SELECT lastValue FROM kpiRollups WHERE companyId = 1 AND metric = 'receita' AND period = 'day'"
+        " AND periodStart = %s",
+        (datetime(2024, 1, 2),),
+    )
+    assert cursor.fetchone()[0] == 250
+    cursor.close()
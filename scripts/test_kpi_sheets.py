@@ -0,0 +1,104 @@
+from datetime import date, datetime
+
+import pytest
+
+from kpi_sheets import (
+    COMPANY_MAP, SHEETS, SHEETS_BY_NAME, UnknownCompanyError, build_converter, build_unfilled_check, parse_date,
+)
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+SOCIAL = SHEETS_BY_NAME["Redes Sociais"]
+
+def test_parse_date_accepts_native_and_iso_values():
+    assert parse_date(datetime(2024, 10, 1, 15, 30)) == datetime(2024, 10, 1, 15, 30)
+    assert parse_date(date(2024, 10, 1)) == datetime(2024, 10, 1)
+    assert parse_date("2024-10-01") == datetime(2024, 10, 1)
+    assert parse_date(" 2024-10-01 ") == datetime(2024, 10, 1)
+
+@pytest.mark.parametrize("value", ["01/10/2024", "2024-13-01", "2024-10-1x", "ontem"])
+def test_parse_date_rejects_other_formats(value):
+    with pytest.raises(ValueError):
+        parse_date(value)
+
+def test_converter_builds_data_with_fixed_company():
+    convert = build_converter(BLUE)
+    row = ("2024-10-01", "180000.00", "12", "61", "89.8", "17800.00", "246300.00", "-228600.00")
+    company_id, snapshot_date, data = convert(row)
+    assert company_id == 1
+    assert snapshot_date == datetime(2024, 10, 1)
+    assert data == {
+        "faturamento_mensal": 180000.0,
+        "novos_clientes": 12,
+        "clientes_implantacao": 61,
+        "taxa_conversao": 89.8,
+        "receitas_nibo": 17800.0,
+        "despesas_nibo": 246300.0,
+        "saldo_nibo": -228600.0,
+    }
+
+def test_converter_resolves_company_and_nests_keys():
+    convert = build_converter(SOCIAL)
+    row = (datetime(2024, 10, 1), " Tokeniza ", 61, 363, 2.09, 6600, 95400, 14200, 1, None, 0, 0, 0, 0)
+    company_id, _, data = convert(row)
+    assert company_id == 2
+    assert data["total_posts"] == 61
+    # Célula vazia em uma linha com outras métricas vira zero
+    assert data["seguidores"] == {
+        "instagram": 14200, "facebook": 1, "youtube": 0, "twitter": 0, "linkedin": 0, "tiktok": 0, "threads": 0,
+    }
+
+def test_converter_rejects_unknown_company():
+    convert = build_converter(SOCIAL)
+    row = ("2024-10-01", "Outra", 1) + (None,) * 11
+    with pytest.raises(UnknownCompanyError):
+        convert(row)
+
+@pytest.mark.parametrize(
+    "row",
+    [
+        (None,) * 8,
+        ("INSTRUÇÕES DE PREENCHIMENTO",) + (None,) * 7,
+        ("• Use o formato YYYY-MM-DD", "x") + (None,) * 6,
+    ],
+)
+def test_converter_skips_blank_and_instruction_rows(row):
+    assert build_converter(BLUE)(row) is None
+
+def test_unfilled_check_only_matches_rows_without_any_metric():
+    unfilled = build_unfilled_check(SOCIAL)
+    assert unfilled(("2024-10-01", "Tokeniza") + (None,) * 12)
+    assert unfilled(("2024-10-01", "Tokeniza", "") + (None,) * 11)
+    # Zero é valor preenchido
+    assert not unfilled(("2024-10-01", "Tokeniza", 0) + (None,) * 11)
+    # Fora da planilha de reposição a linha só com a data vira um snapshot zerado
+    _, _, data = build_converter(BLUE)(("2024-10-01",) + (None,) * 7)
+    assert set(data.values()) == {0}
+
+def test_typed_converter_only_builds_data():
+    convert = build_converter(BLUE, typed=True)
+    row = (datetime(2024, 10, 1), 1.5, 2, 3, 4.0, 5.0, 6.0, 7.0)
+    assert convert(row) == (1, datetime(2024, 10, 1), {
+        "faturamento_mensal": 1.5,
+        "novos_clientes": 2,
+        "clientes_implantacao": 3,
+        "taxa_conversao": 4.0,
+        "receitas_nibo": 5.0,
+        "despesas_nibo": 6.0,
+        "saldo_nibo": 7.0,
+    })
+
+@pytest.mark.parametrize("spec", SHEETS, ids=lambda spec: spec.name)
+def test_every_sheet_converts_its_template_examples(spec):
+    convert = build_converter(spec)
+    for example in spec.examples:
+        row = ("2024-10-01",) + tuple(example)
+        company_id, snapshot_date, data = convert(row)
+        assert snapshot_date == datetime(2024, 10, 1)
+        assert company_id == (spec.company_id or COMPANY_MAP[example[0]])
+        for column, value in zip(spec.columns[1:], example):
+            if column.type not in ("int", "float"):
+                continue
+            node = data
+            for key in column.path:
+                node = node[key]
+            assert node == (int(value) if column.type == "int" else float(value))
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import threading
+from argparse import Namespace
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from lead_journey_warmer import CACHE_TTL, CacheWarmer, cache_row, default_clients, fresh_emails
+
+MAUTIC_DATA = {
+    "contact": {"id": 7, "utmtags": [{"utm_source": "newsletter"}], "dateAdded": "2024-01-01T10:00:00+00:00"},
+    "activities": [
+        {"event": "email.read", "timestamp": "2024-01-01T09:00:00+00:00"},
+        {"event": "page.hit", "timestamp": "2024-01-03T10:00:00+00:00", "details": {"query": "utm_source=meta"}},
+        {
+            "event": "page.hit",
+            "timestamp": "2024-01-02T10:00:00.000Z",
+            "details": {"query": "?utm_source=google&utm_medium=cpc&utm_campaign=leads"},
+        },
+    ],
+    "campaigns": [],
+    "segments": [],
+}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Mautic e Pipedrive de teste: um lead por e-mail; e-mails none@... não existem no Mautic"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        self.server.paths.append(url.path)
+        if url.path == "/api/contacts":
+            email = query["search"][0].split(":", 1)[1]
+            if self.server.fail_next.pop(email, False):
+                self.send_response(503)
+                self.end_headers()
+                return
+            contact = {"id": 7, "fields": {"all": {"email": email}}, "utmtags": [], "dateAdded": "2024-01-01T10:00:00+00:00"}
+            body = {"contacts": {} if email.startswith("none") else {"7": contact}}
+        elif url.path == "/api/contacts/7/activity":
+            page = int(query["page"][0])
+            event = {
+                "event": "page.hit",
+                "timestamp": f"2024-01-0{page}T10:00:00+00:00",
+                "details": {"query": f"utm_source=page{page}"},
+            }
+            body = {"events": [event], "maxPages": 2}
+        elif url.path == "/api/contacts/7/campaigns":
+            body = {"campaigns": {"1": {"id": 1, "name": "Boas-vindas"}}}
+        elif url.path == "/api/contacts/7/segments":
+            body = {"lists": {"2": {"id": 2, "name": "Leads"}}}
+        elif url.path == "/v1/persons/search":
+            body = {"success": True, "data": {"items": [{"item": {"id": 99, "name": "Lead"}}]}}
+        elif url.path == "/v1/persons/99/deals":
+            body = {"success": True, "data": [
+                {"id": 4, "status": "open"},
+                {"id": 5, "status": "won", "won_time": "2024-02-01T10:00:00.000Z"},
+            ]}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(data)
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.paths = []
+    server.fail_next = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_cache_row_uses_the_first_page_hit_and_normalizes_dates():
+    now = datetime(2024, 3, 1, 8, 0)
+    email, mautic_json, pipedrive_json, analysis, cached_at, expires_at = cache_row(
+        "lead@exemplo.com", MAUTIC_DATA, {"person": None, "deals": [], "wonDeal": None}, now
+    )
+    mautic = json.loads(mautic_json)
+    assert email == "lead@exemplo.com"
+    assert mautic["acquisition"] == {
+        "utm_source": "google", "utm_medium": "cpc", "utm_campaign": "leads", "utm_content": None, "utm_term": None,
+    }
+    assert mautic["contact"]["dateAdded"] == "2024-01-01 10:00:00"
+    assert mautic["activities"][2]["timestamp"] == "2024-01-02 10:00:00"
+    assert json.loads(pipedrive_json) == {"person": None, "deals": [], "wonDeal": None}
+    assert analysis == ""
+    assert (cached_at, expires_at) == (now, now + CACHE_TTL)
+    # O dicionário original não recebe `acquisition`
+    assert "acquisition" not in MAUTIC_DATA
+
+def test_cache_row_falls_back_to_the_contact_utm_tags():
+    data = {**MAUTIC_DATA, "activities": [{"event": "page.hit", "timestamp": "2024-01-02T10:00:00Z", "details": {}}]}
+    mautic = json.loads(cache_row("lead@exemplo.com", data, {}, datetime(2024, 3, 1))[1])
+    assert mautic["acquisition"] == {"utm_source": "newsletter"}
+
+def test_warmer_fetches_both_apis_and_upserts_the_cache(stand_in, connection):
+    base_url = f"http://127.0.0.1:{stand_in.server_port}"
+    args = Namespace(mautic_url=base_url, pipedrive_url=f"{base_url}/v1", mautic_rps=0, pipedrive_rps=0)
+    mautic, pipedrive = default_clients(args)
+    stand_in.fail_next["retry@exemplo.com"] = True
+
+    warmer = CacheWarmer(connection, mautic, pipedrive, concurrency=4, batch_size=2)
+    emails = ["lead@exemplo.com", "retry@exemplo.com", "none@exemplo.com"]
+    asyncio.run(warmer.run(emails))
+
+    assert warmer.counts == {"written": 2, "not_found": 1}
+    assert stand_in.paths.count("/api/contacts") == 4
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT email, mauticData, pipedriveData, cachedAt, expiresAt FROM leadJourneyCache ORDER BY email")
+    rows = cursor.fetchall()
+    cursor.close()
+    assert [row[0] for row in rows] == ["lead@exemplo.com", "retry@exemplo.com"]
+    email, mautic_json, pipedrive_json, cached_at, expires_at = rows[0]
+    mautic_data = json.loads(mautic_json)
+    assert [event["timestamp"] for event in mautic_data["activities"]] == ["2024-01-01 10:00:00", "2024-01-02 10:00:00"]
+    assert mautic_data["acquisition"]["utm_source"] == "page1"
+    assert mautic_data["campaigns"] == [{"id": 1, "name": "Boas-vindas"}]
+    pipedrive_data = json.loads(pipedrive_json)
+    assert pipedrive_data["wonDeal"] == {"id": 5, "status": "won", "won_time": "2024-02-01 10:00:00"}
+    assert expires_at - cached_at == CACHE_TTL
+
+    # As entradas recém-gravadas ficam de fora da próxima execução
+    assert fresh_emails(connection, emails, datetime.now()) == {"lead@exemplo.com", "retry@exemplo.com"}
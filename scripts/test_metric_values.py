@@ -0,0 +1,70 @@
+import json
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from import_historical_data import parse_args, run_import
+from kpi_sheets import SHEETS_BY_NAME
+from metric_values import backfill, metric_rows, snapshot_filters
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+
+def write_workbook(path, revenue):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = BLUE.name
+    ws.append(BLUE.headers)
+    for day in (1, 2):
+        ws.append([f"2024-10-0{day}", revenue * day, day, 1, 50.0, 10.0, 5.0, 5.0])
+    wb.save(path)
+    return str(path)
+
+def import_args(path, *options):
+    return parse_args([path, "--no-typed-tables", "--quiet", *options])
+
+def revenue_values(connection):
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT snapshotDate, value FROM kpiMetricValues WHERE metric = 'faturamento_mensal' ORDER BY snapshotDate"
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def insert_snapshot(connection, company_id, kpi_type, data):
+    cursor = connection.cursor()
+    cursor.execute(
+        "INSERT INTO kpiSnapshots (companyId, snapshotDate, kpiType, source, data) VALUES (%s, %s, %s, 'manual', %s)",
+        (company_id, datetime(2024, 10, 1), kpi_type, json.dumps(data)),
+    )
+    connection.commit()
+    cursor.close()
+
+def test_metric_rows_keep_only_finite_numeric_leaves():
+    data = {"a": 1, "b": True, "c": "texto", "d": float("nan"), "seguidores": {"instagram": 200}}
+    rows = metric_rows(7, None, datetime(2024, 10, 1), "metricool_social", json.dumps(data))
+    assert [(row[0], row[1], row[4], row[5]) for row in rows] == [(7, 0, "a", 1.0), (7, 0, "seguidores.instagram", 200.0)]
+
+def test_updated_snapshots_have_their_metric_values_rewritten(tmp_path, database_url, connection):
+    run_import(import_args(write_workbook(tmp_path / "kpis.xlsx", 1000.0), "--idempotent", "update", "--metric-values"))
+    assert revenue_values(connection) == [(datetime(2024, 10, 1), 1000.0), (datetime(2024, 10, 2), 2000.0)]
+
+    path = write_workbook(tmp_path / "kpis-corrigido.xlsx", 1500.0)
+    run_import(import_args(path, "--idempotent", "update", "--metric-values"))
+    assert revenue_values(connection) == [(datetime(2024, 10, 1), 1500.0), (datetime(2024, 10, 2), 3000.0)]
+
+def test_backfill_fills_only_the_filtered_snapshots_without_metrics(database_url, connection):
+    insert_snapshot(connection, 1, "blue_consult_all", {"faturamento_mensal": 10})
+    insert_snapshot(connection, 2, "tokeniza_all", {"receita": 20})
+
+    conditions, params = snapshot_filters(companies=[1])
+    assert backfill(connection, conditions, params, chunk_size=1) == (1, 1)
+    assert backfill(connection, conditions, params) == (0, 0)
+    assert backfill(connection, [], []) == (1, 1)
+    # --rebuild regrava sem duplicar
+    assert backfill(connection, [], [], rebuild=True) == (2, 2)
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT companyId, metric, value FROM kpiMetricValues ORDER BY companyId")
+    assert cursor.fetchall() == [(1, "faturamento_mensal", 10.0), (2, "receita", 20.0)]
+    cursor.close()
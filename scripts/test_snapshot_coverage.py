@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import numpy as np
+from openpyxl import load_workbook
+
+from create_template import create_template
+from import_historical_data import parse_args, run_import
+from kpi_sheets import GAP_FILL_KEYWORD, SHEETS_BY_NAME
+from snapshot_coverage import SeriesCoverage, build_coverage, gap_rows
+
+BLUE = SHEETS_BY_NAME["Blue Consult"]
+
+def days(*values):
+    return np.array(values, dtype="datetime64[D]")
+
+def test_series_coverage_finds_gaps_and_duplicates():
+    coverage = SeriesCoverage.from_days(
+        1, BLUE.kpi_type, days("2024-10-01", "2024-10-02", "2024-10-02", "2024-10-05"), end=datetime(2024, 10, 7)
+    )
+    summary = coverage.summary()
+    assert summary["expected"] == 7
+    assert summary["covered"] == 3
+    assert summary["gaps"] == [["2024-10-03", "2024-10-04"], ["2024-10-06", "2024-10-07"]]
+    assert summary["duplicates"] == {"2024-10-02": 2}
+
+def test_gap_fill_workbook_skips_rows_left_unfilled(tmp_path, database_url, connection):
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT INTO kpiSnapshots (companyId, snapshotDate, kpiType, source, data) VALUES (1, %s, %s, %s, '{}')",
+        [(datetime(2024, 10, day), BLUE.kpi_type, BLUE.source) for day in (1, 4)],
+    )
+    connection.commit()
+    cursor.close()
+
+    coverage = build_coverage(connection, kpi_types=[BLUE.kpi_type], start=datetime(2024, 10, 1), end=datetime(2024, 10, 4))
+    path = str(tmp_path / "lacunas.xlsx")
+    create_template(path, gap_rows(coverage), keywords=GAP_FILL_KEYWORD)
+
+    # Só o dia 02 é preenchido; o dia 03 fica só com a data
+    wb = load_workbook(path)
+    ws = wb[BLUE.name]
+    assert [ws.cell(row, 1).value for row in (2, 3)] == ["2024-10-02", "2024-10-03"]
+    ws.cell(2, 2).value = 0
+    wb.save(path)
+
+    counters = run_import(parse_args([path, "--idempotent", "skip", "--no-typed-tables", "--quiet"]))
+    assert counters["inserted"][BLUE.name] == 1
+    coverage = build_coverage(connection, kpi_types=[BLUE.kpi_type], start=datetime(2024, 10, 1), end=datetime(2024, 10, 4))
+    assert coverage[(1, BLUE.kpi_type)].summary()["gaps"] == [["2024-10-03", "2024-10-03"]]
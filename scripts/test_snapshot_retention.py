@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from snapshot_retention import compaction_ids, period_key, retention_cutoffs
+
+AS_OF = datetime(2024, 6, 15, 10, 0)
+
+def test_cutoffs_are_aligned_to_the_week_and_the_month():
+    daily_from, weekly_from = retention_cutoffs(AS_OF, 10, 60)
+    # 2024-06-05 é uma quarta-feira: o período diário começa na segunda anterior
+    assert daily_from == datetime(2024, 6, 3)
+    assert weekly_from == datetime(2024, 4, 1)
+
+def test_weekly_period_never_starts_after_the_daily_one():
+    daily_from, weekly_from = retention_cutoffs(AS_OF, 90, 30)
+    assert weekly_from <= daily_from
+    assert weekly_from == datetime(2024, 3, 1)
+
+def test_period_key():
+    daily_from, weekly_from = datetime(2024, 6, 3), datetime(2024, 4, 1)
+    assert period_key(datetime(2024, 6, 3), daily_from, weekly_from) is None
+    assert period_key(datetime(2024, 5, 30, 8), daily_from, weekly_from) == ("week", datetime(2024, 5, 27))
+    assert period_key(datetime(2024, 3, 31), daily_from, weekly_from) == ("month", datetime(2024, 3, 1))
+
+def test_compaction_keeps_every_daily_snapshot_and_the_last_of_each_week_and_month():
+    daily_from, weekly_from = retention_cutoffs(AS_OF, 10, 60)
+    days = [datetime(2024, 2, 20) + timedelta(days=offset) for offset in range(116)]
+    snapshots = [(snapshot_id, day) for snapshot_id, day in enumerate(days, start=1)]
+    # Dois snapshots no mesmo dia: fica o de maior id
+    snapshots.append((1000, datetime(2024, 3, 31, 23, 0)))
+
+    deleted = set(compaction_ids(snapshots, daily_from, weekly_from))
+    kept = {day for snapshot_id, day in snapshots if snapshot_id not in deleted}
+
+    assert {day for day in kept if day >= daily_from} == {day for day in days if day >= daily_from}
+    assert {day for day in kept if day < weekly_from} == {datetime(2024, 2, 29), datetime(2024, 3, 31, 23, 0)}
+    weekly = sorted(day for day in kept if weekly_from <= day < daily_from)
+    assert weekly[0] == datetime(2024, 4, 7)
+    assert weekly[-1] == datetime(2024, 6, 2)
+    assert all(day.weekday() == 6 for day in weekly)
+    assert len(weekly) == 9
+
+def test_compaction_ignores_series_within_the_daily_period():
+    daily_from, weekly_from = retention_cutoffs(AS_OF, 10, 60)
+    snapshots = [(1, datetime(2024, 6, 10)), (2, datetime(2024, 6, 10)), (3, datetime(2024, 6, 11))]
+    assert compaction_ids(snapshots, daily_from, weekly_from) == []
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from import_historical_data import parse_args, run_import
+from kpi_sheets import SHEETS_BY_NAME
+from typed_metrics import IMPORT_NOTE, TypedMetricsWriter, load_from_snapshots
+
+ACADEMY = SHEETS_BY_NAME["Tokeniza Academy"]
+SOCIAL = SHEETS_BY_NAME["Redes Sociais"]
+GUILD_ID = "123"
+
+def write_workbook(path, members=1854):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = ACADEMY.name
+    ws.append(ACADEMY.headers)
+    for day in (1, 2):
+        ws.append([f"2024-10-0{day}", members + day, 154, 5, 6, 450, 320, 8])
+    ws = wb.create_sheet(SOCIAL.name)
+    ws.append(SOCIAL.headers)
+    ws.append(["2024-10-01", "Blue Consult", 61, 363, 2.09, 6600, 95400, 14200, 0, 202, 0, 0, 0, 0])
+    wb.save(path)
+    return str(path)
+
+def import_args(path, *options):
+    return parse_args([path, "--quiet", "--discord-guild-id", GUILD_ID, *options])
+
+def discord_rows(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT timestamp, totalMembers FROM discordMetricsSnapshots ORDER BY timestamp, id")
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def social_rows(connection):
+    cursor = connection.cursor()
+    cursor.execute("SELECT network, recordDate, followers, notes FROM socialMediaMetrics ORDER BY network")
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def test_plain_reimport_does_not_duplicate_typed_rows(tmp_path, database_url, connection):
+    path = write_workbook(tmp_path / "kpis.xlsx")
+    run_import(import_args(path))
+    run_import(import_args(path))
+    assert discord_rows(connection) == [(datetime(2024, 10, 1), 1855), (datetime(2024, 10, 2), 1856)]
+    # Redes com zero seguidores não geram linha
+    assert social_rows(connection) == [
+        ("instagram", datetime(2024, 10, 1), 14200, IMPORT_NOTE),
+        ("youtube", datetime(2024, 10, 1), 202, IMPORT_NOTE),
+    ]
+
+def test_update_matches_discord_rows_by_day_and_keeps_collector_rows(tmp_path, database_url, connection):
+    cursor = connection.cursor()
+    # Linha do coletor no meio do dia 2: a data já existe e a linha nunca é alterada
+    cursor.execute(
+        "INSERT INTO discordMetricsSnapshots (guildId, totalMembers, timestamp) VALUES (%s, 1900, %s)",
+        (GUILD_ID, datetime(2024, 10, 2, 14, 30)),
+    )
+    connection.commit()
+    cursor.close()
+
+    path = write_workbook(tmp_path / "kpis.xlsx")
+    run_import(import_args(path))
+    assert discord_rows(connection) == [(datetime(2024, 10, 1), 1855), (datetime(2024, 10, 2, 14, 30), 1900)]
+
+    path = write_workbook(tmp_path / "kpis-corrigido.xlsx", members=2000)
+    run_import(import_args(path, "--idempotent", "update"))
+    assert discord_rows(connection) == [(datetime(2024, 10, 1), 2001), (datetime(2024, 10, 2, 14, 30), 1900)]
+
+def test_backfill_from_snapshots_skips_rows_already_imported(tmp_path, database_url, connection):
+    path = write_workbook(tmp_path / "kpis.xlsx")
+    run_import(import_args(path))
+
+    writer = TypedMetricsWriter(GUILD_ID)
+    assert load_from_snapshots(connection, writer) == 3
+    assert writer.written == {"discord": 0, "social": 0}
+    assert len(discord_rows(connection)) == 2
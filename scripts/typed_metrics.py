@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Carga das tabelas dedicadas de Discord e redes sociais a partir do histórico
+
+As abas "Tokeniza Academy" e "Redes Sociais" vão para kpiSnapshots como JSON, mas os
+cálculos de crescimento leem as tabelas tipadas discordMetricsSnapshots e
+socialMediaMetrics. O importador usa o TypedMetricsWriter para gravar, nos mesmos lotes
+dos snapshots, uma linha de Discord por data (total, online, novos 7d e 30d) e uma linha
+por rede e data com os seguidores de cada coluna seguidores_*.
+
+Este script faz a mesma carga para o histórico que já está em kpiSnapshots.
+
+Convenções das linhas importadas:
+- timestamp/recordDate na data do snapshot (meia-noite); em socialMediaMetrics também
+  createdAt, para que o "último registro" manual (ordenado por createdAt) não mude
+- redes com seguidores vazios ou zero (não conectadas) não geram linha
+- uma linha por série e data: se ela já existe, a nova é ignorada (ou, com
+  --idempotent update / --update, a importada é atualizada); reimportar não duplica
+- linhas de socialMediaMetrics levam a nota IMPORT_NOTE; com --idempotent update só
+  essas são atualizadas, registros manuais da mesma data nunca são alterados
+- em discordMetricsSnapshots a data é o dia do timestamp: as linhas importadas ficam
+  à meia-noite e as do coletor ao longo do dia, que nunca são alteradas
+
+Uso:
+    python3 scripts/typed_metrics.py --discord-guild-id 123456789
+    python3 scripts/typed_metrics.py --start 2024-01-01 --update
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+from kpi_sheets import SHEETS_BY_NAME, parse_date
+import db_utils
+import sqlite_backend
+
+DISCORD_SHEET = "Tokeniza Academy"
+SOCIAL_SHEET = "Redes Sociais"
+
+# Coluna de discordMetricsSnapshots: chave do JSON da aba Tokeniza Academy
+DISCORD_FIELDS = (
+    ("totalMembers", "total_membros_discord"),
+    ("onlineMembers", "membros_online"),
+    ("newMembers7days", "novos_membros_7d"),
+    ("newMembers30days", "novos_membros_30d"),
+)
+
+# Redes das colunas seguidores_* da aba Redes Sociais (caminho seguidores.<rede> no JSON)
+SOCIAL_NETWORKS = tuple(
+    column.path[1]
+    for column in SHEETS_BY_NAME[SOCIAL_SHEET].columns
+    if len(column.path) == 2 and column.path[0] == "seguidores"
+)
+
+IMPORT_NOTE = "Importado do histórico (import_historical_data.py)"
+
+INSERT_DISCORD_QUERY = """
+INSERT INTO discordMetricsSnapshots (guildId, totalMembers, onlineMembers, newMembers7days, newMembers30days, timestamp)
+VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+UPDATE_DISCORD_QUERY = """
+UPDATE discordMetricsSnapshots
+SET totalMembers = %s, onlineMembers = %s, newMembers7days = %s, newMembers30days = %s
+WHERE id = %s
+"""
+
+INSERT_SOCIAL_QUERY = """
+INSERT INTO socialMediaMetrics (companyId, network, recordDate, followers, notes, createdAt, updatedAt)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+UPDATE_SOCIAL_QUERY = """
+UPDATE socialMediaMetrics SET followers = %s WHERE id = %s
+"""
+
+# Índices das consultas por série (declarados em drizzle/schema.ts e criados pela migração
+# drizzle/migrations/0006_typed_metrics_indexes.sql); criados aqui se faltarem
+INDEXES = (
+    ("discordMetricsSnapshots", "discordMetricsSnapshots_guild_timestamp_idx", ("guildId", "timestamp")),
+    ("socialMediaMetrics", "socialMediaMetrics_company_network_date_idx", ("companyId", "network", "recordDate")),
+)
+
+DEFAULT_BATCH_SIZE = 500
+
+# Snapshots lidos de kpiSnapshots por vez
+FETCH_SIZE = 1000
+
+def discord_guild_id(value=None):
+    """Guild do Discord: argumento de linha de comando ou DISCORD_GUILD_ID (como o servidor)"""
+    return value or os.getenv("DISCORD_GUILD_ID") or None
+
+def ensure_indexes(connection):
+    """Cria no MySQL os índices por série que ainda não existirem (no SQLite já vêm no esquema)"""
+    if db_utils.dialect(connection) != "mysql":
+        return
+    cursor = connection.cursor()
+    try:
+        for table, index, columns in INDEXES:
+            cursor.execute(
+                """
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+                """,
+                (table, index),
+            )
+            if not cursor.fetchone()[0]:
+                column_list = ",".join(f"`{column}`" for column in columns)
+                cursor.execute(f"CREATE INDEX `{index}` ON `{table}` ({column_list})")
+    finally:
+        cursor.close()
+
+class TypedMetricsWriter:
+    """
+    Acumula as linhas de discordMetricsSnapshots e socialMediaMetrics derivadas dos
+    snapshots importados. Não grava sozinho: o SnapshotBatcher retira as pendentes com
+    take() e grava com write() junto de cada lote (na thread de escrita, no modo streaming).
+
+    Linhas cuja chave (série e data) já existe, segundo load_existing() ou repetidas no
+    próprio arquivo, são ignoradas (on_conflict "skip") ou atualizadas ("update").
+    """
+
+    def __init__(self, guild_id=None, on_conflict="skip"):
+        self.guild_id = guild_id
+        self.on_conflict = on_conflict
+        # chave: id da linha importada ou None (linha manual ou do coletor, nunca alterada)
+        self.existing_discord = {}
+        self.existing_social = {}
+        self.pending = []
+        self.written = {"discord": 0, "social": 0}
+
+    def load_existing(self, cursor, start_date, end_date):
+        if self.guild_id:
+            cursor.execute(
+                """
+                SELECT id, timestamp FROM discordMetricsSnapshots
+                WHERE guildId = %s AND timestamp >= %s AND timestamp < %s
+                ORDER BY id
+                """,
+                (self.guild_id, _day(start_date), _day(end_date) + timedelta(days=1)),
+            )
+            self.existing_discord = {}
+            for row_id, timestamp in cursor.fetchall():
+                timestamp = db_utils.as_datetime(timestamp)
+                day = _day(timestamp)
+                # Só a linha importada (meia-noite) é atualizada; o coletor grava ao longo do dia
+                if self.existing_discord.get(day) is None:
+                    self.existing_discord[day] = row_id if timestamp == day else None
+        cursor.execute(
+            """
+            SELECT id, companyId, network, recordDate, notes FROM socialMediaMetrics
+            WHERE recordDate BETWEEN %s AND %s
+            ORDER BY id
+            """,
+            (start_date, end_date),
+        )
+        self.existing_social = {
+            (company_id, network, record_date): (row_id if notes == IMPORT_NOTE else None)
+            for row_id, company_id, network, record_date, notes in cursor.fetchall()
+        }
+
+    def _resolve(self, existing, key):
+        """(ação, id) para a chave: ação None para ignorar, "insert" ou "update" com o id da linha"""
+        if key not in existing:
+            # Repetições da mesma chave no próprio arquivo são ignoradas
+            existing[key] = None
+            return "insert", None
+        row_id = existing[key]
+        if self.on_conflict == "skip" or row_id is None:
+            return None, None
+        return "update", row_id
+
+    def add(self, sheet, company_id, snapshot_date, data):
+        """Enfileira as linhas tipadas de um snapshot convertido (abas sem tabela dedicada são ignoradas)"""
+        if sheet == DISCORD_SHEET and self.guild_id:
+            action, row_id = self._resolve(self.existing_discord, _day(snapshot_date))
+            values = tuple(int(data.get(key) or 0) for _, key in DISCORD_FIELDS)
+            if action == "insert":
+                self.pending.append((INSERT_DISCORD_QUERY, (self.guild_id, *values, snapshot_date)))
+            elif action == "update":
+                self.pending.append((UPDATE_DISCORD_QUERY, (*values, row_id)))
+        elif sheet == SOCIAL_SHEET:
+            followers = data.get("seguidores") or {}
+            for network in SOCIAL_NETWORKS:
+                value = int(followers.get(network) or 0)
+                if not value:
+                    continue
+                action, row_id = self._resolve(self.existing_social, (company_id, network, snapshot_date))
+                if action == "insert":
+                    params = (company_id, network, snapshot_date, value, IMPORT_NOTE, snapshot_date, snapshot_date)
+                    self.pending.append((INSERT_SOCIAL_QUERY, params))
+                elif action == "update":
+                    self.pending.append((UPDATE_SOCIAL_QUERY, (value, row_id)))
+
+    def take(self):
+        pending = self.pending
+        self.pending = []
+        return pending
+
+    def write(self, cursor, rows):
+        """Grava as linhas com um executemany por tipo de instrução"""
+        grouped = {}
+        for query, params in rows:
+            grouped.setdefault(query, []).append(params)
+        for query, params in grouped.items():
+            cursor.executemany(query, params)
+            table = "discord" if "discordMetricsSnapshots" in query else "social"
+            self.written[table] += len(params)
+
+def _day(value):
+    return datetime(value.year, value.month, value.day)
+
+def _snapshot_filters(start=None, end=None):
+    """{kpiType: aba} das abas com tabela dedicada, condições e parâmetros do filtro de kpiSnapshots"""
+    kpi_types = {SHEETS_BY_NAME[sheet].kpi_type: sheet for sheet in (DISCORD_SHEET, SOCIAL_SHEET)}
+    conditions = [f"kpiType IN ({', '.join(['%s'] * len(kpi_types))})"]
+    params = list(kpi_types)
+    if start:
+        conditions.append("snapshotDate >= %s")
+        params.append(start)
+    if end:
+        conditions.append("snapshotDate <= %s")
+        params.append(end)
+    return kpi_types, conditions, params
+
+def snapshot_date_range(cursor, start=None, end=None):
+    """(primeira, última) snapshotDate das abas com tabela dedicada, ou (None, None)"""
+    _, conditions, params = _snapshot_filters(start, end)
+    cursor.execute(
+        f"SELECT MIN(snapshotDate), MAX(snapshotDate) FROM kpiSnapshots WHERE {' AND '.join(conditions)}",
+        params,
+    )
+    first, last = cursor.fetchone()
+    return db_utils.as_datetime(first), db_utils.as_datetime(last)
+
+def iter_snapshots(cursor, start=None, end=None):
+    """(aba, companyId, snapshotDate, data) dos snapshots das abas com tabela dedicada, lidos em blocos"""
+    kpi_types, conditions, params = _snapshot_filters(start, end)
+    cursor.execute(
+        f"""
+        SELECT companyId, snapshotDate, kpiType, data FROM kpiSnapshots
+        WHERE {' AND '.join(conditions)}
+        ORDER BY snapshotDate, id
+        """,
+        params,
+    )
+    while True:
+        batch = cursor.fetchmany(FETCH_SIZE)
+        if not batch:
+            break
+        for company_id, snapshot_date, kpi_type, data in batch:
+            if isinstance(data, (bytes, bytearray)):
+                data = data.decode("utf-8")
+            data = json.loads(data) if isinstance(data, str) else data
+            if isinstance(data, dict):
+                yield kpi_types[kpi_type], company_id, snapshot_date, data
+
+def load_from_snapshots(connection, writer, start=None, end=None, batch_size=DEFAULT_BATCH_SIZE,
+                        read_connection=None):
+    """
+    Gera as linhas tipadas do histórico de kpiSnapshots e grava em uma transação.
+    Os snapshots chegam em streaming (cursor não bufferizado e fetchmany) por
+    `read_connection`: no MySQL a conexão de gravação não executa nada com um resultado
+    pendente, então a leitura vai por outra conexão. Sem ela (SQLite), usa `connection`.
+    """
+    cursor = connection.cursor()
+    read_cursor = (read_connection or connection).cursor(buffered=False)
+    try:
+        first, last = snapshot_date_range(cursor, start, end)
+        if first is None:
+            return 0
+        writer.load_existing(cursor, first, last)
+        snapshots = 0
+        for sheet, company_id, snapshot_date, data in iter_snapshots(read_cursor, start, end):
+            writer.add(sheet, company_id, snapshot_date, data)
+            snapshots += 1
+            if len(writer.pending) >= batch_size:
+                writer.write(cursor, writer.take())
+        writer.write(cursor, writer.take())
+        connection.commit()
+        return snapshots
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        read_cursor.close()
+        cursor.close()
+
+def _date_arg(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value} (use YYYY-MM-DD)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Preenche discordMetricsSnapshots e socialMediaMetrics com o histórico de kpiSnapshots"
+    )
+    parser.add_argument("--start", type=_date_arg, help="Data inicial dos snapshots (YYYY-MM-DD)")
+    parser.add_argument("--end", type=_date_arg, help="Data final dos snapshots, inclusiva (YYYY-MM-DD)")
+    parser.add_argument(
+        "--discord-guild-id",
+        help="Guild do Discord das linhas de discordMetricsSnapshots (padrão: DISCORD_GUILD_ID)",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Atualiza as linhas já importadas em vez de ignorá-las (registros manuais nunca são alterados)",
+    )
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    guild_id = discord_guild_id(args.discord_guild_id)
+    if not guild_id:
+        print("⚠️  DISCORD_GUILD_ID não definido: só socialMediaMetrics será preenchida")
+
+    read_connection = None
+    try:
+        connection = db_utils.get_connection()
+        if db_utils.dialect(connection) != sqlite_backend.DIALECT:
+            read_connection = db_utils.get_connection()
+    except Exception as e:
+        print(f"❌ Erro ao conectar ao banco: {e}")
+        sys.exit(1)
+
+    # Data final inclusiva: vai até o fim do dia
+    end = args.end.replace(hour=23, minute=59, second=59) if args.end else None
+    try:
+        ensure_indexes(connection)
+
+        def load():
+            # Uma nova tentativa recomeça com um writer vazio
+            writer = TypedMetricsWriter(guild_id, "update" if args.update else "skip")
+            return writer, load_from_snapshots(connection, writer, args.start, end, read_connection=read_connection)
+
+        writer, snapshots = db_utils.run_with_retry(load)
+        print(f"✅ {snapshots} snapshots processados")
+        print(f"   discordMetricsSnapshots: {writer.written['discord']} linhas")
+        print(f"   socialMediaMetrics: {writer.written['social']} linhas")
+    except Exception as e:
+        print(f"❌ Erro ao preencher as tabelas: {e}")
+        sys.exit(1)
+    finally:
+        if read_connection is not None:
+            read_connection.close()
+        connection.close()
+
+if __name__ == "__main__":
+    main()
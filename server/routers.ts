@@ -6,7 +6,7 @@ import { z } from "zod";
 import * as db from "./db";
 import { getDb } from "./db";
 import * as schema from "../drizzle/schema";
-import { eq, desc, and, sql } from "drizzle-orm";
+import { eq, desc, and, sql, gte, lte, asc, inArray } from "drizzle-orm";
 import { BlueConsultKpiCalculator, TokenizaKpiCalculator, TokenizaAcademyKpiCalculator } from "./services/kpiCalculator";
 import { BlueConsultKpiCalculatorReal, TokenizaAcademyKpiCalculatorReal } from './services/kpiCalculatorReal';
 import { BlueConsultKpiCalculatorRefined } from './services/kpiCalculatorRefined';
@@ -18,7 +18,7 @@ import { MetricoolKpiCalculator } from './services/metricoolKpiCalculator';
 import { calculateCademiKpis } from './services/cademiKpiCalculator';
 import { ApiStatusTracker, trackApiStatus } from './services/apiStatusTracker';
 import { executeSnapshotManually } from './jobs/dailySnapshot';
-import { kpiSnapshots } from '../drizzle/schema';
+import { kpiSnapshots, kpiRollups, kpiMetricValues } from '../drizzle/schema';
 import { ENV } from "./_core/env";
 import { leadJourneyService } from './services/leadJourneyService';
 import { getLeadJourneyHistory, getLeadJourneyCache, saveLeadJourneyCache } from './db/leadJourneyDb';
@@ -1247,6 +1247,85 @@ export const appRouter = router({
         };
       }),
 
+    // Get precomputed trends (scripts/kpi_rollups.py) for a series
+    getRollups: protectedProcedure
+      .input(z.object({
+        companyId: z.number().optional(), // omit for consolidated/global snapshots
+        kpiType: z.string(),
+        period: z.enum(['day', 'week', 'month']).default('month'),
+        metrics: z.array(z.string()).optional(),
+        startDate: z.string().optional(), // ISO date string
+        endDate: z.string().optional(), // ISO date string
+      }))
+      .query(async ({ input }) => {
+        const database = await getDb();
+        if (!database) {
+          throw new Error('Database not available');
+        }
+
+        const conditions = [
+          eq(kpiRollups.companyId, input.companyId ?? 0),
+          eq(kpiRollups.kpiType, input.kpiType),
+          eq(kpiRollups.period, input.period),
+        ];
+        if (input.metrics && input.metrics.length > 0) {
+          conditions.push(inArray(kpiRollups.metric, input.metrics));
+        }
+        if (input.startDate) {
+          conditions.push(gte(kpiRollups.periodStart, new Date(input.startDate)));
+        }
+        if (input.endDate) {
+          conditions.push(lte(kpiRollups.periodStart, new Date(input.endDate)));
+        }
+
+        return database
+          .select()
+          .from(kpiRollups)
+          .where(and(...conditions))
+          .orderBy(asc(kpiRollups.periodStart), asc(kpiRollups.metric));
+      }),
+
+    // Get a single metric over time from the narrow kpiMetricValues table (no JSON parsing)
+    getMetricSeries: protectedProcedure
+      .input(z.object({
+        companyId: z.number().optional(), // omit for consolidated/global snapshots
+        metric: z.string(), // flattened JSON path, e.g. faturamento_mensal or seguidores.instagram
+        kpiType: z.string().optional(),
+        startDate: z.string().optional(), // ISO date string
+        endDate: z.string().optional(), // ISO date string
+      }))
+      .query(async ({ input }) => {
+        const database = await getDb();
+        if (!database) {
+          throw new Error('Database not available');
+        }
+
+        const conditions = [
+          eq(kpiMetricValues.metric, input.metric),
+          eq(kpiMetricValues.companyId, input.companyId ?? 0),
+        ];
+        if (input.kpiType) {
+          conditions.push(eq(kpiMetricValues.kpiType, input.kpiType));
+        }
+        if (input.startDate) {
+          conditions.push(gte(kpiMetricValues.snapshotDate, new Date(input.startDate)));
+        }
+        if (input.endDate) {
+          conditions.push(lte(kpiMetricValues.snapshotDate, new Date(input.endDate)));
+        }
+
+        return database
+          .select({
+            snapshotDate: kpiMetricValues.snapshotDate,
+            value: kpiMetricValues.value,
+            kpiType: kpiMetricValues.kpiType,
+            snapshotId: kpiMetricValues.snapshotId,
+          })
+          .from(kpiMetricValues)
+          .where(and(...conditions))
+          .orderBy(asc(kpiMetricValues.snapshotDate));
+      }),
+
     // Get latest snapshot for a company
     getLatest: protectedProcedure
       .input(z.object({